@@ -66,6 +66,14 @@ CREATE TABLE data_update_logs (
     completed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Incremental sync watermarks (python manage.py sync_supabase creates it if missing)
+CREATE TABLE nepse_sync_state (
+    table_name VARCHAR(63) PRIMARY KEY,
+    watermark TIMESTAMP WITH TIME ZONE,
+    rows_synced BIGINT NOT NULL DEFAULT 0,
+    synced_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
 -- Enable Row Level Security (RLS)
 ALTER TABLE nepse_index ENABLE ROW LEVEL SECURITY;
 ALTER TABLE nepse_stocks ENABLE ROW LEVEL SECURITY;
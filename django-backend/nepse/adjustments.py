@@ -0,0 +1,202 @@
+"""
+Corporate-action adjusted stock prices.
+
+A bonus issue, rights issue or split lowers a stock's price from its ex-date
+without changing what a holding is worth, so the raw closes in StockPrice show
+drops that never happened and distort returns and 52-week ranges. Each action
+has a price factor:
+
+    bonus or split, r new shares per share:  1 / (1 + r)
+    rights, r shares per share at price P:   (C + r * P) / ((1 + r) * C)
+
+where C is the close on the session before the ex-date, so C times the rights
+factor is the theoretical ex-rights price. A price dated before an ex-date is
+adjusted by multiplying it with the product of the factors of every action on
+or after that ex-date (volumes are divided by it).
+
+recompute_factors() stores those cumulative products in AdjustmentFactor, one
+row per ex-date, so reading an adjusted series costs one query for the factors
+and a vectorized searchsorted and multiply over the closes, whatever the
+history length. It runs for one symbol whenever a CorporateAction is saved or
+deleted. A rights issue is usually entered ahead of its ex-date, before the
+close it needs is in StockPrice, so after every ingestion
+refresh_rights_factors() also recomputes the symbols whose rights factor reads
+that close. Rebuild every symbol with python manage.py recompute_adjustments.
+Factors are stored without NumPy; reading a series needs it.
+"""
+from array import array
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from .fields import paisa, PAISA_PER_RUPEE
+from .models import AdjustmentFactor, CorporateAction, StockPrice
+from .history import EPOCH_ORDINAL
+from .trading_calendar import SESSIONS_PER_YEAR, latest_session
+import logging
+
+try:
+    import numpy as np
+except ImportError:  # stock_series() is unavailable, factors are still maintained
+    np = None
+
+logger = logging.getLogger(__name__)
+
+STOCK_SERIES_DTYPES = {'date': 'int32', 'close': 'float64', 'volume': 'int64'}
+STOCK_TYPECODES = {'date': 'i', 'close': 'd', 'volume': 'q'}
+
+
+def price_factor(action, previous_close=None):
+    """Price factor of one corporate action, None when a rights issue has no previous close"""
+    ratio = float(action.ratio)
+    if action.action_type != CorporateAction.RIGHTS:
+        return 1 / (1 + ratio)
+    close = action.reference_close or previous_close
+    if not close or action.rights_price is None:
+        return None
+    close = float(close)
+    return (close + ratio * float(action.rights_price)) / ((1 + ratio) * close)
+
+
+def _previous_close(symbol, ex_date):
+    return StockPrice.objects.filter(
+        symbol=symbol, date__lt=ex_date
+    ).order_by('-date').values_list('close', flat=True).first()
+
+
+def recompute_factors(symbol):
+    """Replace the stored cumulative factors of one symbol, returns the number of ex-dates"""
+    factors = {}
+    for action in CorporateAction.objects.filter(symbol=symbol).order_by('ex_date'):
+        previous_close = None
+        if action.action_type == CorporateAction.RIGHTS and action.reference_close is None:
+            previous_close = _previous_close(symbol, action.ex_date)
+        factor = price_factor(action, previous_close)
+        if factor is None:
+            # Picked up by refresh_rights_factors() once the close is ingested
+            logger.info(f"{action}: no close before the ex-date yet, factor pending")
+            continue
+        factors[action.ex_date] = factors.get(action.ex_date, 1.0) * factor
+
+    rows = []
+    cumulative = 1.0
+    for ex_date in sorted(factors, reverse=True):
+        cumulative *= factors[ex_date]
+        rows.append(AdjustmentFactor(symbol=symbol, ex_date=ex_date, factor=cumulative))
+
+    with transaction.atomic():
+        AdjustmentFactor.objects.filter(symbol=symbol).delete()
+        AdjustmentFactor.objects.bulk_create(rows[::-1])
+    return len(rows)
+
+
+def recompute_all_factors():
+    """Recompute the factors of every symbol with corporate actions, returns the number of symbols"""
+    symbols = list(CorporateAction.objects.values_list('symbol', flat=True).distinct())
+    with transaction.atomic():
+        AdjustmentFactor.objects.exclude(symbol__in=symbols).delete()
+        for symbol in symbols:
+            recompute_factors(symbol)
+    return len(symbols)
+
+
+def refresh_rights_factors(session=None):
+    """
+    Post-update hook: recompute the symbols whose rights factor reads its close
+    from StockPrice and may have changed with the closes of `session` (default
+    the latest session), i.e. rights issues without a reference close going ex
+    after it. Returns the number of symbols.
+    """
+    try:
+        symbols = list(CorporateAction.objects.filter(
+            action_type=CorporateAction.RIGHTS,
+            reference_close__isnull=True,
+            ex_date__gt=session or latest_session(),
+        ).values_list('symbol', flat=True).distinct())
+        for symbol in symbols:
+            recompute_factors(symbol)
+        return len(symbols)
+    except Exception as e:
+        logger.error(f"Error refreshing rights adjustment factors: {str(e)}")
+        return None
+
+
+def factor_steps(symbol):
+    """(ex-dates as epoch days, cumulative factors) of one symbol, oldest first"""
+    rows = AdjustmentFactor.objects.filter(symbol=symbol).order_by('ex_date').values_list('ex_date', 'factor')
+    ex_days, factors = array('i'), array('d')
+    for ex_date, factor in rows:
+        ex_days.append(ex_date.toordinal() - EPOCH_ORDINAL)
+        factors.append(factor)
+    return np.frombuffer(ex_days, dtype=np.int32), np.frombuffer(factors, dtype=np.float64)
+
+
+def adjustment_multipliers(days, steps):
+    """Factor applying to each epoch day: that of the first ex-date after it, 1 on or after the last one"""
+    ex_days, factors = steps
+    if not len(ex_days):
+        return np.ones(len(days))
+    return np.append(factors, 1.0)[np.searchsorted(ex_days, days, side='right')]
+
+
+def stock_series(symbol, start_date, end_date, adjusted=True):
+    """
+    Columnar daily close and volume of a stock between two dates, with the
+    corporate-action adjustment applied unless `adjusted` is False.
+    """
+    if np is None:
+        raise RuntimeError('numpy is required to read stock price series')
+    rows = StockPrice.objects.filter(
+        symbol=symbol, date__range=[start_date, end_date]
+    ).order_by('date').values_list('date', paisa('close'), 'volume').iterator(chunk_size=2000)
+
+    dates, closes, volumes = array('i'), array('q'), array('q')
+    for trade_date, close, volume in rows:
+        dates.append(trade_date.toordinal() - EPOCH_ORDINAL)
+        closes.append(close)
+        volumes.append(volume)
+
+    days = np.frombuffer(dates, dtype=np.int32)
+    close = np.frombuffer(closes, dtype=np.int64) / PAISA_PER_RUPEE
+    volume = np.frombuffer(volumes, dtype=np.int64)
+    if adjusted:
+        multipliers = adjustment_multipliers(days, factor_steps(symbol))
+        close = np.round(close * multipliers, 2)
+        volume = np.rint(volume / multipliers).astype(np.int64)
+
+    return {
+        'series': symbol,
+        'adjusted': adjusted,
+        'start_date': start_date,
+        'end_date': end_date,
+        'length': len(days),
+        'statistics': series_statistics(close),
+        'dtypes': STOCK_SERIES_DTYPES,
+        'columns': {
+            'date': dates,
+            'close': array(STOCK_TYPECODES['close'], close.tobytes()),
+            'volume': array(STOCK_TYPECODES['volume'], volume.tobytes()),
+        },
+    }
+
+
+def series_statistics(close):
+    """Return over the series and 52-week range of its last SESSIONS_PER_YEAR closes"""
+    if not len(close):
+        return {'change_percent': None, 'high_52w': None, 'low_52w': None}
+    year = close[-SESSIONS_PER_YEAR:]
+    return {
+        'change_percent': round(float((close[-1] / close[0] - 1) * 100), 2) if close[0] else None,
+        'high_52w': float(year.max()),
+        'low_52w': float(year.min()),
+    }
+
+
+def _action_changed(sender, instance, **kwargs):
+    try:
+        recompute_factors(instance.symbol)
+    except Exception as e:
+        logger.error(f"Error recomputing adjustment factors for {instance.symbol}: {str(e)}")
+
+
+def connect_signals():
+    post_save.connect(_action_changed, sender=CorporateAction, dispatch_uid='nepse.adjustments.saved')
+    post_delete.connect(_action_changed, sender=CorporateAction, dispatch_uid='nepse.adjustments.deleted')
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import NEPSEIndex, NEPSEStock, NEPSEIndices, DataUpdateLog
+from .models import (
+    NEPSEIndex, NEPSEStock, NEPSEIndices, DataUpdateLog, DatasetCounter, MarketHoliday, CorporateAction,
+    AdjustmentFactor
+)
 
 
 @admin.register(NEPSEIndex)
@@ -32,3 +35,31 @@ class DataUpdateLogAdmin(admin.ModelAdmin):
     list_filter = ['update_type', 'status', 'started_at']
     search_fields = ['update_type', 'status']
     ordering = ['-created_at']
+
+
+@admin.register(DatasetCounter)
+class DatasetCounterAdmin(admin.ModelAdmin):
+    list_display = ['dataset', 'row_count', 'latest_date', 'last_updated_at', 'refreshed_at']
+    ordering = ['dataset']
+
+
+@admin.register(MarketHoliday)
+class MarketHolidayAdmin(admin.ModelAdmin):
+    list_display = ['date', 'name']
+    search_fields = ['name']
+    ordering = ['-date']
+
+
+@admin.register(CorporateAction)
+class CorporateActionAdmin(admin.ModelAdmin):
+    list_display = ['symbol', 'action_type', 'ex_date', 'ratio', 'rights_price', 'description']
+    list_filter = ['action_type', 'ex_date']
+    search_fields = ['symbol', 'description']
+    ordering = ['-ex_date', 'symbol']
+
+
+@admin.register(AdjustmentFactor)
+class AdjustmentFactorAdmin(admin.ModelAdmin):
+    list_display = ['symbol', 'ex_date', 'factor', 'computed_at']
+    search_fields = ['symbol']
+    ordering = ['symbol', '-ex_date']
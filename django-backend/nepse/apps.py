@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class NepseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'nepse'
+
+    def ready(self):
+        from . import adjustments, pooling, services_simple, sqlite, trading_calendar
+        pooling.connect_signals()
+        sqlite.connect_signals()
+        trading_calendar.connect_signals()
+        adjustments.connect_signals()
+        services_simple.connect_signals()
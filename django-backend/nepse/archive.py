@@ -0,0 +1,307 @@
+"""
+Columnar Parquet archive of the NEPSE tables.
+
+Each dataset is written under NEPSE_ARCHIVE_ROOT as zstd-compressed Parquet
+files, the date-keyed history tables partitioned by year
+(index/year=2024/part-<time>.parquet). Exports are incremental: only rows
+updated since the dataset's watermark, the newest updated_at already
+archived, are written to new part files. manifest.json lists the part files
+of every dataset in export order.
+
+ArchiveService.load() bulk-loads an archive into empty tables, keeping the newest
+version of every row (COPY on PostgreSQL, executemany elsewhere), then
+re-links stocks to their sectors and recomputes adjustment factors. Rows
+deleted from the database after they were archived are not tracked; run a
+full export to drop them from the archive.
+"""
+import json
+import os
+import time
+from datetime import datetime
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connection, connections, models, router, transaction
+from django.utils import timezone
+from .counters import DATASETS, refresh_counters
+from .fields import PaisaField, paisa
+from .adjustments import recompute_all_factors
+from .models import CorporateAction, NEPSEIndex, NEPSEStock, NEPSEIndices, Sector, StockPrice
+from .sectors import sync_sectors
+from .services_simple import invalidate_series_cache
+from .supabase_sync import NULL, CSVStream, copy_from_stream
+import logging
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+
+# Dataset -> (model, natural key fields, date field the files are partitioned by)
+# Loaded in this order: sectors before the stocks that reference them, prices
+# before the corporate actions whose rights factors read them. Adjustment
+# factors are derived, and recomputed after a load instead of archived.
+ARCHIVE_DATASETS = {
+    'index': (NEPSEIndex, ['date'], 'date'),
+    'indices': (NEPSEIndices, ['name', 'date'], 'date'),
+    'sectors': (Sector, ['slug'], None),
+    'stocks': (NEPSEStock, ['symbol'], None),
+    'prices': (StockPrice, ['symbol', 'date'], 'date'),
+    'corporate_actions': (CorporateAction, ['symbol', 'action_type', 'ex_date'], None),
+}
+
+
+def arrow_type(field):
+    """Parquet column type of a model field; prices are kept as their integer paisa"""
+    if field.is_relation:  # foreign keys store the key of the referenced row
+        field = field.target_field
+    if isinstance(field, models.DecimalField):
+        return pyarrow.decimal128(field.max_digits, field.decimal_places)
+    if isinstance(field, models.FloatField):
+        return pyarrow.float64()
+    if isinstance(field, models.DateTimeField):
+        return pyarrow.timestamp('us', tz='UTC')
+    if isinstance(field, models.DateField):
+        return pyarrow.date32()
+    if isinstance(field, (models.BigIntegerField, models.BigAutoField)):
+        return pyarrow.int64()
+    if isinstance(field, (models.IntegerField, models.AutoField)):
+        return pyarrow.int32()
+    return pyarrow.string()
+
+
+def arrow_schema(model):
+    return pyarrow.schema(
+        [pyarrow.field(field.attname, arrow_type(field), nullable=field.null or field.primary_key)
+         for field in model._meta.concrete_fields]
+    )
+
+
+def read_manifest(root):
+    path = os.path.join(root, MANIFEST)
+    if not os.path.exists(path):
+        return {'datasets': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+class ArchiveService:
+    """Export the NEPSE tables to an incremental Parquet archive and load them back"""
+
+    def __init__(self, root=None, compression='zstd', chunk_size=5000):
+        if pyarrow is None:
+            raise RuntimeError('pyarrow is required for Parquet archives')
+        self.root = str(root or settings.NEPSE_ARCHIVE_ROOT)
+        self.compression = compression
+        self.chunk_size = chunk_size
+
+    def export(self, datasets=None, full=False):
+        """Write the rows changed since each watermark, returns {dataset: result dict}"""
+        os.makedirs(self.root, exist_ok=True)
+        manifest = read_manifest(self.root)
+        stamp = timezone.now()
+        results = {}
+        replaced = []
+        for name in datasets or ARCHIVE_DATASETS:
+            entry = manifest['datasets'].get(name, {'watermark': None, 'files': []})
+            watermark = None if full else entry['watermark']
+            result = self.export_dataset(name, watermark, stamp)
+            if full:
+                replaced += entry['files']
+                entry['files'] = []
+            entry['files'] += result['files']
+            entry['watermark'] = result['watermark'] or entry['watermark']
+            manifest['datasets'][name] = entry
+            results[name] = result
+
+        manifest['exported_at'] = stamp.isoformat()
+        _write_json(os.path.join(self.root, MANIFEST), manifest)
+        # Only once the new manifest is in place: a failed export leaves the old archive readable
+        for entry in replaced:
+            path = os.path.join(self.root, entry['path'])
+            if os.path.exists(path):
+                os.remove(path)
+        return results
+
+    def export_dataset(self, name, watermark, stamp):
+        """Stream the rows updated after `watermark` into one part file per partition"""
+        model, _, partition_field = ARCHIVE_DATASETS[name]
+        schema = arrow_schema(model)
+        columns = schema.names
+        start = time.perf_counter()
+
+        queryset = model.objects.order_by(partition_field or 'pk').values_list(*(
+            paisa(field.attname) if isinstance(field, PaisaField) else field.attname
+            for field in model._meta.concrete_fields
+        ))
+        if watermark is not None:
+            queryset = queryset.filter(updated_at__gt=watermark)
+
+        files = []
+        writer = None
+        partition = None
+        rows = 0
+        new_watermark = None
+        updated_at = columns.index('updated_at')
+        partition_index = columns.index(partition_field) if partition_field else None
+        part = f'part-{stamp:%Y%m%dT%H%M%S%f}.parquet'
+
+        def flush(chunk):
+            batch = pyarrow.record_batch([list(values) for values in zip(*chunk)], schema=schema)
+            writer.write_batch(batch)
+
+        chunk = []
+        try:
+            for row in queryset.iterator(chunk_size=self.chunk_size):
+                key = row[partition_index].year if partition_field else None
+                if writer is None or key != partition:
+                    if chunk:
+                        flush(chunk)
+                        chunk = []
+                    if writer is not None:
+                        writer.close()
+                    partition = key
+                    directory = name if key is None else os.path.join(name, f'year={key}')
+                    os.makedirs(os.path.join(self.root, directory), exist_ok=True)
+                    files.append({'path': os.path.join(directory, part), 'rows': 0})
+                    writer = pyarrow.parquet.ParquetWriter(
+                        os.path.join(self.root, files[-1]['path']), schema, compression=self.compression
+                    )
+                chunk.append(row)
+                files[-1]['rows'] += 1
+                rows += 1
+                if new_watermark is None or row[updated_at] > new_watermark:
+                    new_watermark = row[updated_at]
+                if len(chunk) >= self.chunk_size:
+                    flush(chunk)
+                    chunk = []
+            if chunk:
+                flush(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        for entry in files:
+            entry['bytes'] = os.path.getsize(os.path.join(self.root, entry['path']))
+        elapsed = time.perf_counter() - start
+        return {
+            'since': watermark,
+            'watermark': new_watermark.isoformat() if new_watermark else None,
+            'rows': rows,
+            'files': files,
+            'bytes': sum(entry['bytes'] for entry in files),
+            'seconds': round(elapsed, 3),
+        }
+
+    def read_dataset(self, name, manifest=None):
+        """Every archived row of a dataset as one Arrow table, newest version of each row only"""
+        model, key, _ = ARCHIVE_DATASETS[name]
+        schema = arrow_schema(model)
+        entry = (manifest or read_manifest(self.root))['datasets'].get(name)
+        if not entry or not entry['files']:
+            return schema.empty_table()
+        table = pyarrow.concat_tables(
+            pyarrow.parquet.read_table(os.path.join(self.root, item['path']), schema=schema)
+            for item in entry['files']
+        )
+        # Later part files hold newer versions of re-exported rows: keep the last occurrence of each key
+        table = table.append_column('__row', pyarrow.array(range(table.num_rows), pyarrow.int64()))
+        latest = table.group_by(key, use_threads=False).aggregate([('__row', 'max')])
+        if latest.num_rows < table.num_rows:
+            table = table.take(latest['__row_max'].combine_chunks().sort())
+        return table.drop_columns(['__row'])
+
+    def load(self, datasets=None, flush=False):
+        """Bulk-load the archive into empty tables in one transaction, returns {dataset: result dict}"""
+        manifest = read_manifest(self.root)
+        names = datasets or [name for name in ARCHIVE_DATASETS if name in manifest['datasets']]
+        results = {}
+        with transaction.atomic():
+            for name in names:
+                model = ARCHIVE_DATASETS[name][0]
+                if flush:
+                    model.objects.all().delete()
+                elif model.objects.exists():
+                    raise RuntimeError(f'{model._meta.db_table} is not empty, load into an empty database or flush it')
+
+            for name in names:
+                start = time.perf_counter()
+                table = self.read_dataset(name, manifest)
+                read = time.perf_counter()
+                self.insert_table(ARCHIVE_DATASETS[name][0], table)
+                elapsed = time.perf_counter() - start
+                results[name] = {
+                    'rows': table.num_rows,
+                    'read_seconds': round(read - start, 3),
+                    'insert_seconds': round(elapsed - (read - start), 3),
+                    'rows_per_second': round(table.num_rows / elapsed, 1) if elapsed else 0.0,
+                }
+
+            models_loaded = [ARCHIVE_DATASETS[name][0] for name in names]
+            with connection.cursor() as cursor:
+                # Explicit ids were inserted: move the id sequences past them
+                for sql in connection.ops.sequence_reset_sql(no_style(), models_loaded):
+                    cursor.execute(sql)
+
+        refresh_counters([name for name in names if name in DATASETS])
+        if {'sectors', 'stocks'} & set(names):
+            # Re-link stocks archived before their sector link was made
+            sync_sectors(Sector, NEPSEStock)
+        if {'prices', 'corporate_actions'} & set(names):
+            recompute_all_factors()
+        invalidate_series_cache()
+        return results
+
+    def insert_table(self, model, table):
+        if not table.num_rows:
+            return
+        # The connection itself rather than the django.db.connection proxy, which costs a lookup per use
+        db = connections[router.db_for_write(model)]
+        fields = [model._meta.get_field(name) for name in table.column_names]
+        db_table = db.ops.quote_name(model._meta.db_table)
+        column_list = ', '.join(db.ops.quote_name(field.column) for field in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+
+        with db.cursor() as cursor:
+            for batch in table.to_batches(max_chunksize=self.chunk_size):
+                if db.vendor == 'postgresql':
+                    copy_from_stream(
+                        cursor.cursor,
+                        f"COPY {db_table} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '{NULL}')",
+                        CSVStream(zip(*(column.to_pylist() for column in batch.columns))),
+                    )
+                else:
+                    # Paisa columns already hold the stored integers
+                    columns = [column.to_pylist() if isinstance(field, PaisaField)
+                               else [field.get_db_prep_save(value, db) for value in column.to_pylist()]
+                               for field, column in zip(fields, batch.columns)]
+                    cursor.executemany(
+                        f'INSERT INTO {db_table} ({column_list}) VALUES ({placeholders})', list(zip(*columns))
+                    )
+
+
+def export_archive_after_update():
+    """Post-update hook: incremental archive export every NEPSE_DATA_BACKUP_INTERVAL seconds when enabled"""
+    if not getattr(settings, 'NEPSE_DATA_BACKUP_ENABLED', False) or pyarrow is None:
+        return None
+    try:
+        root = settings.NEPSE_ARCHIVE_ROOT
+        exported_at = read_manifest(root).get('exported_at')
+        interval = getattr(settings, 'NEPSE_DATA_BACKUP_INTERVAL', 86400)
+        if exported_at and (timezone.now() - datetime.fromisoformat(exported_at)).total_seconds() < interval:
+            return None
+        return ArchiveService(root).export()
+    except Exception as e:
+        logger.error(f"Error exporting archive: {str(e)}")
+        return None
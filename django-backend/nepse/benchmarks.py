@@ -0,0 +1,326 @@
+"""
+Endpoint benchmark suite: synthetic dataset, per-endpoint latency and query budgets,
+plus connection reuse, import contention and price representation measurements
+"""
+import math
+import random
+import threading
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Max, Min, Sum
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from .ingestion import batched
+from .middleware import QueryTimer
+from .services_simple import series_signals_muted
+from .models import NEPSEIndex, NEPSEStock, NEPSEIndices, DataUpdateLog, Sector
+from .synthetic import SyntheticMarket, bulk_insert
+from .urls import router
+
+# Query string per endpoint, for actions that need parameters to do real work
+ENDPOINT_PARAMS = {
+    'nepse-index-list': {'page': 2},
+    'nepse-index-chart-data': {'days': 365},
+    'nepse-index-series': {'days': 3650, 'points': 500},
+    'nepse-index-candles': {'period': 'weekly'},
+    'nepse-stocks-by-sector': {'sector': 'hydropower'},
+    'nepse-stocks-history': {'days': 3650},
+    'market-overview-chart-data': {'type': 'index', 'days': 365},
+}
+
+# Maximum number of SQL queries per endpoint on a cold cache. Every endpoint in
+# the router must have a budget so new endpoints cannot slip in unmeasured.
+QUERY_BUDGETS = {
+    'nepse-index-list': 2,
+    'nepse-index-detail': 1,
+    'nepse-index-latest': 1,
+    'nepse-index-chart-data': 1,
+    'nepse-index-series': 1,
+    'nepse-index-candles': 1,
+    'nepse-stocks-list': 2,
+    'nepse-stocks-detail': 1,
+    'nepse-stocks-by-sector': 1,
+    'nepse-stocks-latest-price': 1,
+    'nepse-stocks-history': 2,
+    'nepse-stocks-most-active': 1,
+    'nepse-stocks-top-gainers': 1,
+    'nepse-stocks-top-losers': 1,
+    'nepse-sectors-list': 2,
+    'nepse-sectors-detail': 1,
+    'nepse-sectors-stocks': 2,
+    'nepse-indices-list': 2,
+    'nepse-indices-detail': 1,
+    'nepse-indices-latest': 2,
+    'data-logs-list': 2,
+    'data-logs-detail': 1,
+    'market-overview-overview': 6,
+    'market-overview-chart-data': 1,
+    'sagarmatha-analytics-market-summary': 9,
+    'sagarmatha-analytics-portfolio-analysis': 4,
+    'sagarmatha-analytics-investment-recommendations': 4,
+    'sagarmatha-analytics-index-statistics': 2,
+    'sagarmatha-reports-daily-report': 4,
+    'sagarmatha-reports-weekly-summary': 3,
+    'sagarmatha-data-data-health': 3,
+    'sagarmatha-data-request-metrics': 2,
+    'sagarmatha-data-trigger-update': 0,
+}
+
+# Endpoints restricted to staff users
+STAFF_ENDPOINTS = {'sagarmatha-data-request-metrics'}
+
+
+def build_dataset(years=10, stocks=300, seed=42, chunk_size=5000):
+    """Fill an empty database with a synthetic market and update logs, returns row counts"""
+    counts = SyntheticMarket(symbols=stocks, years=years, seed=seed).load(chunk_size)
+
+    rng = random.Random(seed)
+    now = timezone.now()
+    counts['logs'] = bulk_insert(DataUpdateLog, (
+        DataUpdateLog(
+            update_type=rng.choice(['index', 'stocks', 'indices', 'all']),
+            status='success' if rng.random() < 0.95 else 'failed',
+            records_updated=rng.randint(1, 400),
+            started_at=now - timedelta(days=i, seconds=30),
+            completed_at=now - timedelta(days=i),
+        )
+        for i in range(years * 52)
+    ), chunk_size)
+    return counts
+
+
+def router_endpoints():
+    """(url name, HTTP method, url, params) for every route registered on the nepse router"""
+    detail_pks = {
+        'nepse-index': NEPSEIndex.objects.values_list('pk', flat=True).first(),
+        'nepse-stocks': NEPSEStock.objects.values_list('pk', flat=True).first(),
+        'nepse-indices': NEPSEIndices.objects.values_list('pk', flat=True).first(),
+        'nepse-sectors': Sector.objects.values_list('slug', flat=True).first(),
+        'data-logs': DataUpdateLog.objects.values_list('pk', flat=True).first(),
+    }
+    params = dict(ENDPOINT_PARAMS)
+    params['nepse-stocks-latest-price'] = {
+        'symbol': NEPSEStock.objects.values_list('symbol', flat=True).first() or '',
+    }
+    params['nepse-stocks-history'] = dict(ENDPOINT_PARAMS['nepse-stocks-history'],
+                                          **params['nepse-stocks-latest-price'])
+
+    endpoints = []
+    for prefix, viewset, basename in router.registry:
+        if hasattr(viewset, 'list'):
+            name = f'{basename}-list'
+            endpoints.append((name, 'get', reverse(name), params.get(name, {})))
+        if hasattr(viewset, 'retrieve'):
+            name = f'{basename}-detail'
+            url = reverse(name, args=[detail_pks.get(basename) or 1])
+            endpoints.append((name, 'get', url, params.get(name, {})))
+        for extra_action in viewset.get_extra_actions():
+            name = f'{basename}-{extra_action.url_name}'
+            url = reverse(name) if not extra_action.detail else reverse(name, args=[detail_pks.get(basename) or 1])
+            for method in extra_action.mapping:
+                endpoints.append((name, method, url, params.get(name, {})))
+    return endpoints
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def measure_endpoint(client, method, url, params, iterations, clear_cache):
+    """
+    Query count of one cold-cache request, then latency of `iterations` warm requests.
+    Returns a result dict for the history file.
+    """
+    send = getattr(client, method)
+    clear_cache()
+    queries = QueryTimer()
+    with connection.execute_wrapper(queries):
+        response = send(url, params)
+    payload_bytes = len(response.content) if not response.streaming else 0
+
+    send(url, params)  # warm-up
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        send(url, params)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'method': method.upper(),
+        'url': url,
+        'params': params,
+        'status': response.status_code,
+        'queries': queries.count,
+        'bytes': payload_bytes,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def measure_connection_reuse(path, requests, max_age):
+    """
+    Latency of `requests` GETs of `path` through the full WSGI handler with
+    CONN_MAX_AGE = `max_age`. Unlike the test client, the handler runs
+    close_old_connections() around every request, as a real server does.
+    """
+    handler = WSGIHandler()
+    environ = RequestFactory().get(path, HTTP_HOST='localhost').environ
+    opened = []
+
+    def count_connection(sender, connection, **kwargs):
+        opened.append(connection.alias)
+
+    old_max_age = connection.settings_dict['CONN_MAX_AGE']
+    connection.settings_dict['CONN_MAX_AGE'] = max_age
+    connection.close()
+    connection_created.connect(count_connection)
+    timings = []
+    try:
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = handler(dict(environ), lambda status, headers, exc_info=None: None)
+            b''.join(response)
+            response.close()
+            timings.append((time.perf_counter() - start) * 1000)
+            status = response.status_code
+    finally:
+        connection_created.disconnect(count_connection)
+        connection.settings_dict['CONN_MAX_AGE'] = old_max_age
+        connection.close()
+
+    return {
+        'max_age': max_age,
+        'status': status,
+        'connections_opened': len(opened),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+    }
+
+
+def measure_import_contention(rows, readers, batch_size=None, seed=42):
+    """
+    Import `rows` index rows with update_or_create, one transaction per
+    `batch_size` rows or one per statement when None, while `readers` threads
+    keep reading the latest 30 index rows. Returns the import throughput and
+    the latency of the concurrent reads.
+    """
+    market = SyntheticMarket(symbols=1, seed=seed, days=int(rows * 365.25 / 246) + 10)
+    records = [
+        (row.date, {
+            'open_price': row.open_price, 'high_price': row.high_price, 'low_price': row.low_price,
+            'close_price': row.close_price, 'volume': row.volume, 'turnover': row.turnover,
+        })
+        for row in market.index_rows()
+    ][:rows]
+
+    done = threading.Event()
+    latencies = []
+    failed_reads = []
+
+    def read_latest():
+        try:
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    list(NEPSEIndex.objects.order_by('-date').values_list('date', 'close_price')[:30])
+                except OperationalError as e:
+                    failed_reads.append(str(e))
+                    continue
+                latencies.append((time.perf_counter() - start) * 1000)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=read_latest) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    try:
+        for batch in batched(records, batch_size or 1):
+            with series_signals_muted(), transaction.atomic() if batch_size else nullcontext():
+                for date, defaults in batch:
+                    NEPSEIndex.objects.update_or_create(date=date, defaults=defaults)
+        elapsed = time.perf_counter() - start
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join()
+
+    return {
+        'rows': len(records),
+        'batch_size': batch_size,
+        'import_seconds': round(elapsed, 3),
+        'rows_per_second': round(len(records) / elapsed, 1),
+        'reads': len(latencies),
+        'failed_reads': len(failed_reads),
+        'read_p50_ms': round(percentile(latencies, 50), 3) if latencies else None,
+        'read_p95_ms': round(percentile(latencies, 95), 3) if latencies else None,
+        'read_p99_ms': round(percentile(latencies, 99), 3) if latencies else None,
+        'read_max_ms': round(max(latencies), 3) if latencies else None,
+    }
+
+
+def _median_ms(func, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(percentile(timings, 50), 3)
+
+
+def measure_price_columns(index_model, stock_model, serializer_class, iterations=20):
+    """
+    Median time of the price-heavy operations on one price representation:
+    aggregates and sorting in SQL, loading the close column into NumPy and
+    serializing the index history. The models may be historical (Decimal
+    columns) or current (integer paisa), so one database can be measured
+    before and after migration 0005.
+    """
+    import numpy as np
+    from .fields import PaisaField, paisa
+
+    integer = isinstance(index_model._meta.get_field('close_price'), PaisaField)
+    index = index_model.objects.order_by()
+
+    def aggregate():
+        index.aggregate(Sum('close_price'), Max('high_price'), Min('low_price'))
+        list(stock_model.objects.values('sector').annotate(
+            total=Sum('current_price'), high=Max('high_52w')
+        ).order_by('sector'))
+
+    def sort():
+        list(index.order_by('-close_price').values_list('date', 'close_price')[:100])
+        list(stock_model.objects.order_by('-current_price').values_list('symbol', 'current_price'))
+
+    def to_numpy():
+        if integer:
+            close = np.fromiter(index.values_list(paisa('close_price'), flat=True), dtype=np.int64) / 100
+        else:
+            close = np.array([float(value) for value in index.values_list('close_price', flat=True)])
+        return close.mean()
+
+    rows = list(index.order_by('date'))
+
+    def serialize():
+        serializer_class(rows, many=True).data
+
+    return {
+        'storage': 'integer paisa' if integer else 'decimal',
+        'rows': len(rows),
+        'aggregate_ms': _median_ms(aggregate, iterations),
+        'sort_ms': _median_ms(sort, iterations),
+        'numpy_ms': _median_ms(to_numpy, iterations),
+        'serialize_ms': _median_ms(serialize, iterations),
+    }
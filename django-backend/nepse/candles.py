@@ -0,0 +1,156 @@
+"""
+OHLCV candle resampling for weekly, monthly, quarterly and yearly charts
+"""
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from .fields import rupees
+from .history import EPOCH_ORDINAL, INDEX_SERIES, HistoryCache
+from .metrics import record_cache
+from .models import NEPSEIndex
+from .services_simple import series_cache_version
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def week_start(day):
+    """Sunday that opens the NEPSE Sunday-Thursday trading week containing `day`"""
+    return day - timedelta(days=(day.weekday() + 1) % 7)
+
+
+def month_start(day):
+    """First day of the calendar month containing `day`"""
+    return day.replace(day=1)
+
+
+def quarter_start(day):
+    """First day of the calendar quarter containing `day`"""
+    return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+
+
+def year_start(day):
+    """First day of the calendar year containing `day`"""
+    return day.replace(month=1, day=1)
+
+
+PERIODS = {
+    'weekly': week_start,
+    'monthly': month_start,
+    'quarterly': quarter_start,
+    'yearly': year_start,
+}
+
+
+class CandleService:
+    """
+    Resample daily index rows into OHLCV bars.
+
+    Bars are cached per series and period under the series cache version.
+    Index rows only change through writes that bump that version
+    (invalidate_series_cache()), so a cached list is returned as is and the
+    bars are only rebuilt, from the history cache or the database, on a miss.
+    """
+
+    def __init__(self):
+        self.cache_timeout = getattr(settings, 'NEPSE_CANDLE_CACHE_TIMEOUT', 86400)
+
+    def get_index_candles(self, period='weekly', limit=None):
+        """Get NEPSE index candles for a period, oldest first, the last `limit` when given"""
+        if period not in PERIODS:
+            raise ValueError(f"Unknown period '{period}', expected one of {', '.join(PERIODS)}")
+        if limit is not None and limit < 1:
+            raise ValueError('limit must be at least 1')
+
+        cache_key = f"nepse:candles:NEPSE:{series_cache_version()}:{period}"
+        bars = cache.get(cache_key)
+        record_cache('candles', bars is not None)
+        if bars is None:
+            window = HistoryCache().window(INDEX_SERIES)
+            if window is not None:
+                bars = self._resample_columns(window, period)
+            else:
+                bars = self._resample(NEPSEIndex.objects.all(), PERIODS[period])
+            cache.set(cache_key, bars, self.cache_timeout)
+        return bars[-limit:] if limit else bars
+
+    def _resample(self, queryset, period_start):
+        """Aggregate daily rows, ordered by date, into bars in one pass"""
+        rows = queryset.order_by('date').annotate(
+            open_f=rupees('open_price'),
+            high_f=rupees('high_price'),
+            low_f=rupees('low_price'),
+            close_f=rupees('close_price'),
+        ).values_list(
+            'date', 'open_f', 'high_f', 'low_f', 'close_f', 'volume', 'turnover'
+        ).iterator(chunk_size=2000)
+
+        bars = []
+        bar = None
+        for day, open_, high, low, close, volume, turnover in rows:
+            start = period_start(day)
+            if bar is None or bar['period_start'] != start:
+                bar = {
+                    'period_start': start,
+                    'period_end': day,
+                    'open': open_,
+                    'high': high,
+                    'low': low,
+                    'close': close,
+                    'volume': 0,
+                    'turnover': 0,
+                    'sessions': 0,
+                }
+                bars.append(bar)
+            bar['period_end'] = day
+            bar['high'] = max(bar['high'], high)
+            bar['low'] = min(bar['low'], low)
+            bar['close'] = close
+            bar['volume'] += volume
+            bar['turnover'] += turnover
+            bar['sessions'] += 1
+        return bars
+
+    def _resample_columns(self, columns, period):
+        """Aggregate memory-mapped daily columns into bars with one reduceat per column"""
+        import numpy as np
+
+        days = columns['date']
+        if not len(days):
+            return []
+        if period == 'weekly':
+            # 1970-01-01 was a Thursday: (day + 4) % 7 counts days since Sunday
+            keys = days - (days + 4) % 7
+        else:
+            unit = 'Y' if period == 'yearly' else 'M'
+            keys = days.astype('datetime64[D]').astype(f'datetime64[{unit}]').astype(np.int64)
+            if period == 'quarterly':
+                keys = keys // 3
+        starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+        lasts = np.append(starts[1:], len(days)) - 1
+
+        values = zip(
+            days[starts].tolist(),
+            days[lasts].tolist(),
+            columns['open'][starts].tolist(),
+            np.maximum.reduceat(columns['high'], starts).tolist(),
+            np.minimum.reduceat(columns['low'], starts).tolist(),
+            columns['close'][lasts].tolist(),
+            np.add.reduceat(columns['volume'], starts).tolist(),
+            np.add.reduceat(columns['turnover'], starts).tolist(),
+            (lasts - starts + 1).tolist(),
+        )
+        return [
+            {
+                'period_start': PERIODS[period](date.fromordinal(first + EPOCH_ORDINAL)),
+                'period_end': date.fromordinal(last + EPOCH_ORDINAL),
+                'open': open_,
+                'high': high,
+                'low': low,
+                'close': close,
+                'volume': volume,
+                'turnover': turnover,
+                'sessions': sessions,
+            }
+            for first, last, open_, high, low, close, volume, turnover, sessions in values
+        ]
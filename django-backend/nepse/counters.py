@@ -0,0 +1,73 @@
+"""
+Maintained row counts and last-update timestamps per dataset.
+
+Counting a large table is a full scan, so health checks and metrics read these
+counters instead. They are refreshed after every successful ingestion (see
+IngestionStats.post_write) and bulk load; a dataset without a counter yet is
+counted once on first use, or estimated from the planner statistics on
+Postgres.
+"""
+from django.db import connection
+from django.db.models import Count, Max
+from .models import NEPSEIndex, NEPSEStock, NEPSEIndices, DatasetCounter, StockPrice
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Dataset name -> (model, field holding the trading date or time)
+DATASETS = {
+    'index': (NEPSEIndex, 'date'),
+    'stocks': (NEPSEStock, 'last_trade_time'),
+    'indices': (NEPSEIndices, 'date'),
+    'prices': (StockPrice, 'date'),
+}
+
+
+def exact_stats(name):
+    """Exact row count, latest trading date and last update of a dataset (scans the table)"""
+    model, date_field = DATASETS[name]
+    row = model.objects.aggregate(
+        row_count=Count('id'), latest_date=Max(date_field), last_updated_at=Max('updated_at')
+    )
+    if hasattr(row['latest_date'], 'date'):
+        row['latest_date'] = row['latest_date'].date()
+    return row
+
+
+def refresh_counters(datasets=None):
+    """Recount datasets exactly and store the counters, one aggregate query each"""
+    counters = {}
+    for name in datasets or DATASETS:
+        counters[name], _ = DatasetCounter.objects.update_or_create(dataset=name, defaults=exact_stats(name))
+    return counters
+
+
+def estimated_count(model):
+    """Row count from the Postgres planner statistics, None elsewhere or before ANALYZE"""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        # A partitioned table has no statistics of its own: add up its partitions
+        cursor.execute(
+            'SELECT sum(reltuples)::bigint FROM pg_class WHERE reltuples >= 0 AND (oid = %s::regclass '
+            'OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass))',
+            [model._meta.db_table, model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def get_counters():
+    """Counters of every dataset in one query, initialising any that are missing"""
+    counters = {counter.dataset: counter for counter in DatasetCounter.objects.all()}
+    for name in DATASETS:
+        if name in counters:
+            continue
+        model, _ = DATASETS[name]
+        approximate = estimated_count(model)
+        if approximate is not None:
+            # Unsaved: timestamps stay unknown until the next ingestion refreshes the counter
+            counters[name] = DatasetCounter(dataset=name, row_count=approximate)
+        else:
+            counters.update(refresh_counters([name]))
+    return {name: counters[name] for name in DATASETS}
@@ -0,0 +1,96 @@
+"""
+Read-replica routing for the heavy analytics and report endpoints.
+
+Only code running inside read_from_replica() (views using ReplicaReadMixin)
+reads from the replica alias; ingestion, trigger_update and every other read
+or write use the primary. Before a request is sent to the replica, a freshness
+guard compares the newest dataset counter refresh (written at the end of every
+ingestion) on both databases, and falls back to the primary while the replica
+has not caught up or right after this process wrote to the primary.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Max
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Alias reads are routed to in the current context, None for the primary
+_read_alias = ContextVar('nepse_read_alias', default=None)
+
+# Monotonic time of the last write by this process
+_last_write = [float('-inf')]
+
+# (monotonic time of the check, result) of the last freshness check
+_freshness = [float('-inf'), False]
+
+
+def replica_alias():
+    """The configured replica alias, or None when no replica is set up"""
+    alias = getattr(settings, 'NEPSE_REPLICA_DATABASE', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def replica_is_fresh(alias):
+    """Whether the replica has applied the latest ingestion, re-checked every NEPSE_REPLICA_CHECK_INTERVAL"""
+    now = time.monotonic()
+    if now - _last_write[0] < getattr(settings, 'NEPSE_REPLICA_MAX_LAG', 30):
+        return False
+    checked_at, fresh = _freshness
+    if now - checked_at < getattr(settings, 'NEPSE_REPLICA_CHECK_INTERVAL', 5):
+        return fresh
+
+    from .models import DatasetCounter
+    try:
+        primary = DatasetCounter.objects.using(DEFAULT_DB_ALIAS).aggregate(latest=Max('refreshed_at'))['latest']
+        replica = DatasetCounter.objects.using(alias).aggregate(latest=Max('refreshed_at'))['latest']
+        fresh = primary is None or (replica is not None and replica >= primary)
+    except Exception as e:
+        logger.error(f"Error checking replica freshness: {str(e)}")
+        fresh = False
+    _freshness[:] = [now, fresh]
+    return fresh
+
+
+@contextmanager
+def read_from_replica():
+    """Route the reads of this block to the replica if it is configured and fresh"""
+    alias = replica_alias()
+    token = _read_alias.set(alias if alias and replica_is_fresh(alias) else None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaReadMixin:
+    """ViewSet mixin serving every query of its actions from the read replica"""
+
+    def dispatch(self, request, *args, **kwargs):
+        with read_from_replica():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ReplicaRouter:
+    """Send reads inside read_from_replica() to the replica and everything else to the primary"""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        _last_write[0] = time.monotonic()
+        if _read_alias.get() is not None:
+            # Read-your-writes for the rest of the block
+            _read_alias.set(None)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication
+        return db != replica_alias()
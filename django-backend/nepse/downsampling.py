@@ -0,0 +1,66 @@
+"""
+Vectorized downsampling of time series for long-range charts
+"""
+import numpy as np
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: indices of the n_out points of (x, y)
+    that best preserve the visual shape of the line.
+
+    Bucket boundaries and the average point of every bucket are computed in
+    one vectorized pass; each bucket then picks the point forming the largest
+    triangle with the previously selected point and the next bucket's average.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Interior buckets cover x[1:n-1]; first and last points are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    counts = ends - starts
+    avg_x = np.add.reduceat(x[1:n - 1], starts - 1) / counts
+    avg_y = np.add.reduceat(y[1:n - 1], starts - 1) / counts
+    # Average of the following bucket; the last interior bucket looks at the final point
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    prev = 0
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        bx = x[start:end]
+        by = y[start:end]
+        area = np.abs(
+            (x[prev] - next_x[i]) * (by - y[prev])
+            - (x[prev] - bx) * (next_y[i] - y[prev])
+        )
+        prev = start + int(np.argmax(area))
+        selected[i + 1] = prev
+    return selected
+
+
+def ohlc_envelope(dates, opens, highs, lows, closes, volumes, n_out):
+    """
+    Min/max envelope for OHLC bars: merge consecutive bars into n_out buckets
+    keeping the first open, highest high, lowest low, last close and total volume.
+    """
+    n = len(dates)
+    if n_out >= n or n_out < 1:
+        return dates, opens, highs, lows, closes, volumes
+
+    starts = np.linspace(0, n, n_out, endpoint=False).astype(np.int64)
+    lasts = np.append(starts[1:], n) - 1
+    return (
+        np.asarray(dates)[starts],
+        np.asarray(opens)[starts],
+        np.maximum.reduceat(np.asarray(highs), starts),
+        np.minimum.reduceat(np.asarray(lows), starts),
+        np.asarray(closes)[lasts],
+        np.add.reduceat(np.asarray(volumes), starts),
+    )
@@ -0,0 +1,109 @@
+"""
+Price columns stored as integer paisa.
+
+PaisaField keeps rupee amounts in a BIGINT column as a whole number of paisa
+(1/100 rupee), so sorting, comparisons and SUM/MIN/MAX run on integers and
+columns load into NumPy without any Decimal conversion. Model attributes,
+lookups and serializers still see rupees as Decimal with two places:
+filter(current_price__lt=500) compares against 50000 paisa.
+
+Expressions that do arithmetic on the raw column see paisa: use paisa() to
+read the integers and rupees() / avg_rupees() for float rupees in SQL,
+rather than Cast(..., FloatField()) or Avg(), which would return paisa.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import Avg, F, FloatField, Value
+from django.db.models.expressions import ExpressionWrapper
+from django.db.models.lookups import Exact, GreaterThan, GreaterThanOrEqual, LessThan, LessThanOrEqual
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+PAISA_PER_RUPEE = 100
+CENT = Decimal('0.01')
+
+
+def to_paisa(value):
+    """Whole paisa of a rupee amount (Decimal, float, int or numeric string), rounded half up"""
+    if not isinstance(value, Decimal):
+        # str() first so floats such as 2800.55 are taken as written, not as their binary expansion
+        value = Decimal(str(value))
+    return int((value * PAISA_PER_RUPEE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_paisa(value):
+    """Rupees as a two-place Decimal"""
+    return Decimal(value).scaleb(-2)
+
+
+class PaisaField(models.BigIntegerField):
+    """Rupee amount stored as integer paisa and presented as a two-place Decimal"""
+    description = 'Rupee amount stored as integer paisa'
+    default_error_messages = {
+        'invalid': '"%(value)s" value must be a decimal number.',
+    }
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else from_paisa(value)
+
+    def to_python(self, value):
+        if value is None or value == '':
+            return None
+        try:
+            return (value if isinstance(value, Decimal) else Decimal(str(value))).quantize(CENT, ROUND_HALF_UP)
+        except ArithmeticError:
+            raise ValidationError(
+                self.error_messages['invalid'], code='invalid', params={'value': value}
+            )
+
+    def get_prep_value(self, value):
+        if value is None or hasattr(value, 'resolve_expression'):
+            return value
+        return to_paisa(value)
+
+    def formfield(self, **kwargs):
+        from django import forms
+        # Skip the integer form field of BigIntegerField
+        return models.Field.formfield(self, **{'form_class': forms.DecimalField, 'decimal_places': 2, **kwargs})
+
+
+# The integer lookups would round float rupees to whole rupees before conversion
+for _lookup in (Exact, GreaterThan, GreaterThanOrEqual, LessThan, LessThanOrEqual):
+    PaisaField.register_lookup(_lookup)
+
+
+class PaisaSerializerField(serializers.DecimalField):
+    """Serializer field for PaisaField: rupees with two decimal places"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('max_digits', 18)
+        kwargs.setdefault('decimal_places', 2)
+        # Integer range validators of the model column are in paisa, not rupees
+        kwargs.pop('max_value', None)
+        kwargs.pop('min_value', None)
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        coerce_to_string = getattr(self, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        if value is None or coerce_to_string or not isinstance(value, Decimal):
+            return super().to_representation(value)
+        # Values from the column are exact to the paisa already: skip the quantize and
+        # hand the renderer a float, which it would otherwise convert the Decimal to
+        return float(value)
+
+
+def paisa(name):
+    """The raw integer paisa of a PaisaField, skipping the Decimal conversion"""
+    return ExpressionWrapper(F(name), output_field=models.BigIntegerField())
+
+
+def rupees(name):
+    """A PaisaField as float rupees, computed by the database"""
+    return ExpressionWrapper(F(name) / Value(float(PAISA_PER_RUPEE)), output_field=FloatField())
+
+
+def avg_rupees(name):
+    """Average of a PaisaField in float rupees (Avg() alone averages the paisa)"""
+    return ExpressionWrapper(Avg(name, output_field=FloatField()) / Value(float(PAISA_PER_RUPEE)),
+                             output_field=FloatField())
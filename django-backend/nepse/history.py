@@ -0,0 +1,307 @@
+"""
+Memory-mapped columnar cache of the index history.
+
+Every series is stored as one .npy file per column under
+NEPSE_HISTORY_CACHE_DIR: the NEPSE index ('index') with epoch-day dates and
+float64 OHLC, int64 volume and turnover, and each sector index
+('indices/<SYMBOL>') with dates and closing values. Workers open the files
+with np.load(mmap_mode='r'), so every process shares the same page cache
+pages instead of re-reading rows and converting Decimals.
+
+Writers never modify files in place: a refresh writes the changed series
+into a new generation directory and then swaps manifest.json, which readers
+check (one stat) on every access. The cache is refreshed whenever the chart
+series cache is invalidated: after every update, and once per committed
+transaction when index rows are saved or deleted elsewhere (admin, shell),
+through the post_save/post_delete hooks in services_simple. It can be rebuilt
+with python manage.py build_history_cache.
+"""
+import json
+import os
+import shutil
+from datetime import date
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from .fields import rupees
+from .models import NEPSEIndex, NEPSEIndices
+import logging
+
+try:
+    import numpy as np
+except ImportError:  # the cache is skipped and callers read the database
+    np = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+
+# Day 0 of the epoch-day date column, as in the columnar chart series
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+INDEX_SERIES = 'index'
+
+# Column -> dtype of the NEPSE index series; sector index series hold date and close
+INDEX_COLUMNS = {
+    'date': 'int32',
+    'open': 'float64',
+    'high': 'float64',
+    'low': 'float64',
+    'close': 'float64',
+    'volume': 'int64',
+    'turnover': 'int64',
+}
+INDICES_COLUMNS = {
+    'date': 'int32',
+    'close': 'float64',
+}
+
+# Opened series of this process: name -> (generation, {column: read-only memmap})
+_opened = {}
+_manifest = [None, None]  # [(path, mtime_ns), manifest]
+
+
+def epoch_day(day):
+    return day.toordinal() - EPOCH_ORDINAL
+
+
+def series_name(symbol):
+    """Cache series name of a sector index"""
+    return f'indices/{symbol}'
+
+
+def _index_rows(queryset):
+    return queryset.order_by('date').annotate(
+        open_f=rupees('open_price'),
+        high_f=rupees('high_price'),
+        low_f=rupees('low_price'),
+        close_f=rupees('close_price'),
+    ).values_list('date', 'open_f', 'high_f', 'low_f', 'close_f', 'volume', 'turnover').iterator(chunk_size=2000)
+
+
+def _indices_columns(queryset):
+    """{series name: columns} of every sector index in the queryset, in one pass"""
+    by_symbol = {}
+    rows = queryset.order_by('symbol', 'date').annotate(
+        current_f=rupees('current')
+    ).values_list('symbol', 'date', 'current_f').iterator(chunk_size=2000)
+    for symbol, day, current in rows:
+        by_symbol.setdefault(symbol, []).append((day, current))
+    return {series_name(symbol): _to_columns(symbol_rows, INDICES_COLUMNS) for symbol, symbol_rows in by_symbol.items()}
+
+
+def _to_columns(rows, dtypes):
+    """Column arrays from (date, value, ...) rows"""
+    columns = list(zip(*rows)) or [()] * len(dtypes)
+    arrays = {}
+    for (name, dtype), values in zip(dtypes.items(), columns):
+        if name == 'date':
+            values = [epoch_day(day) for day in values]
+        arrays[name] = np.array(values, dtype=dtype)
+    return arrays
+
+
+def _merge(old, new):
+    """Columns of `old` with the rows of `new` added, `new` winning on equal dates"""
+    if old is None:
+        return new
+    keep = ~np.isin(old['date'], new['date'])
+    merged = {name: np.concatenate([old[name][keep], new[name]]) for name in new}
+    order = np.argsort(merged['date'], kind='stable')
+    return {name: column[order] for name, column in merged.items()}
+
+
+class HistoryCache:
+    """Build, refresh and read the memory-mapped history series"""
+
+    def __init__(self, root=None):
+        self.root = str(root or settings.NEPSE_HISTORY_CACHE_DIR)
+
+    def manifest(self):
+        """Current manifest ({'watermarks': ..., 'series': {name: generation}}), re-read only when it changed"""
+        path = os.path.join(self.root, MANIFEST)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if _manifest[0] != (path, mtime):
+            with open(path) as f:
+                _manifest[:] = [(path, mtime), json.load(f)]
+        return _manifest[1]
+
+    def series(self, name):
+        """{column: read-only memmapped array} of a series, None when it is not cached"""
+        manifest = self.manifest() if np is not None else None
+        if manifest is None or name not in manifest['series']:
+            return None
+        generation = manifest['series'][name]
+        key = (self.root, name)
+        opened = _opened.get(key)
+        if opened is None or opened[0] != generation:
+            directory = os.path.join(self.root, generation, name)
+            try:
+                columns = {
+                    file[:-4]: np.load(os.path.join(directory, file), mmap_mode='r')
+                    for file in sorted(os.listdir(directory)) if file.endswith('.npy')
+                }
+            except FileNotFoundError:  # swapped out by a concurrent refresh
+                return None
+            opened = _opened[key] = (generation, columns)
+        return opened[1]
+
+    def window(self, name, start_date=None, end_date=None):
+        """Zero-copy slices of a series between two dates (inclusive), None when it is not cached"""
+        columns = self.series(name)
+        if columns is None:
+            return None
+        dates = columns['date']
+        lo = 0 if start_date is None else np.searchsorted(dates, epoch_day(start_date), 'left')
+        hi = len(dates) if end_date is None else np.searchsorted(dates, epoch_day(end_date), 'right')
+        return {column: values[lo:hi] for column, values in columns.items()}
+
+    def refresh(self, full=False):
+        """
+        Merge the rows updated since the last refresh (every row with `full`)
+        into a new generation, returns {series: length} of the series written.
+        """
+        manifest = None if full else self.manifest()
+        watermarks = manifest['watermarks'] if manifest else {}
+        changed = {}
+
+        index = NEPSEIndex.objects.all()
+        indices = NEPSEIndices.objects.all()
+        if watermarks.get('index'):
+            index = index.filter(updated_at__gt=watermarks['index'])
+        if watermarks.get('indices'):
+            indices = indices.filter(updated_at__gt=watermarks['indices'])
+        new_watermarks = {
+            'index': index.aggregate(latest=Max('updated_at'))['latest'],
+            'indices': indices.aggregate(latest=Max('updated_at'))['latest'],
+        }
+
+        if new_watermarks['index']:
+            changed[INDEX_SERIES] = _to_columns(_index_rows(index), INDEX_COLUMNS)
+        if new_watermarks['indices']:
+            changed.update(_indices_columns(indices))
+
+        if manifest is not None and not changed:
+            return {}
+
+        series = dict(manifest['series']) if manifest else {}
+        if manifest is not None:
+            changed = {name: _merge(self.series(name), columns) for name, columns in changed.items()}
+            # Rows deleted since the last refresh are invisible to the watermarks: rebuild when counts disagree
+            lengths = {name: len((self.series(name) or {'date': ()})['date']) for name in series}
+            lengths.update({name: len(columns['date']) for name, columns in changed.items()})
+            indices_length = sum(length for name, length in lengths.items() if name != INDEX_SERIES)
+            if (lengths.get(INDEX_SERIES, 0) != NEPSEIndex.objects.count()
+                    or indices_length != NEPSEIndices.objects.count()):
+                return self.refresh(full=True)
+
+        generation = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+        for name, columns in changed.items():
+            directory = os.path.join(self.root, generation, name)
+            os.makedirs(directory, exist_ok=True)
+            for column, values in columns.items():
+                np.save(os.path.join(directory, f'{column}.npy'), np.ascontiguousarray(values))
+            series[name] = generation
+
+        self._swap({
+            'watermarks': {
+                dataset: (latest.isoformat() if latest else watermarks.get(dataset))
+                for dataset, latest in new_watermarks.items()
+            },
+            'series': series,
+            'refreshed_at': timezone.now().isoformat(),
+        })
+        return {name: len(columns['date']) for name, columns in changed.items()}
+
+    def _swap(self, manifest):
+        """Publish a new manifest atomically and delete the generations it no longer uses"""
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, MANIFEST)
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, path)
+        # Open memmaps of other workers keep the unlinked files alive until they move on
+        used = set(manifest['series'].values())
+        for entry in os.listdir(self.root):
+            if entry != MANIFEST and not entry.endswith('.tmp') and entry not in used:
+                shutil.rmtree(os.path.join(self.root, entry), ignore_errors=True)
+
+
+def read_index_window(start_date=None, end_date=None):
+    """
+    NEPSE index columns between two dates (inclusive) from the cache, or read
+    from the database when it is not cached. Returns (columns, source).
+    """
+    window = HistoryCache().window(INDEX_SERIES, start_date, end_date)
+    if window is not None:
+        return window, 'cache'
+    queryset = NEPSEIndex.objects.filter(date__range=[start_date or date.min, end_date or date.max])
+    return _to_columns(_index_rows(queryset), INDEX_COLUMNS), 'database'
+
+
+def read_indices_windows(start_date=None, end_date=None):
+    """{series name: columns} of every sector index between two dates, like read_index_window"""
+    cache = HistoryCache()
+    manifest = cache.manifest() if np is not None else None
+    if manifest is not None:
+        windows = {
+            name: cache.window(name, start_date, end_date)
+            for name in sorted(manifest['series']) if name != INDEX_SERIES
+        }
+        if None not in windows.values():
+            return windows, 'cache'
+    queryset = NEPSEIndices.objects.filter(date__range=[start_date or date.min, end_date or date.max])
+    return _indices_columns(queryset), 'database'
+
+
+def daily_returns(close):
+    """Simple returns between consecutive closes"""
+    close = np.asarray(close, dtype=np.float64)
+    return close[1:] / close[:-1] - 1.0
+
+
+def moving_average(values, window):
+    """Trailing mean over `window` values, NaN until the window is full"""
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    if window <= len(values):
+        sums = np.cumsum(np.concatenate([[0.0], values]))
+        result[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return result
+
+
+def returns_correlation(windows):
+    """Correlation matrix of the daily returns of several series over the dates they all have"""
+    common = windows[0]['date']
+    for window in windows[1:]:
+        common = np.intersect1d(common, window['date'], assume_unique=True)
+    if len(common) < 3:
+        return None
+    returns = [
+        daily_returns(window['close'][np.searchsorted(window['date'], common)])
+        for window in windows
+    ]
+    return np.corrcoef(returns)
+
+
+def max_drawdown(close):
+    """Largest peak-to-trough fall of a close series, as a fraction"""
+    close = np.asarray(close, dtype=np.float64)
+    if not len(close):
+        return 0.0
+    return float(np.max(1.0 - close / np.maximum.accumulate(close)))
+
+
+def refresh_history_cache():
+    """Write-path hook: bring the history cache up to date when enabled in settings"""
+    if not getattr(settings, 'NEPSE_HISTORY_CACHE_ENABLED', False) or np is None:
+        return None
+    try:
+        return HistoryCache().refresh()
+    except Exception as e:
+        logger.error(f"Error refreshing history cache: {str(e)}")
+        return None
@@ -0,0 +1,112 @@
+"""
+Per-stage timing and throughput tracking for data updates
+"""
+import sys
+import time
+from contextlib import contextmanager
+from itertools import islice
+from django.utils import timezone
+from .adjustments import refresh_rights_factors
+from .counters import refresh_counters
+from .models import DataUpdateLog
+from .sectors import refresh_sectors
+import logging
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Stages in pipeline order, used to order the recorded timings
+STAGES = ['fetch', 'parse', 'validate', 'write', 'post_write', 'cache_warm', 'backup']
+
+# Rows written per transaction by imports: one commit (and on SQLite one
+# journal sync) per batch instead of one per statement
+IMPORT_BATCH_SIZE = 500
+
+
+def peak_memory_bytes():
+    """High-water resident set size of this process, or None where unsupported"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def batched(items, size=IMPORT_BATCH_SIZE):
+    """Consecutive lists of at most `size` items; write each inside transaction.atomic()"""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class IngestionStats:
+    """
+    Timings and counters of one data update, stored in DataUpdateLog.stats.
+
+    Wrap each part of the update in stage('fetch'), stage('parse'), ... and
+    add to rows_read/rows_written/rows_skipped/bytes_processed as data flows
+    through. After the writes, post_write() refreshes the data derived from
+    them once; log() then writes the update log with everything collected.
+    """
+
+    def __init__(self, update_type):
+        self.update_type = update_type
+        self.started_at = timezone.now()
+        self._start = time.perf_counter()
+        self.stages = {}
+        self.rows_read = 0
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.bytes_processed = 0
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block; repeated stages accumulate"""
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def as_dict(self):
+        duration = time.perf_counter() - self._start
+        order = {name: i for i, name in enumerate(STAGES)}
+        return {
+            'stages': {
+                name: round(seconds, 4)
+                for name, seconds in sorted(self.stages.items(), key=lambda item: order.get(item[0], len(STAGES)))
+            },
+            'duration_seconds': round(duration, 4),
+            'rows_read': self.rows_read,
+            'rows_written': self.rows_written,
+            'rows_skipped': self.rows_skipped,
+            'rows_per_second': round(self.rows_written / duration, 2) if duration else 0.0,
+            'bytes_processed': self.bytes_processed,
+            'peak_memory_bytes': peak_memory_bytes(),
+        }
+
+    def post_write(self):
+        """Refresh the dataset counters, sectors and rights factors, timed as the post_write stage"""
+        with self.stage('post_write'):
+            try:
+                refresh_counters()
+            except Exception as e:
+                logger.error(f"Error refreshing dataset counters: {str(e)}")
+            refresh_sectors()
+            refresh_rights_factors()
+
+    def log(self, status='success', error_message=None):
+        """Create the DataUpdateLog for this update"""
+        return DataUpdateLog.objects.create(
+            update_type=self.update_type,
+            status=status,
+            records_updated=self.rows_written,
+            error_message=error_message,
+            started_at=self.started_at,
+            completed_at=timezone.now(),
+            stats=self.as_dict(),
+        )
@@ -0,0 +1,326 @@
+"""
+Asyncio HTTP load generator replaying the frontend's mix of API calls.
+
+Virtual users each hold one keep-alive HTTP/1.1 connection and repeatedly pick
+a weighted scenario (overview page, top movers, chart ranges, search-box
+keystrokes...) and run its requests in order. A concurrency profile decides
+how many virtual users are active at every moment. Only the standard library
+is used so the generator can point at runserver, gunicorn or a deployed host.
+"""
+import asyncio
+import json
+import random
+import ssl
+import time
+from collections import Counter
+from urllib.parse import quote, urlsplit
+from .benchmarks import percentile
+
+# Used when the target's stock list cannot be fetched
+DEFAULT_SYMBOLS = ['NABIL', 'NICA', 'NTC', 'SCB', 'HBL', 'EBL', 'ADBL', 'CHCL', 'UPPER', 'NLIC']
+DEFAULT_SECTORS = ['Commercial Banks', 'Hydropower', 'Life Insurance', 'Finance']
+
+# Seconds a virtual user waits after a failed request
+ERROR_BACKOFF = 0.1
+
+# Most stock list pages followed when discovering the target's symbols
+DISCOVERY_PAGES = 20
+
+
+def overview_page(rng, universe):
+    """Home page: market overview and latest index"""
+    return [('overview', '/overview/overview/'), ('index-latest', '/index/latest/')]
+
+
+def top_movers(rng, universe):
+    """Market movers widget"""
+    name = rng.choice(['top_gainers', 'top_losers', 'most_active'])
+    return [(f'stocks-{name}', f'/stocks/{name}/?limit=10')]
+
+
+def market_summary(rng, universe):
+    return [('market-summary', '/analytics/market_summary/')]
+
+
+def index_chart(rng, universe):
+    """Index chart with one of the range buttons"""
+    days = rng.choice([7, 30, 90, 180, 365])
+    return [('index-chart-data', f'/index/chart_data/?days={days}')]
+
+
+def indices_latest(rng, universe):
+    return [('indices-latest', '/indices/latest/')]
+
+
+def sector_stocks(rng, universe):
+    sector = rng.choice(universe['sectors'])
+    return [('stocks-by-sector', f'/stocks/by_sector/?sector={quote(sector)}')]
+
+
+def search_keystrokes(rng, universe):
+    """Search box: one stock-list search per typed character, then the quote"""
+    symbol = rng.choice(universe['symbols'])
+    requests = [('stocks-search', f'/stocks/?search={quote(symbol[:i])}') for i in range(1, len(symbol) + 1)]
+    requests.append(('stocks-latest-price', f'/stocks/latest_price/?symbol={quote(symbol)}'))
+    return requests
+
+
+# (weight, scenario) pairs
+REQUEST_MIX = [
+    (25, overview_page),
+    (20, top_movers),
+    (10, market_summary),
+    (15, index_chart),
+    (5, indices_latest),
+    (5, sector_stocks),
+    (20, search_keystrokes),
+]
+
+
+def constant_profile(users, ramp, step_users, step_seconds):
+    """All users from the start"""
+    return lambda elapsed: users
+
+
+def ramp_profile(users, ramp, step_users, step_seconds):
+    """Linear increase from 1 to `users` over `ramp` seconds, then hold"""
+    return lambda elapsed: max(1, min(users, int(users * elapsed / ramp) if ramp else users))
+
+
+def step_profile(users, ramp, step_users, step_seconds):
+    """Add `step_users` every `step_seconds` until `users` are active"""
+    if step_seconds <= 0 or step_users < 1:
+        raise ValueError('step_seconds must be positive and step_users at least 1')
+    return lambda elapsed: min(users, step_users * (int(elapsed // step_seconds) + 1))
+
+
+PROFILES = {
+    'constant': constant_profile,
+    'ramp': ramp_profile,
+    'step': step_profile,
+}
+
+
+class HTTPConnection:
+    """Minimal keep-alive HTTP/1.1 client over asyncio streams"""
+
+    def __init__(self, scheme, host, port, timeout):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def _connect(self):
+        ssl_context = ssl.create_default_context() if self.scheme == 'https' else None
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=ssl_context)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        """Send a GET and return (status, body bytes)"""
+        return await asyncio.wait_for(self._get(path), self.timeout)
+
+    async def _get(self, path):
+        if self.writer is None:
+            await self._connect()
+        host = self.host if self.port in (80, 443) else f'{self.host}:{self.port}'
+        self.writer.write(
+            f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: application/json\r\n'
+            f'User-Agent: nepse-loadgen\r\nConnection: keep-alive\r\n\r\n'.encode('latin-1')
+        )
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('Connection closed by server')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                body += await self.reader.readexactly(size)
+                await self.reader.readexactly(2)
+            body = bytes(body)
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            body = await self.reader.read()
+            headers['connection'] = 'close'
+
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, body
+
+
+class LoadStats:
+    """Latencies, statuses and errors per endpoint, plus a per-second timeline"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = Counter()
+        self.timeline = Counter()
+        self.bytes = 0
+
+    def record(self, name, second, duration_ms, status, size):
+        self.latencies.setdefault(name, []).append(duration_ms)
+        self.statuses.setdefault(name, Counter())[status] += 1
+        self.timeline[second] += 1
+        self.bytes += size
+        if status >= 400:
+            self.errors[name] += 1
+
+    def record_error(self, name, second, exception):
+        self.statuses.setdefault(name, Counter())[type(exception).__name__] += 1
+        self.timeline[second] += 1
+        self.errors[name] += 1
+
+    def summary(self, duration):
+        """Overall and per-endpoint RPS, latency percentiles and error rates"""
+        endpoints = {}
+        for name in sorted(self.statuses):
+            latencies = self.latencies.get(name, [])
+            requests = sum(self.statuses[name].values())
+            endpoints[name] = {
+                'requests': requests,
+                'rps': round(requests / duration, 2),
+                'error_rate': round(self.errors[name] / requests, 4),
+                'statuses': {str(status): n for status, n in self.statuses[name].items()},
+                **latency_percentiles(latencies),
+            }
+        total = sum(endpoint['requests'] for endpoint in endpoints.values())
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        return {
+            'duration_s': round(duration, 2),
+            'requests': total,
+            'rps': round(total / duration, 2) if duration else 0,
+            'error_rate': round(sum(self.errors.values()) / total, 4) if total else 0,
+            'bytes': self.bytes,
+            **latency_percentiles(all_latencies),
+            'endpoints': endpoints,
+            'timeline': [self.timeline[second] for second in range(int(duration) + 1)],
+        }
+
+
+def latency_percentiles(latencies):
+    if not latencies:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    return {f'p{pct}_ms': round(percentile(latencies, pct), 2) for pct in (50, 95, 99)}
+
+
+class LoadGenerator:
+    """Run virtual users against `base_url` following a concurrency profile"""
+
+    def __init__(self, base_url, profile, duration, think_time=0.0, timeout=10.0, seed=None,
+                 mix=REQUEST_MIX, on_tick=None):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or 'http'
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.scheme == 'https' else 80)
+        self.prefix = parts.path.rstrip('/')
+        self.profile = profile
+        self.duration = duration
+        self.think_time = think_time
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.weights = [weight for weight, _ in mix]
+        self.scenarios = [scenario for _, scenario in mix]
+        self.on_tick = on_tick
+        self.stats = LoadStats()
+        self.universe = {'symbols': DEFAULT_SYMBOLS, 'sectors': DEFAULT_SECTORS}
+
+    def _connection(self):
+        return HTTPConnection(self.scheme, self.host, self.port, self.timeout)
+
+    async def discover(self):
+        """Search and sector filters use the target's real symbols and sectors when available"""
+        connection = self._connection()
+        try:
+            rows = []
+            path = f'{self.prefix}/stocks/'
+            for _ in range(DISCOVERY_PAGES):
+                status, body = await connection.get(path)
+                if status != 200:
+                    break
+                payload = json.loads(body)
+                page = payload.get('results', payload) if isinstance(payload, dict) else payload
+                if isinstance(page, dict):  # columnar layout
+                    page = [dict(zip(page['fields'], values)) for values in zip(*page['columns'])]
+                rows.extend(page)
+                next_url = payload.get('next') if isinstance(payload, dict) else None
+                if not next_url:
+                    break
+                parts = urlsplit(next_url)
+                path = f'{parts.path}?{parts.query}' if parts.query else parts.path
+            symbols = [row['symbol'] for row in rows if row.get('symbol')]
+            sectors = sorted({row['sector'] for row in rows if row.get('sector')})
+            if symbols:
+                self.universe = {'symbols': symbols, 'sectors': sectors or DEFAULT_SECTORS}
+        except (OSError, ValueError, KeyError, TypeError, asyncio.TimeoutError):
+            pass
+        finally:
+            connection.close()
+
+    async def _user(self, start):
+        connection = self._connection()
+        try:
+            while True:
+                scenario = self.rng.choices(self.scenarios, self.weights)[0]
+                for name, path in scenario(self.rng, self.universe):
+                    sent = time.perf_counter()
+                    second = int(sent - start)
+                    try:
+                        status, body = await connection.get(self.prefix + path)
+                    except (OSError, ValueError, IndexError, asyncio.TimeoutError,
+                            asyncio.IncompleteReadError) as e:
+                        connection.close()
+                        self.stats.record_error(name, second, e)
+                        # Back off so a refused connection cannot spin the event loop
+                        await asyncio.sleep(ERROR_BACKOFF)
+                        continue
+                    self.stats.record(name, second, (time.perf_counter() - sent) * 1000, status, len(body))
+                    if self.think_time:
+                        await asyncio.sleep(self.rng.expovariate(1 / self.think_time))
+        finally:
+            connection.close()
+
+    async def run(self):
+        """Run for `duration` seconds and return the summary"""
+        await self.discover()
+        start = time.perf_counter()
+        users = []
+        last_tick = 0
+        while True:
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.duration:
+                break
+            target = self.profile(elapsed)
+            while len(users) < target:
+                users.append(asyncio.ensure_future(self._user(start)))
+            while len(users) > target:
+                users.pop().cancel()
+            if self.on_tick and int(elapsed) > last_tick:
+                last_tick = int(elapsed)
+                self.on_tick(last_tick, len(users), self.stats)
+            await asyncio.sleep(0.1)
+
+        for user in users:
+            user.cancel()
+        await asyncio.gather(*users, return_exceptions=True)
+        return self.stats.summary(time.perf_counter() - start)
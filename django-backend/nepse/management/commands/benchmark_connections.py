@@ -0,0 +1,86 @@
+"""
+Management command to compare request latency with and without persistent DB connections
+"""
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from nepse.benchmarks import measure_connection_reuse
+
+# Every request must reach the database, so nothing is served from the cache
+NO_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure per-request latency against the configured database with a new connection per '
+        'request (CONN_MAX_AGE=0) and with persistent connections. Point DATABASES at a local '
+        'or remote Postgres/MySQL to see the connection setup cost.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Number of requests per mode (default: 200)'
+        )
+        parser.add_argument(
+            '--path',
+            default='/api/v1/index/latest/',
+            help='Request path (default: /api/v1/index/latest/)'
+        )
+        parser.add_argument(
+            '--max-age',
+            type=int,
+            default=600,
+            help='CONN_MAX_AGE of the persistent run in seconds (default: 600)'
+        )
+        parser.add_argument(
+            '--json',
+            metavar='PATH',
+            help='Write both results to PATH'
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['max_age'] < 1:
+            raise CommandError('--requests and --max-age must be positive')
+
+        self.stdout.write(
+            f"{connection.vendor} database {connection.settings_dict['NAME']}, "
+            f"{options['requests']} requests of {options['path']} per mode"
+        )
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                'Opening a SQLite file is almost free; use a Postgres or MySQL database for a meaningful comparison'
+            ))
+
+        results = {}
+        with override_settings(CACHES=NO_CACHES):
+            for mode, max_age in (('per_request', 0), ('persistent', options['max_age'])):
+                results[mode] = measure_connection_reuse(options['path'], options['requests'], max_age)
+                if results[mode]['status'] >= 400:
+                    raise CommandError(f"{options['path']} returned HTTP {results[mode]['status']}")
+
+        self.stdout.write(
+            f"\n{'mode':<14}{'connections':>12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        )
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:<14}{result['connections_opened']:>12}{result['mean_ms']:>10.2f}"
+                f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+            )
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['json']}")
+
+        saved = results['per_request']['mean_ms'] - results['persistent']['mean_ms']
+        self.stdout.write(self.style.SUCCESS(
+            f'Persistent connections save {saved:.2f} ms per request on average'
+        ))
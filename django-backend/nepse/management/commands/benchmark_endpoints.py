@@ -0,0 +1,173 @@
+"""
+Management command to benchmark every NEPSE API endpoint and enforce query budgets
+"""
+import json
+import os
+import shutil
+import tempfile
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from nepse.benchmarks import (
+    QUERY_BUDGETS, STAFF_ENDPOINTS, build_dataset, measure_endpoint, router_endpoints
+)
+
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'nepse-benchmark',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = 'Measure latency percentiles and query counts of every API endpoint against a synthetic dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='Number of timed requests per endpoint (default: 20)'
+        )
+        parser.add_argument(
+            '--years',
+            type=int,
+            default=10,
+            help='Years of daily history in the synthetic dataset (default: 10)'
+        )
+        parser.add_argument(
+            '--stocks',
+            type=int,
+            default=300,
+            help='Number of synthetic stocks (default: 300)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed of the synthetic dataset (default: 42)'
+        )
+        parser.add_argument(
+            '--history',
+            default=os.path.join(settings.BASE_DIR, 'benchmarks', 'endpoint_history.json'),
+            help='JSON file the results are appended to'
+        )
+        parser.add_argument(
+            '--current-db',
+            action='store_true',
+            help='Benchmark the data already in the database instead of a throwaway synthetic one'
+        )
+
+    def handle(self, *args, **options):
+        history = self.read_history(options['history'])
+        previous = history[-1]['endpoints'] if history else {}
+
+        setup_test_environment()
+        old_name = None
+        history_cache = None
+        try:
+            if options['current_db']:
+                dataset = 'current'
+            else:
+                # Same machinery as the test runner: a separate, migrated database,
+                # with its own history cache next to it
+                history_cache = override_settings(NEPSE_HISTORY_CACHE_DIR=tempfile.mkdtemp(prefix='nepse-history-'))
+                history_cache.enable()
+                old_name = connection.settings_dict['NAME']
+                connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                self.stdout.write('Building synthetic dataset...')
+                dataset = build_dataset(options['years'], options['stocks'], options['seed'])
+                self.stdout.write(', '.join(f'{name}: {count} rows' for name, count in dataset.items()))
+
+            # A private cache so cold-cache query counts never touch a shared cache
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                results = self.run_benchmarks(options['iterations'], previous)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            if history_cache is not None:
+                shutil.rmtree(settings.NEPSE_HISTORY_CACHE_DIR, ignore_errors=True)
+                history_cache.disable()
+            teardown_test_environment()
+
+        violations = [
+            f"{key}: {result['queries']} queries (budget {result['budget']})"
+            for key, result in results.items()
+            if result['budget'] is None or result['queries'] > result['budget']
+        ]
+        violations += [
+            f"{key}: HTTP {result['status']}" for key, result in results.items() if result['status'] >= 400
+        ]
+        history.append({
+            'recorded_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'dataset': dataset,
+            'iterations': options['iterations'],
+            'endpoints': results,
+            'violations': violations,
+        })
+        self.write_history(options['history'], history)
+
+        if violations:
+            raise CommandError('Endpoint budget violations:\n  ' + '\n  '.join(violations))
+        self.stdout.write(self.style.SUCCESS(f'All {len(results)} endpoints within their query budgets'))
+
+    def run_benchmarks(self, iterations, previous):
+        """
+        Measure every router endpoint, returns results keyed by 'METHOD url-name'.
+        p95 is compared against `previous`, the endpoints of the last recorded run.
+        """
+        client = Client()
+        staff_client = Client()
+        user_model = get_user_model()
+        staff_user = user_model.objects.filter(is_staff=True, is_active=True).first()
+        if staff_user is None:
+            staff_user = user_model.objects.create_user('benchmark', is_staff=True)
+        staff_client.force_login(staff_user)
+
+        self.stdout.write(
+            f"{'endpoint':<52}{'status':>7}{'queries':>9}{'budget':>8}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'Δp95':>8}"
+        )
+        results = {}
+        for name, method, url, params in router_endpoints():
+            result = measure_endpoint(
+                staff_client if name in STAFF_ENDPOINTS else client,
+                method, url, params, iterations, cache.clear,
+            )
+            result['budget'] = QUERY_BUDGETS.get(name)
+            key = f'{method.upper()} {name}'
+            results[key] = result
+
+            delta = ''
+            before = previous.get(key)
+            if before and before['p95_ms']:
+                delta = f"{(result['p95_ms'] / before['p95_ms'] - 1) * 100:+.0f}%"
+            budget = '-' if result['budget'] is None else result['budget']
+            line = (
+                f"{key:<52}{result['status']:>7}{result['queries']:>9}{budget:>8}"
+                f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}{delta:>8}"
+            )
+            over_budget = result['budget'] is None or result['queries'] > result['budget']
+            self.stdout.write(self.style.ERROR(line) if over_budget or result['status'] >= 400 else line)
+        return results
+
+    def read_history(self, path):
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f)
+
+    def write_history(self, path, history):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(history, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+        self.stdout.write(f'Results appended to {path}')
@@ -0,0 +1,97 @@
+"""
+Management command to compare Decimal and integer-paisa price columns
+"""
+import json
+import shutil
+import tempfile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test.utils import override_settings
+from rest_framework import serializers
+from nepse.benchmarks import build_dataset, measure_price_columns
+from nepse.models import NEPSEIndex, NEPSEStock
+from nepse.serializers import NEPSEIndexSerializer
+
+# Last migration with DECIMAL(10, 2) price columns
+DECIMAL_MIGRATION = '0004_partition_history_tables'
+
+
+class Command(BaseCommand):
+    help = (
+        'Build a synthetic database, measure price aggregation, sorting, NumPy loading and serialization '
+        'with the Decimal columns of migration 0004, then again after converting them to integer paisa'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--years',
+            type=int,
+            default=10,
+            help='Years of synthetic history (default: 10)'
+        )
+        parser.add_argument(
+            '--stocks',
+            type=int,
+            default=300,
+            help='Number of synthetic stocks (default: 300)'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='Timed repetitions of each operation (default: 20)'
+        )
+        parser.add_argument(
+            '--json',
+            metavar='PATH',
+            help='Write both results to PATH'
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        history_dir = tempfile.mkdtemp(prefix='nepse-history-')
+        results = {}
+        try:
+            with override_settings(NEPSE_HISTORY_CACHE_DIR=history_dir):
+                connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                self.stdout.write('Building synthetic dataset...')
+                build_dataset(options['years'], options['stocks'])
+
+                # Back to Decimal columns; the historical models match that schema
+                call_command('migrate', 'nepse', DECIMAL_MIGRATION, verbosity=0)
+                state = MigrationLoader(connection).project_state(('nepse', DECIMAL_MIGRATION))
+                index_model = state.apps.get_model('nepse', 'NEPSEIndex')
+                decimal_serializer = type('DecimalIndexSerializer', (serializers.ModelSerializer,), {
+                    'Meta': type('Meta', (), {'model': index_model, 'fields': '__all__'}),
+                })
+                self.stdout.write('Measuring Decimal columns...')
+                results['decimal'] = measure_price_columns(
+                    index_model, state.apps.get_model('nepse', 'NEPSEStock'), decimal_serializer, options['iterations']
+                )
+
+                call_command('migrate', 'nepse', verbosity=0)
+                self.stdout.write('Measuring integer paisa columns...')
+                results['paisa'] = measure_price_columns(
+                    NEPSEIndex, NEPSEStock, NEPSEIndexSerializer, options['iterations']
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(history_dir, ignore_errors=True)
+
+        self.stdout.write(f"\n{'operation':<14}{'decimal ms':>12}{'paisa ms':>12}{'speedup':>10}")
+        for key in ('aggregate_ms', 'sort_ms', 'numpy_ms', 'serialize_ms'):
+            before, after = results['decimal'][key], results['paisa'][key]
+            self.stdout.write(
+                f"{key[:-3]:<14}{before:>12.2f}{after:>12.2f}{(before / after if after else 0):>9.1f}x"
+            )
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['json']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Measured {results['paisa']['rows']} index rows in both representations"
+        ))
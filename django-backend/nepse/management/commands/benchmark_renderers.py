@@ -0,0 +1,53 @@
+"""
+Management command to benchmark JSON rendering of the stock list
+"""
+import gzip
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from nepse.models import NEPSEStock
+from nepse.renderers import ColumnarORJSONRenderer, ORJSONRenderer, orjson
+from nepse.serializers import NEPSEStockSerializer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark serialization time and payload size of the stock list per renderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Number of timed renders per renderer (default: 50)'
+        )
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        stocks = list(NEPSEStock.objects.all())
+        if not stocks:
+            raise CommandError('No stocks in the database, run generate_sample_data first')
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed, ORJSONRenderer falls back to JSONRenderer'))
+
+        data = NEPSEStockSerializer(stocks, many=True).data  # warm-up
+        start = time.perf_counter()
+        for _ in range(repeat):
+            data = NEPSEStockSerializer(stocks, many=True).data
+        serialize_ms = (time.perf_counter() - start) * 1000 / repeat
+
+        self.stdout.write(f'Stock list: {len(stocks)} rows, serializer.data {serialize_ms:.2f} ms')
+        self.stdout.write(f"{'renderer':<28}{'render ms':>12}{'bytes':>12}{'gzip bytes':>12}")
+
+        renderers = [
+            ('JSONRenderer', JSONRenderer()),
+            ('ORJSONRenderer', ORJSONRenderer()),
+            ('ColumnarORJSONRenderer', ColumnarORJSONRenderer()),
+        ]
+        for name, renderer in renderers:
+            renderer.render(data, 'application/json')  # warm-up
+            start = time.perf_counter()
+            for _ in range(repeat):
+                payload = renderer.render(data, 'application/json')
+            render_ms = (time.perf_counter() - start) * 1000 / repeat
+            compressed = len(gzip.compress(payload))
+            self.stdout.write(f'{name:<28}{render_ms:>12.3f}{len(payload):>12}{compressed:>12}')
@@ -0,0 +1,98 @@
+"""
+Management command to measure API read latency on SQLite while an import is running
+"""
+import json
+import os
+import shutil
+import tempfile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from nepse.benchmarks import measure_import_contention
+from nepse.ingestion import IMPORT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Import synthetic index rows into a throwaway SQLite database while reader threads query it, '
+        'once with the default journal and per-statement commits and once with NEPSE_SQLITE_TUNING '
+        'and batched transactions'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=3000,
+            help='Index rows to import (default: 3000)'
+        )
+        parser.add_argument(
+            '--readers',
+            type=int,
+            default=4,
+            help='Concurrent reader threads (default: 4)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help=f'Rows per transaction in the tuned run (default: {IMPORT_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--json',
+            metavar='PATH',
+            help='Write both results to PATH'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(f'The default database is {connection.vendor}, not SQLite')
+        if options['rows'] < 1 or options['readers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--rows, --readers and --batch-size must be positive')
+
+        modes = (
+            ('default', False, None),
+            ('tuned', True, options['batch_size']),
+        )
+        directory = tempfile.mkdtemp(prefix='nepse-sqlite-')
+        old_name = connection.settings_dict['NAME']
+        old_test = connection.settings_dict.get('TEST', {})
+        results = {}
+        try:
+            for mode, tuned, batch_size in modes:
+                # A file database: the in-memory test database cannot be shared by reader threads
+                connection.settings_dict['TEST'] = {**old_test, 'NAME': os.path.join(directory, f'{mode}.sqlite3')}
+                with override_settings(NEPSE_SQLITE_TUNING=tuned):
+                    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                    try:
+                        self.stdout.write(f'{mode}: importing {options["rows"]} rows with {options["readers"]} readers...')
+                        results[mode] = measure_import_contention(options['rows'], options['readers'], batch_size)
+                    finally:
+                        connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            connection.settings_dict['TEST'] = old_test
+            shutil.rmtree(directory, ignore_errors=True)
+
+        self.stdout.write(
+            f"\n{'mode':<10}{'rows/s':>10}{'reads':>8}{'failed':>8}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+        )
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:<10}{result['rows_per_second']:>10.0f}{result['reads']:>8}{result['failed_reads']:>8}"
+                f"{self.ms(result['read_p50_ms'])}{self.ms(result['read_p95_ms'])}"
+                f"{self.ms(result['read_p99_ms'])}{self.ms(result['read_max_ms'])}"
+            )
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['json']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Import {results['tuned']['rows_per_second'] / results['default']['rows_per_second']:.1f}x faster "
+            f"with NEPSE_SQLITE_TUNING and batched transactions"
+        ))
+
+    def ms(self, value):
+        return f'{value:>10.2f}' if value is not None else f"{'-':>10}"
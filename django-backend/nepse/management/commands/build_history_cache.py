@@ -0,0 +1,27 @@
+"""
+Management command to build the memory-mapped index history cache
+"""
+from django.core.management.base import BaseCommand, CommandError
+from nepse.history import HistoryCache
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the memory-mapped NumPy history cache (NEPSE_HISTORY_CACHE_DIR) from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--append',
+            action='store_true',
+            help='Only merge rows updated since the last refresh instead of rebuilding'
+        )
+
+    def handle(self, *args, **options):
+        cache = HistoryCache()
+        try:
+            written = cache.refresh(full=not options['append'])
+        except Exception as e:
+            raise CommandError(f'Error building history cache: {str(e)}')
+
+        for name, length in sorted(written.items()):
+            self.stdout.write(f'  {name}: {length} sessions')
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(written)} series to {cache.root}'))
@@ -0,0 +1,50 @@
+"""
+Management command to export the NEPSE tables to the Parquet archive
+"""
+from django.core.management.base import BaseCommand, CommandError
+from nepse.archive import ARCHIVE_DATASETS, ArchiveService
+
+
+class Command(BaseCommand):
+    help = 'Append rows changed since the last export to the compressed, year-partitioned Parquet archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Archive directory (default: NEPSE_ARCHIVE_ROOT)'
+        )
+        parser.add_argument(
+            '--datasets',
+            nargs='+',
+            choices=list(ARCHIVE_DATASETS),
+            help='Datasets to export (default: all)'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Rewrite the datasets from scratch instead of appending changes'
+        )
+        parser.add_argument(
+            '--compression',
+            default='zstd',
+            choices=['zstd', 'snappy', 'gzip', 'brotli', 'none'],
+            help='Parquet compression codec (default: zstd)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            service = ArchiveService(options['output'], compression=options['compression'])
+            results = service.export(datasets=options['datasets'], full=options['full'])
+        except Exception as e:
+            raise CommandError(f'Error exporting archive: {str(e)}')
+
+        for name, result in results.items():
+            since = result['since'] or 'the beginning'
+            self.stdout.write(
+                f"{name}: {result['rows']} rows changed since {since} -> {len(result['files'])} files, "
+                f"{result['bytes']} bytes in {result['seconds']:.2f}s"
+            )
+        total = sum(result['rows'] for result in results.values())
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} rows to {service.root}'))
@@ -0,0 +1,37 @@
+"""
+Management command to pre-render public API endpoints to static JSON snapshots
+"""
+from django.core.management.base import BaseCommand
+from nepse.snapshots import SnapshotService
+
+
+class Command(BaseCommand):
+    help = 'Render public read endpoints to versioned, pre-compressed JSON snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Directory to write snapshots to (default: NEPSE_SNAPSHOT_ROOT)'
+        )
+        parser.add_argument(
+            '--keep',
+            type=int,
+            default=None,
+            help='Number of snapshot versions to keep (default: NEPSE_SNAPSHOT_KEEP_VERSIONS)'
+        )
+
+    def handle(self, *args, **options):
+        service = SnapshotService(output_dir=options['output'], keep_versions=options['keep'])
+        manifest = service.publish()
+
+        for name, info in sorted(manifest['files'].items()):
+            sizes = ', '.join(f"{enc}={size}B" for enc, size in info['sizes'].items())
+            self.stdout.write(f'  {name}: {sizes}')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Published {len(manifest['files'])} snapshots as version {manifest['version']}"
+            )
+        )
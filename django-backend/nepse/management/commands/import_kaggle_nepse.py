@@ -5,9 +5,10 @@ import csv
 import os
 from datetime import datetime
 from django.core.management.base import BaseCommand, CommandError
-from django.utils.dateparse import parse_date
-from nepse.models import NEPSEIndex, NEPSEStock, NEPSEIndices, DataUpdateLog
-from django.utils import timezone
+from django.db import transaction
+from nepse.ingestion import IMPORT_BATCH_SIZE, IngestionStats, batched
+from nepse.models import NEPSEIndex, NEPSEStock, NEPSEIndices
+from nepse.services_simple import invalidate_series_cache
 
 
 class Command(BaseCommand):
@@ -24,6 +25,12 @@ class Command(BaseCommand):
             action='store_true',
             help='Clear existing data before importing'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help=f'Rows written per transaction (default: {IMPORT_BATCH_SIZE})'
+        )
 
     def handle(self, *args, **options):
         csv_file = options['csv_file']
@@ -38,77 +45,83 @@ class Command(BaseCommand):
             NEPSEStock.objects.all().delete()
             NEPSEIndices.objects.all().delete()
 
+        stats = IngestionStats('kaggle_import')
         try:
-            self.import_nepse_data(csv_file)
+            self.import_nepse_data(csv_file, stats, options['batch_size'])
             self.stdout.write(
                 self.style.SUCCESS('Successfully imported NEPSE data from Kaggle dataset')
             )
         except Exception as e:
             # Log the error
-            DataUpdateLog.objects.create(
-                update_type='kaggle_import',
-                status='failed',
-                message=f'Error importing Kaggle data: {str(e)}',
-                started_at=timezone.now(),
-                completed_at=timezone.now()
-            )
+            stats.log('failed', error_message=f'Error importing Kaggle data: {str(e)}')
             raise CommandError(f'Error importing data: {str(e)}')
 
-    def import_nepse_data(self, csv_file):
+    def parse_date(self, date_str):
+        """Parse a date in any of the formats found in the Kaggle exports"""
+        for date_format in ['%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%Y-%m-%d %H:%M:%S']:
+            try:
+                return datetime.strptime(date_str, date_format).date()
+            except ValueError:
+                continue
+        return None
+
+    def import_nepse_data(self, csv_file, stats, batch_size=IMPORT_BATCH_SIZE):
         """Import NEPSE data from CSV file"""
-        imported_count = 0
-        
-        with open(csv_file, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            
-            for row in reader:
+        with stats.stage('parse'):
+            with open(csv_file, 'r', encoding='utf-8') as file:
+                rows = list(csv.DictReader(file))
+        stats.bytes_processed = os.path.getsize(csv_file)
+        stats.rows_read = len(rows)
+
+        records = {}
+        with stats.stage('validate'):
+            for row in rows:
                 try:
                     # Parse the date
                     date_str = row.get('date', '')
                     if not date_str:
+                        stats.rows_skipped += 1
                         continue
                     
-                    # Try different date formats
-                    date_obj = None
-                    for date_format in ['%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%Y-%m-%d %H:%M:%S']:
-                        try:
-                            date_obj = datetime.strptime(date_str, date_format).date()
-                            break
-                        except ValueError:
-                            continue
-                    
+                    date_obj = self.parse_date(date_str)
                     if not date_obj:
                         self.stdout.write(f'Skipping row with invalid date: {date_str}')
+                        stats.rows_skipped += 1
                         continue
 
-                    # Create or update NEPSE Index record
-                    index_data, created = NEPSEIndex.objects.update_or_create(
-                        date=date_obj,
-                        defaults={
-                            'open_price': float(row.get('open', 0)),
-                            'high_price': float(row.get('high', 0)),
-                            'low_price': float(row.get('low', 0)),
-                            'close_price': float(row.get('close', 0)),
-                            'volume': int(float(row.get('volume', 0))),
-                            'turnover': int(float(row.get('turnover', 0))),
-                        }
-                    )
-                    
-                    if created:
-                        imported_count += 1
+                    records[date_obj] = {
+                        'open_price': float(row.get('open', 0)),
+                        'high_price': float(row.get('high', 0)),
+                        'low_price': float(row.get('low', 0)),
+                        'close_price': float(row.get('close', 0)),
+                        'volume': int(float(row.get('volume', 0))),
+                        'turnover': int(float(row.get('turnover', 0))),
+                    }
                     
                 except (ValueError, KeyError) as e:
                     self.stdout.write(f'Skipping row due to error: {str(e)}')
+                    stats.rows_skipped += 1
                     continue
 
+        imported_count = 0
+        with stats.stage('write'):
+            for batch in batched(records.items(), batch_size):
+                with transaction.atomic():
+                    for date_obj, defaults in batch:
+                        # Create or update NEPSE Index record
+                        index_data, created = NEPSEIndex.objects.update_or_create(date=date_obj, defaults=defaults)
+                        if created:
+                            imported_count += 1
+        stats.rows_written = len(records)
+
+        stats.post_write()
+        with stats.stage('cache_warm'):
+            invalidate_series_cache()
+
         # Log the successful import
-        DataUpdateLog.objects.create(
-            update_type='kaggle_import',
-            status='success',
-            message=f'Imported {imported_count} records from Kaggle dataset',
-            records_updated=imported_count,
-            started_at=timezone.now(),
-            completed_at=timezone.now()
-        )
+        stats.log('success')
 
-        self.stdout.write(f'Imported {imported_count} NEPSE index records')
+        self.stdout.write(
+            f'Imported {imported_count} new and updated {len(records) - imported_count} NEPSE index records '
+            f'({stats.rows_skipped} skipped)'
+        )
@@ -0,0 +1,43 @@
+"""
+Management command to bulk-load the Parquet archive into an empty database
+"""
+from django.core.management.base import BaseCommand, CommandError
+from nepse.archive import ARCHIVE_DATASETS, ArchiveService
+
+
+class Command(BaseCommand):
+    help = 'Bulk-load the Parquet archive written by export_archive into empty NEPSE tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--input',
+            type=str,
+            default=None,
+            help='Archive directory (default: NEPSE_ARCHIVE_ROOT)'
+        )
+        parser.add_argument(
+            '--datasets',
+            nargs='+',
+            choices=list(ARCHIVE_DATASETS),
+            help='Datasets to load (default: every archived dataset)'
+        )
+        parser.add_argument(
+            '--flush',
+            action='store_true',
+            help='Delete the rows already in the tables before loading'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            service = ArchiveService(options['input'])
+            results = service.load(datasets=options['datasets'], flush=options['flush'])
+        except Exception as e:
+            raise CommandError(f'Error loading archive: {str(e)}')
+
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name}: {result['rows']} rows (read {result['read_seconds']:.2f}s, "
+                f"insert {result['insert_seconds']:.2f}s, {result['rows_per_second']:.0f} rows/s)"
+            )
+        total = sum(result['rows'] for result in results.values())
+        self.stdout.write(self.style.SUCCESS(f'Loaded {total} rows from {service.root}'))
@@ -0,0 +1,130 @@
+"""
+Management command to load test a running API with the frontend's request mix
+"""
+import asyncio
+import json
+from django.core.management.base import BaseCommand, CommandError
+from nepse.loadgen import PROFILES, LoadGenerator
+
+
+class Command(BaseCommand):
+    help = 'Replay a weighted mix of frontend API calls against a running server and report RPS and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://127.0.0.1:8000/api/v1',
+            help='API base URL (default: http://127.0.0.1:8000/api/v1)'
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=20,
+            help='Peak number of concurrent virtual users (default: 20)'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30,
+            help='Test duration in seconds (default: 30)'
+        )
+        parser.add_argument(
+            '--profile',
+            choices=sorted(PROFILES),
+            default='ramp',
+            help='Concurrency profile (default: ramp)'
+        )
+        parser.add_argument(
+            '--ramp',
+            type=float,
+            default=10,
+            help='Seconds to reach --users with the ramp profile (default: 10)'
+        )
+        parser.add_argument(
+            '--step-users',
+            type=int,
+            default=5,
+            help='Users added per step with the step profile (default: 5)'
+        )
+        parser.add_argument(
+            '--step-seconds',
+            type=float,
+            default=5,
+            help='Seconds between steps with the step profile (default: 5)'
+        )
+        parser.add_argument(
+            '--think-time',
+            type=float,
+            default=0.0,
+            help='Mean pause in seconds between requests of one user, 0 for closed-loop (default: 0)'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=10,
+            help='Per-request timeout in seconds (default: 10)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed for a reproducible request sequence'
+        )
+        parser.add_argument(
+            '--json',
+            metavar='PATH',
+            help='Write the full summary, including the per-second timeline, to PATH'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['duration'] <= 0:
+            raise CommandError('--users and --duration must be positive')
+        if options['profile'] == 'step' and (options['step_seconds'] <= 0 or options['step_users'] < 1):
+            raise CommandError('--step-seconds must be positive and --step-users at least 1')
+        if options['ramp'] < 0:
+            raise CommandError('--ramp cannot be negative')
+        profile = PROFILES[options['profile']](
+            options['users'], options['ramp'], options['step_users'], options['step_seconds']
+        )
+        generator = LoadGenerator(
+            options['url'], profile, options['duration'],
+            think_time=options['think_time'], timeout=options['timeout'], seed=options['seed'],
+            on_tick=self.tick if options['verbosity'] > 0 else None,
+        )
+        self.stdout.write(
+            f"Load testing {options['url']} for {options['duration']:.0f}s, "
+            f"{options['profile']} profile up to {options['users']} users"
+        )
+        summary = asyncio.run(generator.run())
+
+        if summary['requests'] == 0:
+            raise CommandError(f"No requests completed, is the server running at {options['url']}?")
+
+        self.stdout.write(
+            f"\n{'endpoint':<24}{'requests':>10}{'rps':>9}{'errors':>9}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        )
+        rows = list(summary['endpoints'].items()) + [('TOTAL', summary)]
+        for name, row in rows:
+            self.stdout.write(
+                f"{name:<24}{row['requests']:>10}{row['rps']:>9.1f}{row['error_rate']:>9.1%}"
+                f"{self.ms(row['p50_ms'])}{self.ms(row['p95_ms'])}{self.ms(row['p99_ms'])}"
+            )
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(summary, f, indent=2)
+            self.stdout.write(f"Summary written to {options['json']}")
+
+        style = self.style.SUCCESS if summary['error_rate'] < 0.01 else self.style.WARNING
+        self.stdout.write(style(
+            f"{summary['requests']} requests, {summary['rps']:.1f} req/s, "
+            f"error rate {summary['error_rate']:.2%}"
+        ))
+
+    def tick(self, second, users, stats):
+        """Progress line every five seconds: active users and throughput of the last second"""
+        if second % 5 == 0:
+            self.stdout.write(f'  t={second:>4}s users={users:>4} rps={stats.timeline[second - 1]:>6}')
+
+    def ms(self, value):
+        return f'{value:>10.2f}' if value is not None else f"{'-':>10}"
@@ -0,0 +1,116 @@
+"""
+Management command to maintain the date partitions of the history tables on PostgreSQL
+"""
+from datetime import date
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from nepse.counters import refresh_counters
+from nepse.partitions import (
+    PARTITION_KEYS, detach_partitions, ensure_partitions, is_partitioned, list_partitions,
+    partition_table, unpartition_table
+)
+from nepse.services_simple import invalidate_series_cache
+
+
+class Command(BaseCommand):
+    help = 'Pre-create upcoming date partitions and detach or archive old ones (PostgreSQL only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Convert the plain history tables into partitioned ones first (rewrites the tables)'
+        )
+        parser.add_argument(
+            '--unpartition',
+            action='store_true',
+            help='Turn the partitioned history tables back into plain ones and exit'
+        )
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=getattr(settings, 'NEPSE_PARTITIONS_AHEAD', 1),
+            help='Periods beyond the current one to create partitions for (default: NEPSE_PARTITIONS_AHEAD)'
+        )
+        parser.add_argument(
+            '--detach-before',
+            type=date.fromisoformat,
+            metavar='YYYY-MM-DD',
+            help='Detach partitions whose range ends on or before this date'
+        )
+        parser.add_argument(
+            '--archive-schema',
+            default='nepse_archive',
+            help='Schema detached partitions are moved to (default: nepse_archive)'
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='Drop detached partitions instead of archiving them'
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='Only list the partitions and their row estimates'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError(f'Partitioning needs PostgreSQL, the database is {connection.vendor}')
+
+        models = [apps.get_model('nepse', name) for name in PARTITION_KEYS]
+        if options['unpartition']:
+            with transaction.atomic(), connection.cursor() as cursor:
+                for model in models:
+                    unpartition_table(cursor, model)
+            self.stdout.write(self.style.SUCCESS('History tables are no longer partitioned'))
+            return
+
+        detached = []
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model in models:
+                table = model._meta.db_table
+                if options['convert'] and not is_partitioned(cursor, table):
+                    partition_table(cursor, model)
+                    self.stdout.write(f'Partitioned {table}')
+                if not is_partitioned(cursor, table):
+                    raise CommandError(f'{table} is not partitioned, run with --convert first')
+
+                if options['list']:
+                    self.list_table(cursor, table)
+                    continue
+
+                for name, moved in ensure_partitions(cursor, model, options['ahead']):
+                    note = f' ({moved} rows moved from the default partition)' if moved else ''
+                    self.stdout.write(f'Created {name}{note}')
+
+                if options['detach_before']:
+                    archive_schema = None if options['drop'] else options['archive_schema']
+                    for name in detach_partitions(cursor, model, options['detach_before'], archive_schema):
+                        action = 'dropped' if archive_schema is None else f'moved to {archive_schema}'
+                        self.stdout.write(f'Detached {name}, {action}')
+                        detached.append(name)
+
+                cursor.execute(f'SELECT count(*) FROM {table}_default')
+                stray = cursor.fetchone()[0]
+                if stray:
+                    self.stdout.write(self.style.WARNING(
+                        f'{table}_default holds {stray} rows outside every partition'
+                    ))
+
+        if detached:
+            # The detached rows are gone from the tables: drop the cached series and recount
+            invalidate_series_cache()
+            refresh_counters()
+        if not options['list']:
+            self.stdout.write(self.style.SUCCESS('Partitions are up to date'))
+
+    def list_table(self, cursor, table):
+        self.stdout.write(table)
+        for name, start, end in list_partitions(cursor, table):
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [name])
+            rows = cursor.fetchone()[0]
+            bounds = f'{start} to {end}' if start else 'default'
+            self.stdout.write(f'  {name:<40}{bounds:<28}~{max(rows, 0)} rows')
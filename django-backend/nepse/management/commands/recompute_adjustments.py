@@ -0,0 +1,28 @@
+"""
+Management command to rebuild the stored corporate-action adjustment factors
+"""
+from django.core.management.base import BaseCommand
+from nepse.adjustments import recompute_all_factors, recompute_factors
+from nepse.models import AdjustmentFactor
+
+
+class Command(BaseCommand):
+    help = 'Recompute cumulative price adjustment factors from the corporate actions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--symbol',
+            help='Only recompute this symbol (default: every symbol with corporate actions)'
+        )
+
+    def handle(self, *args, **options):
+        symbol = options['symbol']
+        if symbol:
+            count = recompute_factors(symbol.upper())
+            self.stdout.write(self.style.SUCCESS(f'Stored {count} adjustment factors for {symbol.upper()}'))
+            return
+
+        symbols = recompute_all_factors()
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {AdjustmentFactor.objects.count()} adjustment factors for {symbols} symbols'
+        ))
@@ -0,0 +1,40 @@
+"""
+Management command to re-parse stock market caps and re-assign size buckets
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from nepse.market_cap import cap_bucket_case, parse_market_cap
+from nepse.models import NEPSEStock
+from nepse.sectors import refresh_sectors
+
+
+class Command(BaseCommand):
+    help = 'Re-parse NEPSEStock.market_cap into market_cap_value and re-bucket with the current thresholds'
+
+    def handle(self, *args, **options):
+        # bulk_update() and update() skip auto_now: set updated_at so incremental archive exports see the rows
+        now = timezone.now()
+        with transaction.atomic():
+            # Rows written with queryset.update() or raw SQL skipped NEPSEStock.save()
+            changed = []
+            for stock in NEPSEStock.objects.only('id', 'market_cap', 'market_cap_value'):
+                value = parse_market_cap(stock.market_cap)
+                if value != stock.market_cap_value:
+                    stock.market_cap_value = value
+                    stock.updated_at = now
+                    changed.append(stock)
+            NEPSEStock.objects.bulk_update(changed, ['market_cap_value', 'updated_at'], batch_size=500)
+            NEPSEStock.objects.exclude(cap_bucket=cap_bucket_case()).update(cap_bucket=cap_bucket_case(), updated_at=now)
+        # The sector market caps and cap-weighted changes are precomputed from these columns
+        refresh_sectors()
+
+        self.stdout.write(f'Re-parsed {len(changed)} market caps')
+        buckets = NEPSEStock.objects.values_list('cap_bucket').annotate(count=Count('id')).order_by('cap_bucket')
+        for bucket, count in buckets:
+            self.stdout.write(f'  {bucket or "unknown"}: {count} stocks')
+        self.stdout.write(self.style.SUCCESS(
+            f'Buckets: large from {settings.NEPSE_LARGE_CAP_MIN:,}, mid from {settings.NEPSE_MID_CAP_MIN:,} rupees'
+        ))
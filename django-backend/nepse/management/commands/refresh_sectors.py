@@ -0,0 +1,23 @@
+"""
+Management command to rebuild the sector table from the stocks
+"""
+from django.core.management.base import BaseCommand, CommandError
+from nepse.models import NEPSEStock, Sector
+from nepse.sectors import sync_sectors
+
+
+class Command(BaseCommand):
+    help = 'Create missing sectors, link every stock to its sector and recompute the sector aggregates'
+
+    def handle(self, *args, **options):
+        try:
+            count = sync_sectors(Sector, NEPSEStock)
+        except Exception as e:
+            raise CommandError(f'Error refreshing sectors: {str(e)}')
+
+        for sector in Sector.objects.all():
+            self.stdout.write(f'  {sector.slug:<36}{sector.stock_count:>5} stocks')
+        unlinked = NEPSEStock.objects.filter(sector_ref__isnull=True).count()
+        if unlinked:
+            self.stdout.write(self.style.WARNING(f'{unlinked} stocks have no sector'))
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {count} sectors'))
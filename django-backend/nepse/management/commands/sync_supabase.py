@@ -0,0 +1,53 @@
+"""
+Management command to sync the NEPSE tables into the Supabase database
+"""
+from django.core.management.base import BaseCommand, CommandError
+from nepse.supabase_sync import SYNC_TABLES, SupabaseSync
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy rows changed since the last sync into the Supabase tables (SUPABASE_DATABASE_SCHEMA.sql) '
+        'with COPY into staging tables and one INSERT ... ON CONFLICT merge per table'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dsn',
+            help='Target Postgres connection string (default: SUPABASE_SYNC_URL)'
+        )
+        parser.add_argument(
+            '--tables',
+            nargs='+',
+            choices=list(SYNC_TABLES),
+            help='Tables to sync (default: all)'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the watermarks and resend every row'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Rows fetched from the Django database per round trip (default: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        syncer = SupabaseSync(dsn=options['dsn'], chunk_size=options['chunk_size'])
+        try:
+            results = syncer.sync(tables=options['tables'], full=options['full'])
+        except Exception as e:
+            raise CommandError(f'Error syncing to Supabase: {str(e)}')
+
+        total = 0
+        for table, result in results.items():
+            since = result['since'].isoformat() if result['since'] else 'the beginning'
+            self.stdout.write(
+                f"{table}: {result['rows']} rows changed since {since}, {result['merged']} merged "
+                f"(copy {result['copy_seconds']:.2f}s, merge {result['merge_seconds']:.2f}s, "
+                f"{result['rows_per_second']:.0f} rows/s)"
+            )
+            total += result['rows']
+        self.stdout.write(self.style.SUCCESS(f'Synced {total} rows to Supabase'))
@@ -1,5 +1,9 @@
 from django.core.management.base import BaseCommand
+from nepse.ingestion import IngestionStats
 from nepse.services import NEPSEDataService
+from nepse.services_simple import invalidate_series_cache
+from nepse.snapshots import publish_snapshots_after_update
+from nepse.archive import export_archive_after_update
 
 
 class Command(BaseCommand):
@@ -28,31 +32,66 @@ class Command(BaseCommand):
         self.stdout.write(f'Updating NEPSE data: {update_type} from {source}')
         
         service = NEPSEDataService()
+        stats = IngestionStats(update_type)
+        failed = []
         
         if source in ['kaggle', 'both']:
             self.stdout.write('Fetching data from Kaggle...')
-            if service.fetch_kaggle_data():
+            if service.fetch_kaggle_data(stats):
                 self.stdout.write('Processing Kaggle data...')
-                service.process_historical_data()
-                self.stdout.write(
-                    self.style.SUCCESS('Successfully processed Kaggle data')
-                )
+                if service.process_historical_data(stats):
+                    self.stdout.write(
+                        self.style.SUCCESS('Successfully processed Kaggle data')
+                    )
+                else:
+                    failed.append('kaggle')
+                    self.stdout.write(
+                        self.style.ERROR('Failed to process Kaggle data')
+                    )
             else:
+                failed.append('kaggle')
                 self.stdout.write(
                     self.style.ERROR('Failed to fetch Kaggle data')
                 )
         
         if source in ['live', 'both']:
             self.stdout.write('Fetching live data...')
-            if service.fetch_live_data():
+            if service.fetch_live_data(stats):
                 self.stdout.write(
                     self.style.SUCCESS('Successfully updated live data')
                 )
             else:
+                failed.append('live')
                 self.stdout.write(
                     self.style.ERROR('Failed to fetch live data')
                 )
         
+        if not failed:
+            status = 'success'
+        elif len(failed) < (2 if source == 'both' else 1):
+            status = 'partial'
+        else:
+            status = 'failed'
+        
+        if status != 'failed':
+            # Link new stocks to their sectors before they are published and archived
+            stats.post_write()
+        with stats.stage('cache_warm'):
+            invalidate_series_cache()
+            manifest = publish_snapshots_after_update()
+        if manifest:
+            self.stdout.write(f"Published static snapshots version {manifest['version']}")
+        with stats.stage('backup'):
+            archived = export_archive_after_update()
+        if archived:
+            self.stdout.write(f"Archived {sum(result['rows'] for result in archived.values())} changed rows")
+        
+        log = stats.log(status, error_message=f"Failed sources: {', '.join(failed)}" if failed else None)
+        stage_times = ', '.join(f'{name} {seconds:.2f}s' for name, seconds in log.stats['stages'].items())
+        self.stdout.write(
+            f"{log.stats['rows_written']} rows written in {log.stats['duration_seconds']:.2f}s ({stage_times})"
+        )
+        
         self.stdout.write(
             self.style.SUCCESS(f'Data update completed for {update_type}')
         )
@@ -0,0 +1,108 @@
+"""
+Numeric market capitalisation and size buckets of listed stocks.
+
+Sources report market cap as display strings ('45B', '1.2 Arba', '850 Cr',
+'12,500,000,000'). NEPSEStock keeps that string in market_cap and, on every
+write, the parsed amount in whole rupees in market_cap_value (indexed) and
+its large/mid/small size bucket in cap_bucket, so size screens, ordering and
+cap-weighted sector figures run in SQL.
+
+Bucket boundaries are NEPSE_LARGE_CAP_MIN and NEPSE_MID_CAP_MIN; after
+changing them re-bucket the stored rows with python manage.py
+refresh_market_caps.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.expressions import ExpressionWrapper
+from django.db.models.functions import NullIf
+
+LARGE_CAP = 'large'
+MID_CAP = 'mid'
+SMALL_CAP = 'small'
+CAP_BUCKETS = [
+    (LARGE_CAP, 'Large Cap'),
+    (MID_CAP, 'Mid Cap'),
+    (SMALL_CAP, 'Small Cap'),
+]
+
+# Unit suffix -> rupees, including the Nepali lakh, crore and arba
+UNITS = {
+    '': 1,
+    'k': 10 ** 3, 'thousand': 10 ** 3,
+    'l': 10 ** 5, 'lakh': 10 ** 5, 'lakhs': 10 ** 5,
+    'm': 10 ** 6, 'mn': 10 ** 6, 'million': 10 ** 6,
+    'cr': 10 ** 7, 'crore': 10 ** 7, 'crores': 10 ** 7,
+    'b': 10 ** 9, 'bn': 10 ** 9, 'billion': 10 ** 9, 'arba': 10 ** 9,
+    't': 10 ** 12, 'trillion': 10 ** 12,
+}
+
+MARKET_CAP_PATTERN = re.compile(r'^(?:rs\.?|npr)?\s*([0-9][0-9,]*(?:\.[0-9]+)?)\s*([a-z]*)\.?$')
+
+
+def parse_market_cap(value):
+    """Whole rupees of a reported market cap ('45B', '850 Cr', 1.2e10...), None when it cannot be read"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        amount, unit = value, ''
+    else:
+        match = MARKET_CAP_PATTERN.match(str(value).strip().lower())
+        if not match or match.group(2) not in UNITS:
+            return None
+        amount, unit = match.group(1).replace(',', ''), match.group(2)
+    try:
+        # Through str() so 1.2 with a 'B' unit is 1200000000, not the float's binary expansion
+        rupees = Decimal(str(amount)) * UNITS[unit]
+    except InvalidOperation:
+        return None
+    return int(rupees) if rupees.is_finite() and rupees >= 0 else None
+
+
+def cap_bucket(market_cap_value):
+    """Size bucket of a market cap in rupees, '' when it is unknown"""
+    if market_cap_value is None:
+        return ''
+    if market_cap_value >= settings.NEPSE_LARGE_CAP_MIN:
+        return LARGE_CAP
+    if market_cap_value >= settings.NEPSE_MID_CAP_MIN:
+        return MID_CAP
+    return SMALL_CAP
+
+
+def cap_bucket_case():
+    """cap_bucket computed by the database from market_cap_value, for re-bucketing in one UPDATE"""
+    return Case(
+        When(market_cap_value__isnull=True, then=Value('')),
+        When(market_cap_value__gte=settings.NEPSE_LARGE_CAP_MIN, then=Value(LARGE_CAP)),
+        When(market_cap_value__gte=settings.NEPSE_MID_CAP_MIN, then=Value(MID_CAP)),
+        default=Value(SMALL_CAP),
+    )
+
+
+def cap_weighted(field):
+    """Market-cap-weighted average of a column over each group, NULL when no member has a market cap"""
+    weighted = ExpressionWrapper(F(field) * F('market_cap_value'), output_field=FloatField())
+    return ExpressionWrapper(
+        Sum(weighted) / NullIf(Sum('market_cap_value', output_field=FloatField()), Value(0.0)),
+        output_field=FloatField(),
+    )
+
+
+def sector_cap_aggregates():
+    """Annotations for NEPSEStock.objects.values('sector'): member count, total and cap-weighted change"""
+    return {
+        'stock_count': Count('id'),
+        'total_market_cap': Sum('market_cap_value'),
+        'cap_weighted_change': cap_weighted('change_percent'),
+    }
+
+
+def with_cap_shares(rows):
+    """Add each row's share of the summed total_market_cap, in percent"""
+    rows = list(rows)
+    total = sum(row['total_market_cap'] or 0 for row in rows)
+    for row in rows:
+        row['market_cap_share'] = round((row['total_market_cap'] or 0) / total * 100, 2) if total else 0.0
+    return rows
@@ -0,0 +1,407 @@
+"""
+Prometheus text-format metrics for the API and data ingestion.
+
+Each WSGI worker process keeps its counters and histograms in memory and
+periodically writes them to its own file in NEPSE_METRICS_DIR (atomically, via
+rename). A scrape of /metrics, served by any worker, merges every worker file
+with its own live values, so totals are correct under gunicorn/uWSGI no matter
+which worker answers. Files of workers that have exited (recycled by
+max_requests, restarted) are folded into one metrics-dead.json at scrape
+time, so the directory does not grow with every worker ever started and the
+counters never go backwards. Data staleness and ingestion gauges are read from the
+database at scrape time, from the maintained dataset counters rather than by
+scanning the data tables.
+"""
+import atexit
+import calendar
+import json
+import os
+import re
+import threading
+import time
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils import timezone
+from .counters import get_counters
+from .models import DataUpdateLog
+import logging
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+WORKER_FILE = re.compile(r'^metrics-(\d+)-\d+\.json$')
+DEAD_WORKERS_FILE = 'metrics-dead.json'
+LOCK_FILE = '.metrics.lock'
+
+REQUEST_DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+HELP = {
+    'nepse_http_requests_total': ('counter', 'HTTP requests by route, method and status'),
+    'nepse_http_request_duration_seconds': ('histogram', 'HTTP request latency by route'),
+    'nepse_http_requests_sampled_total': ('counter', 'Requests measured for DB metrics by route'),
+    'nepse_db_queries_total': ('counter', 'DB queries run by sampled requests by route'),
+    'nepse_db_query_seconds_total': ('counter', 'DB time spent by sampled requests by route'),
+    'nepse_cache_requests_total': ('counter', 'Application cache lookups by cache and result'),
+    'nepse_db_connections_opened_total': ('counter', 'New database connections by alias'),
+    'nepse_db_connections_reused_total': ('counter', 'Requests that started on an open persistent connection'),
+    'nepse_db_connections_overflow_total': ('counter', 'Connections closed after their request because the pool was full'),
+    'nepse_db_connection_pool_size': ('gauge', 'Maximum persistent connections per process'),
+    'nepse_db_connection_max_age_seconds': ('gauge', 'Seconds a persistent connection is kept (CONN_MAX_AGE)'),
+    'nepse_ingestion_runs_total': ('counter', 'Data update runs by update type and status'),
+    'nepse_ingestion_last_duration_seconds': ('gauge', 'Duration of the last successful update'),
+    'nepse_ingestion_last_records': ('gauge', 'Records written by the last successful update'),
+    'nepse_ingestion_last_rows_per_second': ('gauge', 'Throughput of the last successful update'),
+    'nepse_ingestion_last_stage_seconds': ('gauge', 'Time spent in each stage of the last successful update'),
+    'nepse_ingestion_last_peak_memory_bytes': ('gauge', 'Peak resident memory of the last successful update'),
+    'nepse_data_age_seconds': ('gauge', 'Seconds since each dataset was last updated'),
+    'nepse_data_latest_date_timestamp': ('gauge', 'Latest trading date present in each dataset'),
+    'nepse_data_rows': ('gauge', 'Rows in each dataset as of the last counter refresh'),
+}
+
+
+class MetricsRegistry:
+    """Per-process counters and histograms, shared across workers through files"""
+
+    def __init__(self, directory=None, flush_interval=None):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.started = int(time.time() * 1000)
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = 0.0
+        self.dirty = False
+
+    def _check_fork(self):
+        """A forked worker must not inherit (and re-export) its parent's values"""
+        if os.getpid() != self.pid:
+            self._reset()
+
+    @property
+    def path(self):
+        return os.path.join(self._directory(), f"metrics-{self.pid}-{self.started}.json")
+
+    def _directory(self):
+        if self.directory is None:
+            self.directory = str(getattr(settings, 'NEPSE_METRICS_DIR', '') or '')
+        return self.directory
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            self.counters[key] = self.counters.get(key, 0) + value
+            self.dirty = True
+        self._maybe_flush()
+
+    def observe(self, name, labels, value, buckets=REQUEST_DURATION_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = {'bounds': buckets, 'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+                self.histograms[key] = histogram
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+            self.dirty = True
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        interval = self.flush_interval
+        if interval is None:
+            interval = getattr(settings, 'NEPSE_METRICS_FLUSH_INTERVAL', 1.0)
+        if self._directory() and time.monotonic() - self.last_flush >= interval:
+            self.flush()
+
+    def _state(self):
+        return {
+            'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+            'histograms': [[name, labels, h] for (name, labels), h in self.histograms.items()],
+        }
+
+    def flush(self):
+        """Write this process's values to its file via an atomic rename"""
+        directory = self._directory()
+        if not directory:
+            return
+        with self._lock:
+            if not self.dirty:
+                return
+            state = self._state()
+            self.dirty = False
+            self.last_flush = time.monotonic()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            # Read-only or missing filesystem: keep metrics per-process only
+            logger.error(f"Error writing metrics file, disabling metrics files: {str(e)}")
+            self.directory = ''
+
+    def collect(self):
+        """Merge the live values of this process with every other worker's file"""
+        with self._lock:
+            self._check_fork()
+            states = [self._state()]
+        own_file = os.path.basename(self.path)
+        directory = self._directory()
+        if directory and os.path.isdir(directory):
+            with _directory_lock(directory, exclusive=False):
+                for filename in os.listdir(directory):
+                    if not filename.endswith('.json') or filename == own_file:
+                        continue
+                    state = _read_state(os.path.join(directory, filename))
+                    if state is not None:
+                        states.append(state)
+        return merge_states(states)
+
+
+def merge_states(states):
+    """Sum the counters and histograms of several worker states"""
+    counters, histograms = {}, {}
+    for state in states:
+        for name, labels, value in state['counters']:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, h in state['histograms']:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.setdefault(
+                key, {'bounds': h['bounds'], 'buckets': [0] * len(h['bounds']), 'sum': 0.0, 'count': 0}
+            )
+            merged['buckets'] = [a + b for a, b in zip(merged['buckets'], h['buckets'])]
+            merged['sum'] += h['sum']
+            merged['count'] += h['count']
+    return counters, histograms
+
+
+def _read_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _directory_lock:
+    """flock on the metrics directory: shared for readers, exclusive while compacting"""
+
+    def __init__(self, directory, exclusive):
+        self.path = os.path.join(directory, LOCK_FILE)
+        self.mode = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) if fcntl else None
+        self.file = None
+
+    def __enter__(self):
+        if fcntl is None:
+            return self
+        try:
+            self.file = open(self.path, 'a')
+            fcntl.flock(self.file, self.mode)
+        except OSError:
+            self.file = None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.file is not None:
+            self.file.close()  # releases the lock
+
+
+def compact_dead_workers(directory):
+    """Fold the files of exited workers into DEAD_WORKERS_FILE, returns the number removed"""
+    if fcntl is None or not directory or not os.path.isdir(directory):
+        return 0
+    with _directory_lock(directory, exclusive=True) as lock:
+        if lock.file is None:
+            return 0
+        dead = [
+            filename for filename in os.listdir(directory)
+            if (match := WORKER_FILE.match(filename)) and not _pid_alive(int(match.group(1)))
+        ]
+        if not dead:
+            return 0
+        dead_path = os.path.join(directory, DEAD_WORKERS_FILE)
+        states = [_read_state(os.path.join(directory, filename)) for filename in [DEAD_WORKERS_FILE] + dead]
+        counters, histograms = merge_states(state for state in states if state is not None)
+        try:
+            tmp_path = f"{dead_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({
+                    'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+                    'histograms': [[name, labels, h] for (name, labels), h in histograms.items()],
+                }, f)
+            os.replace(tmp_path, dead_path)
+            for filename in dead:
+                os.remove(os.path.join(directory, filename))
+        except OSError as e:
+            logger.error(f"Error compacting metrics files: {str(e)}")
+            return 0
+        return len(dead)
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush)
+
+
+def record_request(route, method, status, duration):
+    """Count a request and observe its latency"""
+    registry.inc('nepse_http_requests_total', {'route': route, 'method': method, 'status': str(status)})
+    registry.observe('nepse_http_request_duration_seconds', {'route': route, 'method': method}, duration)
+
+
+def record_queries(route, count, duration):
+    """Add the DB usage of a sampled request"""
+    registry.inc('nepse_http_requests_sampled_total', {'route': route})
+    registry.inc('nepse_db_queries_total', {'route': route}, count)
+    registry.inc('nepse_db_query_seconds_total', {'route': route}, duration)
+
+
+def record_cache(cache_name, hit):
+    """Count an application cache lookup"""
+    registry.inc('nepse_cache_requests_total', {'cache': cache_name, 'result': 'hit' if hit else 'miss'})
+
+
+def record_connection(alias, event):
+    """Count a database connection event: 'opened', 'reused' or 'overflow'"""
+    registry.inc(f'nepse_db_connections_{event}_total', {'alias': alias})
+
+
+def connection_gauges():
+    """Connection pool configuration of each database"""
+    samples = []
+    pool_size = getattr(settings, 'DATABASE_CONNECTION_POOL_SIZE', None)
+    for alias, database in settings.DATABASES.items():
+        labels = (('alias', alias),)
+        max_age = database.get('CONN_MAX_AGE', 0)
+        if max_age is not None:
+            samples.append(('nepse_db_connection_max_age_seconds', labels, max_age))
+        if pool_size:
+            samples.append(('nepse_db_connection_pool_size', labels, pool_size))
+    return samples
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def database_gauges():
+    """Ingestion and staleness samples read from the database at scrape time"""
+    samples = []
+    now = timezone.now()
+
+    for row in DataUpdateLog.objects.values('update_type', 'status').annotate(n=Count('id')):
+        samples.append(('nepse_ingestion_runs_total',
+                        (('status', row['status']), ('update_type', row['update_type'])), row['n']))
+
+    latest_ids = DataUpdateLog.objects.filter(
+        status='success', completed_at__isnull=False
+    ).values('update_type').annotate(last_id=Max('id')).values_list('last_id', flat=True)
+    for log in DataUpdateLog.objects.filter(id__in=list(latest_ids)):
+        labels = (('update_type', log.update_type),)
+        duration = max((log.completed_at - log.started_at).total_seconds(), 0.0)
+        samples.append(('nepse_ingestion_last_duration_seconds', labels, duration))
+        samples.append(('nepse_ingestion_last_records', labels, log.records_updated))
+        samples.append(('nepse_ingestion_last_rows_per_second', labels,
+                        log.records_updated / duration if duration else 0.0))
+        for stage, seconds in log.stats.get('stages', {}).items():
+            samples.append(('nepse_ingestion_last_stage_seconds', labels + (('stage', stage),), seconds))
+        if log.stats.get('peak_memory_bytes'):
+            samples.append(('nepse_ingestion_last_peak_memory_bytes', labels, log.stats['peak_memory_bytes']))
+
+    for dataset, counter in get_counters().items():
+        if counter.last_updated_at is None:
+            continue
+        labels = (('dataset', dataset),)
+        samples.append(('nepse_data_age_seconds', labels, (now - counter.last_updated_at).total_seconds()))
+        samples.append(('nepse_data_rows', labels, counter.row_count))
+        if counter.latest_date:
+            samples.append(('nepse_data_latest_date_timestamp', labels,
+                            calendar.timegm(counter.latest_date.timetuple())))
+    return samples
+
+
+def render_metrics():
+    """Render all metrics in the Prometheus text exposition format"""
+    counters, histograms = registry.collect()
+
+    # metric name -> [(labels, [(sample name, labels, value), ...])]
+    series = {}
+    for (name, labels), value in counters.items():
+        series.setdefault(name, []).append((labels, [(name, labels, value)]))
+    for (name, labels), h in histograms.items():
+        lines = [
+            (f'{name}_bucket', labels + (('le', repr(float(bound))),), count)
+            for bound, count in zip(h['bounds'], h['buckets'])
+        ]
+        lines.append((f'{name}_bucket', labels + (('le', '+Inf'),), h['count']))
+        lines.append((f'{name}_sum', labels, h['sum']))
+        lines.append((f'{name}_count', labels, h['count']))
+        series.setdefault(name, []).append((labels, lines))
+    for name, labels, value in connection_gauges():
+        series.setdefault(name, []).append((labels, [(name, labels, value)]))
+    try:
+        for name, labels, value in database_gauges():
+            series.setdefault(name, []).append((labels, [(name, labels, value)]))
+    except Exception as e:
+        logger.error(f"Error collecting database metrics: {str(e)}")
+
+    output = []
+    for name in sorted(series):
+        metric_type, help_text = HELP.get(name, ('untyped', name))
+        output.append(f'# HELP {name} {help_text}')
+        output.append(f'# TYPE {name} {metric_type}')
+        for labels, lines in sorted(series[name], key=lambda entry: entry[0]):
+            for sample_name, sample_labels, value in lines:
+                output.append(f'{sample_name}{_format_labels(sample_labels)} {_format_value(value)}')
+    return '\n'.join(output) + '\n'
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Open to staff users and to requests with the
+    NEPSE_METRICS_TOKEN bearer token; without a token it is only public when DEBUG is on.
+    """
+    token = getattr(settings, 'NEPSE_METRICS_TOKEN', '')
+    user = getattr(request, 'user', None)
+    if token:
+        allowed = request.headers.get('Authorization') == f'Bearer {token}'
+    else:
+        allowed = settings.DEBUG
+    if not (allowed or (user is not None and user.is_staff)):
+        return HttpResponseForbidden('Forbidden')
+    compact_dead_workers(registry._directory())
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,182 @@
+"""
+Request instrumentation middleware for the NEPSE API
+"""
+import random
+import threading
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from .metrics import record_queries, record_request
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds per recorded measure
+HISTOGRAM_BUCKETS = {
+    'duration_ms': [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000],
+    'db_ms': [1, 5, 10, 25, 50, 100, 250, 500, 1000],
+    'queries': [0, 1, 2, 5, 10, 20, 50, 100],
+    'render_ms': [1, 5, 10, 25, 50, 100, 250],
+    'response_bytes': [1000, 10000, 50000, 100000, 500000, 1000000],
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram with count and sum"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                break
+        else:
+            i = len(self.bounds)
+        self.buckets[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 3),
+            'mean': round(self.sum / self.count, 3) if self.count else 0,
+            'buckets': {
+                **{str(bound): n for bound, n in zip(self.bounds, self.buckets)},
+                '+Inf': self.buckets[-1],
+            },
+        }
+
+
+class EndpointStats:
+    """Per-endpoint histograms of the measures recorded for each sampled request"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, measures):
+        with self._lock:
+            histograms = self._endpoints.get(endpoint)
+            if histograms is None:
+                histograms = {name: Histogram(bounds) for name, bounds in HISTOGRAM_BUCKETS.items()}
+                self._endpoints[endpoint] = histograms
+            for name, value in measures.items():
+                histograms[name].observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {name: histogram.as_dict() for name, histogram in histograms.items()}
+                for endpoint, histograms in self._endpoints.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+endpoint_stats = EndpointStats()
+
+
+class QueryTimer:
+    """Database execute wrapper counting queries and their total time"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, DB time, render time and response size per view.
+
+    Only a sampled fraction of requests (NEPSE_REQUEST_METRICS_SAMPLE_RATE) is
+    measured and aggregated into endpoint_stats; requests that are not sampled
+    only have their latency recorded for /metrics. In DEBUG or for staff users
+    every request is measured and the numbers are returned in a Server-Timing
+    header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'NEPSE_REQUEST_METRICS_ENABLED', True)
+        self.sample_rate = getattr(settings, 'NEPSE_REQUEST_METRICS_SAMPLE_RATE', 1.0)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        sampled = random.random() < self.sample_rate
+        server_timing = settings.DEBUG or getattr(getattr(request, 'user', None), 'is_staff', False)
+        if not sampled and not server_timing:
+            # Request count and latency are cheap enough to record for every request
+            start = time.perf_counter()
+            response = self.get_response(request)
+            record_request(self._route(request), request.method, response.status_code,
+                           time.perf_counter() - start)
+            return response
+
+        timer = QueryTimer()
+        request._metrics_render_started = None
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        render_started = request._metrics_render_started
+        render_finished = getattr(request, '_metrics_render_finished', None)
+        render_ms = (render_finished - render_started) * 1000 if render_started and render_finished else 0.0
+        size = len(response.content) if not response.streaming else 0
+        measures = {
+            'duration_ms': duration * 1000,
+            'db_ms': timer.duration * 1000,
+            'queries': timer.count,
+            'render_ms': render_ms,
+            'response_bytes': size,
+        }
+
+        route = self._route(request)
+        record_request(route, request.method, response.status_code, duration)
+        if sampled:
+            endpoint_stats.record(f"{request.method} {route}", measures)
+            record_queries(route, timer.count, timer.duration)
+        if server_timing:
+            response['Server-Timing'] = (
+                f'db;dur={measures["db_ms"]:.2f};desc="{timer.count} queries", '
+                f'render;dur={render_ms:.2f}, '
+                f'total;dur={measures["duration_ms"]:.2f}'
+            )
+            response['X-Response-Bytes'] = str(size)
+        return response
+
+    def process_template_response(self, request, response):
+        """DRF responses are rendered right after this hook; time the render"""
+        if hasattr(request, '_metrics_render_started'):
+            request._metrics_render_started = time.perf_counter()
+
+            def render_finished(rendered):
+                request._metrics_render_finished = time.perf_counter()
+
+            response.add_post_render_callback(render_finished)
+        return response
+
+    def _route(self, request):
+        """Resolved URL name of the request, e.g. 'nepse-index-chart-data'"""
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match else 'unresolved'
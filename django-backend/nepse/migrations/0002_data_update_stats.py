@@ -0,0 +1,23 @@
+# Generated by Django 5.0.8 on 2026-10-19 15:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nepse', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataupdatelog',
+            name='stats',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='dataupdatelog',
+            name='update_type',
+            field=models.CharField(choices=[('index', 'Index Data'), ('stocks', 'Stock Data'), ('indices', 'Indices Data'), ('all', 'All Data'), ('full_update', 'Full Update'), ('kaggle_import', 'Kaggle Import')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.8 on 2026-10-19 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nepse', '0002_data_update_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dataset', models.CharField(max_length=20, unique=True)),
+                ('row_count', models.BigIntegerField(default=0)),
+                ('latest_date', models.DateField(blank=True, null=True)),
+                ('last_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['dataset'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='dataupdatelog',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.8 on 2026-10-19 15:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nepse', '0003_dataset_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='nepseindices',
+            index=models.Index(fields=['date'], name='nepse_indices_date_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.0.8 on 2026-10-19 16:40
+
+from django.db import migrations, models
+from django.db.models import F, FloatField, Value
+from django.db.models.expressions import ExpressionWrapper
+from django.db.models.functions import Round
+import nepse.fields
+
+# Model -> price columns moved from DECIMAL(10, 2) to integer paisa
+PRICE_FIELDS = {
+    'nepseindex': ['open_price', 'high_price', 'low_price', 'close_price'],
+    'nepsestock': ['current_price', 'change', 'high_52w', 'low_52w'],
+    'nepseindices': ['current', 'change', 'high_52w', 'low_52w'],
+}
+
+
+def to_paisa(apps, schema_editor):
+    """One UPDATE per table: rupees * 100, rounded so REAL-stored decimals (SQLite) land on whole paisa"""
+    for model_name, fields in PRICE_FIELDS.items():
+        model = apps.get_model('nepse', model_name)
+        model.objects.using(schema_editor.connection.alias).update(
+            **{f'{field}_paisa': Round(F(field) * 100) for field in fields}
+        )
+
+
+def to_rupees(apps, schema_editor):
+    for model_name, fields in PRICE_FIELDS.items():
+        model = apps.get_model('nepse', model_name)
+        model.objects.using(schema_editor.connection.alias).update(**{
+            field: ExpressionWrapper(F(f'{field}_paisa') / Value(100.0), output_field=FloatField())
+            for field in fields
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nepse', '0004_partition_history_tables'),
+    ]
+
+    # Nullable while both columns exist, so the migration can be reversed on tables with rows
+    operations = [
+        migrations.AlterField(
+            model_name=model_name,
+            name=field,
+            field=models.DecimalField(max_digits=10, decimal_places=2, null=True),
+        )
+        for model_name, fields in PRICE_FIELDS.items() for field in fields
+    ] + [
+        migrations.AddField(
+            model_name=model_name,
+            name=f'{field}_paisa',
+            field=nepse.fields.PaisaField(null=True),
+        )
+        for model_name, fields in PRICE_FIELDS.items() for field in fields
+    ] + [
+        migrations.RunPython(to_paisa, to_rupees),
+    ] + [
+        migrations.RemoveField(model_name=model_name, name=field)
+        for model_name, fields in PRICE_FIELDS.items() for field in fields
+    ] + [
+        migrations.RenameField(model_name=model_name, old_name=f'{field}_paisa', new_name=field)
+        for model_name, fields in PRICE_FIELDS.items() for field in fields
+    ] + [
+        migrations.AlterField(
+            model_name=model_name,
+            name=field,
+            field=nepse.fields.PaisaField(),
+        )
+        for model_name, fields in PRICE_FIELDS.items() for field in fields
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.8 on 2026-10-19 16:11
+
+from django.db import migrations, models
+from nepse.market_cap import cap_bucket, parse_market_cap
+
+
+def parse_market_caps(apps, schema_editor):
+    """Fill the numeric market cap and size bucket of existing rows from their market_cap strings"""
+    NEPSEStock = apps.get_model('nepse', 'NEPSEStock')
+    stocks = list(NEPSEStock.objects.using(schema_editor.connection.alias).only('id', 'market_cap'))
+    for stock in stocks:
+        stock.market_cap_value = parse_market_cap(stock.market_cap)
+        stock.cap_bucket = cap_bucket(stock.market_cap_value)
+    NEPSEStock.objects.using(schema_editor.connection.alias).bulk_update(
+        stocks, ['market_cap_value', 'cap_bucket'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nepse', '0005_prices_as_paisa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nepsestock',
+            name='cap_bucket',
+            field=models.CharField(blank=True, choices=[('large', 'Large Cap'), ('mid', 'Mid Cap'), ('small', 'Small Cap')], max_length=5),
+        ),
+        migrations.AddField(
+            model_name='nepsestock',
+            name='market_cap_value',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='nepsestock',
+            index=models.Index(fields=['market_cap_value'], name='nepse_stock_mcap_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nepsestock',
+            index=models.Index(fields=['cap_bucket', 'market_cap_value'], name='nepse_stock_bucket_mcap_idx'),
+        ),
+        migrations.RunPython(parse_market_caps, migrations.RunPython.noop),
+    ]
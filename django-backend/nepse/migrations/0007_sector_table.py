@@ -0,0 +1,47 @@
+# Generated by Django 5.0.8 on 2026-10-19 16:14
+
+import django.db.models.deletion
+from nepse.sectors import sync_sectors
+
+
+def create_sectors(apps, schema_editor):
+    """One Sector per canonical sector name of the existing stocks, with its aggregates"""
+    sync_sectors(apps.get_model('nepse', 'Sector'), apps.get_model('nepse', 'NEPSEStock'))
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nepse', '0006_stock_market_cap_value'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sector',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('slug', models.SlugField(max_length=100, unique=True)),
+                ('stock_count', models.IntegerField(default=0)),
+                ('advancers', models.IntegerField(default=0)),
+                ('decliners', models.IntegerField(default=0)),
+                ('total_volume', models.BigIntegerField(default=0)),
+                ('total_turnover', models.BigIntegerField(default=0)),
+                ('total_market_cap', models.BigIntegerField(default=0)),
+                ('avg_change', models.FloatField(blank=True, null=True)),
+                ('cap_weighted_change', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='nepsestock',
+            name='sector_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stocks', to='nepse.sector'),
+        ),
+        migrations.RunPython(create_sectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.0.8 on 2026-10-19 16:22
+
+import nepse.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nepse', '0008_market_holidays'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdjustmentFactor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=10)),
+                ('ex_date', models.DateField()),
+                ('factor', models.FloatField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['symbol', 'ex_date'],
+                'unique_together': {('symbol', 'ex_date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CorporateAction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(db_index=True, max_length=10)),
+                ('action_type', models.CharField(choices=[('bonus', 'Bonus Shares'), ('rights', 'Rights Shares'), ('split', 'Stock Split')], max_length=10)),
+                ('ex_date', models.DateField()),
+                ('ratio', models.DecimalField(decimal_places=6, max_digits=10)),
+                ('rights_price', nepse.fields.PaisaField(blank=True, null=True)),
+                ('reference_close', nepse.fields.PaisaField(blank=True, null=True)),
+                ('description', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['symbol', 'ex_date'],
+                'unique_together': {('symbol', 'action_type', 'ex_date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StockPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=10)),
+                ('date', models.DateField()),
+                ('close', nepse.fields.PaisaField()),
+                ('volume', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['symbol', 'date'],
+                'unique_together': {('symbol', 'date')},
+            },
+        ),
+    ]
@@ -1,14 +1,16 @@
 from django.db import models
 from django.utils import timezone
+from .fields import PaisaField
+from .market_cap import CAP_BUCKETS, cap_bucket, parse_market_cap
 
 
 class NEPSEIndex(models.Model):
     """Model for NEPSE Index data"""
     date = models.DateField()
-    open_price = models.DecimalField(max_digits=10, decimal_places=2)
-    high_price = models.DecimalField(max_digits=10, decimal_places=2)
-    low_price = models.DecimalField(max_digits=10, decimal_places=2)
-    close_price = models.DecimalField(max_digits=10, decimal_places=2)
+    open_price = PaisaField()
+    high_price = PaisaField()
+    low_price = PaisaField()
+    close_price = PaisaField()
     volume = models.BigIntegerField()
     turnover = models.BigIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
@@ -22,19 +24,46 @@ class NEPSEIndex(models.Model):
         return f"NEPSE Index - {self.date}"
 
 
+class Sector(models.Model):
+    """Listed sector with per-sector aggregates, refreshed after every update (see nepse.sectors)"""
+    name = models.CharField(max_length=100, unique=True)
+    slug = models.SlugField(max_length=100, unique=True)
+    stock_count = models.IntegerField(default=0)
+    advancers = models.IntegerField(default=0)
+    decliners = models.IntegerField(default=0)
+    total_volume = models.BigIntegerField(default=0)
+    total_turnover = models.BigIntegerField(default=0)
+    total_market_cap = models.BigIntegerField(default=0)
+    avg_change = models.FloatField(null=True, blank=True)
+    cap_weighted_change = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
 class NEPSEStock(models.Model):
     """Model for individual stock data"""
     symbol = models.CharField(max_length=10, unique=True)
     company_name = models.CharField(max_length=200)
     sector = models.CharField(max_length=100)
-    current_price = models.DecimalField(max_digits=10, decimal_places=2)
-    change = models.DecimalField(max_digits=10, decimal_places=2)
+    # Linked from the sector name by nepse.sectors.refresh_sectors()
+    sector_ref = models.ForeignKey(Sector, null=True, blank=True, on_delete=models.SET_NULL, related_name='stocks')
+    current_price = PaisaField()
+    change = PaisaField()
     change_percent = models.DecimalField(max_digits=5, decimal_places=2)
     volume = models.BigIntegerField()
     turnover = models.BigIntegerField()
-    high_52w = models.DecimalField(max_digits=10, decimal_places=2)
-    low_52w = models.DecimalField(max_digits=10, decimal_places=2)
+    high_52w = PaisaField()
+    low_52w = PaisaField()
     market_cap = models.CharField(max_length=20)
+    # Parsed from market_cap on save (see nepse.market_cap)
+    market_cap_value = models.BigIntegerField(null=True, blank=True)
+    cap_bucket = models.CharField(max_length=5, choices=CAP_BUCKETS, blank=True)
     pe_ratio = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     last_trade_time = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
@@ -42,20 +71,100 @@ class NEPSEStock(models.Model):
 
     class Meta:
         ordering = ['-current_price']
+        indexes = [
+            models.Index(fields=['market_cap_value'], name='nepse_stock_mcap_idx'),
+            models.Index(fields=['cap_bucket', 'market_cap_value'], name='nepse_stock_bucket_mcap_idx'),
+        ]
 
     def __str__(self):
         return f"{self.symbol} - {self.company_name}"
 
+    def save(self, *args, **kwargs):
+        self.market_cap_value = parse_market_cap(self.market_cap)
+        self.cap_bucket = cap_bucket(self.market_cap_value)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'market_cap' in update_fields:
+            # update_or_create() saves only the fields it was given
+            kwargs['update_fields'] = {*update_fields, 'market_cap_value', 'cap_bucket'}
+        super().save(*args, **kwargs)
+
+
+class StockPrice(models.Model):
+    """Daily close of a stock as traded, before corporate-action adjustment"""
+    symbol = models.CharField(max_length=10)
+    date = models.DateField()
+    close = PaisaField()
+    volume = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['symbol', 'date']
+        unique_together = ['symbol', 'date']
+
+    def __str__(self):
+        return f"{self.symbol} - {self.date}"
+
+
+class CorporateAction(models.Model):
+    """Bonus issue, rights issue or split that changes the price of a stock from its ex-date"""
+    BONUS = 'bonus'
+    RIGHTS = 'rights'
+    SPLIT = 'split'
+
+    symbol = models.CharField(max_length=10, db_index=True)
+    action_type = models.CharField(max_length=10, choices=[
+        (BONUS, 'Bonus Shares'),
+        (RIGHTS, 'Rights Shares'),
+        (SPLIT, 'Stock Split'),
+    ])
+    ex_date = models.DateField()
+    # New shares per existing share: 0.10 for a 10% bonus, 0.5 for 1:2 rights, 1 for a 2-for-1 split
+    ratio = models.DecimalField(max_digits=10, decimal_places=6)
+    # Subscription price of rights shares
+    rights_price = PaisaField(null=True, blank=True)
+    # Close on the session before the ex-date, taken from StockPrice when left empty
+    reference_close = PaisaField(null=True, blank=True)
+    description = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['symbol', 'ex_date']
+        unique_together = ['symbol', 'action_type', 'ex_date']
+
+    def __str__(self):
+        return f"{self.symbol} - {self.get_action_type_display()} - {self.ex_date}"
+
+
+class AdjustmentFactor(models.Model):
+    """
+    Cumulative price adjustment of a stock: prices dated before ex_date are
+    multiplied by factor, the product of every action from ex_date on
+    (maintained by nepse.adjustments).
+    """
+    symbol = models.CharField(max_length=10)
+    ex_date = models.DateField()
+    factor = models.FloatField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['symbol', 'ex_date']
+        unique_together = ['symbol', 'ex_date']
+
+    def __str__(self):
+        return f"{self.symbol} - {self.ex_date} - {self.factor}"
+
 
 class NEPSEIndices(models.Model):
     """Model for various NEPSE indices"""
     name = models.CharField(max_length=100)
     symbol = models.CharField(max_length=20)
-    current = models.DecimalField(max_digits=10, decimal_places=2)
-    change = models.DecimalField(max_digits=10, decimal_places=2)
+    current = PaisaField()
+    change = PaisaField()
     change_percent = models.DecimalField(max_digits=5, decimal_places=2)
-    high_52w = models.DecimalField(max_digits=10, decimal_places=2)
-    low_52w = models.DecimalField(max_digits=10, decimal_places=2)
+    high_52w = PaisaField()
+    low_52w = PaisaField()
     date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -63,6 +172,20 @@ class NEPSEIndices(models.Model):
     class Meta:
         ordering = ['-date', 'name']
         unique_together = ['name', 'date']
+        indexes = [models.Index(fields=['date'], name='nepse_indices_date_idx')]
+
+    def __str__(self):
+        return f"{self.name} - {self.date}"
+
+
+class MarketHoliday(models.Model):
+    """Weekday on which NEPSE does not trade (see nepse.trading_calendar)"""
+    date = models.DateField(unique=True)
+    name = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['date']
 
     def __str__(self):
         return f"{self.name} - {self.date}"
@@ -75,6 +198,8 @@ class DataUpdateLog(models.Model):
         ('stocks', 'Stock Data'),
         ('indices', 'Indices Data'),
         ('all', 'All Data'),
+        ('full_update', 'Full Update'),
+        ('kaggle_import', 'Kaggle Import'),
     ])
     status = models.CharField(max_length=20, choices=[
         ('success', 'Success'),
@@ -85,10 +210,27 @@ class DataUpdateLog(models.Model):
     error_message = models.TextField(blank=True, null=True)
     started_at = models.DateTimeField()
     completed_at = models.DateTimeField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Per-stage timings, row counts, bytes processed and peak memory (see nepse.ingestion)
+    stats = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         ordering = ['-created_at']
 
     def __str__(self):
         return f"{self.update_type} - {self.status} - {self.created_at}"
+
+
+class DatasetCounter(models.Model):
+    """Row count and latest timestamps per dataset, maintained by the ingestion services"""
+    dataset = models.CharField(max_length=20, unique=True)
+    row_count = models.BigIntegerField(default=0)
+    latest_date = models.DateField(null=True, blank=True)
+    last_updated_at = models.DateTimeField(null=True, blank=True)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['dataset']
+
+    def __str__(self):
+        return f"{self.dataset} - {self.row_count} rows"
@@ -0,0 +1,215 @@
+"""
+Range partitioning of the date-keyed history tables on PostgreSQL.
+
+NEPSEIndex and NEPSEIndices are partitioned on their date column, into
+yearly partitions by default or monthly ones with NEPSE_PARTITION_INTERVAL =
+'month'. A default partition catches dates outside every partition, so
+inserts never fail. Queries constrained on date only touch the matching
+partitions.
+
+Partitioning is opt-in: python manage.py manage_partitions --convert turns
+the existing tables into partitioned ones, then the same command pre-creates
+upcoming partitions and detaches old ones into an archive schema, and
+--unpartition turns them back into plain tables. PostgreSQL requires the
+partition key in every unique constraint, so a partitioned table's primary
+key is (id, date) while Django's model state still has id alone; unpartition
+before running a migration that alters these tables. Other databases keep
+plain tables.
+"""
+import re
+from datetime import date
+from django.conf import settings
+from django.utils import timezone
+
+# Model name -> partition key column
+PARTITION_KEYS = {
+    'NEPSEIndex': 'date',
+    'NEPSEIndices': 'date',
+}
+
+BOUND_RE = re.compile(r"FROM \('([\d-]+)'\) TO \('([\d-]+)'\)")
+
+
+def partition_interval():
+    return getattr(settings, 'NEPSE_PARTITION_INTERVAL', 'year')
+
+
+def period_start(day, interval):
+    """First day of the year or month containing `day`"""
+    return date(day.year, day.month, 1) if interval == 'month' else date(day.year, 1, 1)
+
+
+def next_period(start, interval):
+    if interval == 'month':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return date(start.year + 1, 1, 1)
+
+
+def periods(first_day, last_day, interval):
+    """(start, end) of every period from the one containing first_day to the one containing last_day"""
+    start = period_start(first_day, interval)
+    while start <= last_day:
+        end = next_period(start, interval)
+        yield start, end
+        start = end
+
+
+def partition_name(table, start, interval):
+    return f'{table}_m{start:%Y%m}' if interval == 'month' else f'{table}_y{start.year}'
+
+
+def upcoming_end(ahead, interval):
+    """Start of the last period to cover when keeping `ahead` periods beyond the current one"""
+    start = period_start(timezone.now().date(), interval)
+    for _ in range(ahead):
+        start = next_period(start, interval)
+    return start
+
+
+def is_partitioned(cursor, table):
+    cursor.execute('SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))', [table])
+    return cursor.fetchone()[0]
+
+
+def list_partitions(cursor, table):
+    """(name, start, end) of each partition of `table`; start and end are None for the default partition"""
+    cursor.execute(
+        'SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i '
+        'JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname',
+        [table]
+    )
+    partitions = []
+    for name, bound in cursor.fetchall():
+        match = BOUND_RE.search(bound)
+        if match:
+            partitions.append((name, date.fromisoformat(match[1]), date.fromisoformat(match[2])))
+        else:
+            partitions.append((name, None, None))
+    return partitions
+
+
+def create_partition(cursor, table, column, start, end, name):
+    """Add the partition [start, end), moving rows the default partition already holds for that range"""
+    default = f'{table}_default'
+    bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {default} WHERE {column} >= %s AND {column} < %s)', [start, end])
+    if not cursor.fetchone()[0]:
+        cursor.execute(f'CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}')
+        return 0
+    cursor.execute(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {default} WHERE {column} >= %s AND {column} < %s RETURNING *) '
+        f'INSERT INTO {name} SELECT * FROM moved',
+        [start, end]
+    )
+    moved = cursor.rowcount
+    cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {bounds}')
+    return moved
+
+
+def _add_constraints(cursor, table, primary_key, unique_together, indexes):
+    cursor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY ({", ".join(primary_key)})')
+    for columns in unique_together:
+        cursor.execute(f'ALTER TABLE {table} ADD UNIQUE ({", ".join(columns)})')
+    for name, columns in indexes:
+        cursor.execute(f'CREATE INDEX {name} ON {table} ({", ".join(columns)})')
+
+
+def _swap_table(cursor, table, old):
+    """Keep the id sequence working after the rows of `old` were copied into `table`"""
+    cursor.execute("SELECT attidentity FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'id'", [table])
+    if not cursor.fetchone()[0]:
+        # serial column: its default still uses the old table's sequence, which DROP TABLE would remove
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [old])
+        sequence = cursor.fetchone()[0]
+        if sequence:
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+    cursor.execute(f'DROP TABLE {old}')
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence(%s, 'id'), (SELECT COALESCE(max(id), 0) + 1 FROM {table}), false)",
+        [table]
+    )
+
+
+def _model_layout(model):
+    column = PARTITION_KEYS[model.__name__]
+    unique_together = [[model._meta.get_field(field).column for field in fields]
+                       for fields in model._meta.unique_together]
+    indexes = [(index.name, [model._meta.get_field(field).column for field in index.fields])
+               for index in model._meta.indexes]
+    return model._meta.db_table, column, unique_together, indexes
+
+
+def partition_table(cursor, model, interval=None, ahead=None):
+    """Convert the model's table into a range-partitioned one covering its data and `ahead` upcoming periods"""
+    interval = interval or partition_interval()
+    ahead = getattr(settings, 'NEPSE_PARTITIONS_AHEAD', 1) if ahead is None else ahead
+    table, column, unique_together, indexes = _model_layout(model)
+    if is_partitioned(cursor, table):
+        return
+    old = f'{table}_unpartitioned'
+    cursor.execute(f'ALTER TABLE {table} RENAME TO {old}')
+    cursor.execute(
+        f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING STORAGE) '
+        f'PARTITION BY RANGE ({column})'
+    )
+    cursor.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+    cursor.execute(f'SELECT min({column}) FROM {old}')
+    first_day = cursor.fetchone()[0] or timezone.now().date()
+    for start, end in periods(first_day, upcoming_end(ahead, interval), interval):
+        create_partition(cursor, table, column, start, end, partition_name(table, start, interval))
+
+    cursor.execute(f'INSERT INTO {table} OVERRIDING SYSTEM VALUE SELECT * FROM {old}')
+    _swap_table(cursor, table, old)
+    # The partition key has to be part of every unique constraint
+    _add_constraints(cursor, table, ['id', column], unique_together, indexes)
+
+
+def unpartition_table(cursor, model):
+    """Turn a partitioned table back into a plain one with the same rows"""
+    table, column, unique_together, indexes = _model_layout(model)
+    if not is_partitioned(cursor, table):
+        return
+    old = f'{table}_partitioned'
+    cursor.execute(f'ALTER TABLE {table} RENAME TO {old}')
+    cursor.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING STORAGE)')
+    cursor.execute(f'INSERT INTO {table} OVERRIDING SYSTEM VALUE SELECT * FROM {old}')
+    _swap_table(cursor, table, old)
+    _add_constraints(cursor, table, ['id'], unique_together, indexes)
+
+
+def ensure_partitions(cursor, model, ahead, interval=None):
+    """Create the partitions for the current and `ahead` upcoming periods, returns [(name, rows moved)]"""
+    interval = interval or partition_interval()
+    table, column, _, _ = _model_layout(model)
+    existing = {name for name, _, _ in list_partitions(cursor, table)}
+    created = []
+    for start, end in periods(timezone.now().date(), upcoming_end(ahead, interval), interval):
+        name = partition_name(table, start, interval)
+        if name not in existing:
+            created.append((name, create_partition(cursor, table, column, start, end, name)))
+    return created
+
+
+def detach_partitions(cursor, model, before, archive_schema=None):
+    """
+    Detach every partition ending on or before `before`. Detached partitions
+    move to `archive_schema`, or are dropped when it is None. Returns their
+    names.
+    """
+    table = model._meta.db_table
+    detached = []
+    if archive_schema:
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {archive_schema}')
+    for name, start, end in list_partitions(cursor, table):
+        if end is None or end > before:
+            continue
+        cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {name}')
+        if archive_schema:
+            cursor.execute(f'ALTER TABLE {name} SET SCHEMA {archive_schema}')
+        else:
+            cursor.execute(f'DROP TABLE {name}')
+        detached.append(name)
+    return detached
+
@@ -0,0 +1,64 @@
+"""
+Persistent database connection pool bookkeeping.
+
+Django keeps each worker thread's connection open for CONN_MAX_AGE seconds and,
+with CONN_HEALTH_CHECKS, pings it before reusing it after an error or idle
+period. This module bounds that implicit pool: a process keeps at most
+DATABASE_CONNECTION_POOL_SIZE persistent connections per database, and
+connections opened beyond that are closed at the end of their request as if
+CONN_MAX_AGE were 0. Opened, reused and overflowing connections are counted
+for /metrics.
+"""
+import threading
+import time
+import weakref
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from .metrics import record_connection
+
+_lock = threading.Lock()
+_persistent = weakref.WeakSet()
+
+
+def is_persistent(connection):
+    """Whether the open connection outlives the current request"""
+    return connection.connection is not None and (
+        connection.close_at is None or connection.close_at > time.monotonic()
+    )
+
+
+def persistent_connections(alias):
+    """Open persistent connections of `alias` held by any thread of this process"""
+    with _lock:
+        wrappers = list(_persistent)
+    return [wrapper for wrapper in wrappers if wrapper.alias == alias and is_persistent(wrapper)]
+
+
+def track_connection(sender, connection, **kwargs):
+    """Admit a new connection to the pool, or mark it for closing if the pool is full"""
+    record_connection(connection.alias, 'opened')
+    if not is_persistent(connection):
+        return
+    pool_size = getattr(settings, 'DATABASE_CONNECTION_POOL_SIZE', None)
+    if pool_size and len(persistent_connections(connection.alias)) >= pool_size:
+        # close_if_unusable_or_obsolete() closes it when the request finishes
+        connection.close_at = time.monotonic()
+        record_connection(connection.alias, 'overflow')
+        return
+    with _lock:
+        _persistent.add(connection)
+
+
+def track_reuse(sender, **kwargs):
+    """Count requests served by a connection kept open from an earlier request"""
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is not None:
+            record_connection(connection.alias, 'reused')
+
+
+def connect_signals():
+    connection_created.connect(track_connection, dispatch_uid='nepse.pooling.track_connection')
+    # Connected after django.db's close_old_connections, so obsolete connections are already closed
+    request_started.connect(track_reuse, dispatch_uid='nepse.pooling.track_reuse')
@@ -0,0 +1,194 @@
+"""
+On-demand request profiling for staff users.
+
+A staff request with ?__profile=1 runs under a stack-sampling profiler and
+?__profile=cprofile under cProfile; with NEPSE_PROFILE_SAMPLE_RATE > 0 a random
+fraction of all requests is also sampled. Results are stored in
+NEPSE_PROFILE_DIR under a server-generated profile id (the client's
+X-Request-ID is only recorded in the metadata) and served from the admin as
+flame-graph-ready collapsed stacks (flamegraph.pl, speedscope) or pstats dumps.
+When NEPSE_PROFILING_ENABLED is off the middleware removes itself from the
+chain and costs nothing.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, Http404, JsonResponse
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FILES = {
+    'folded': ('text/plain; charset=utf-8', '.folded'),
+    'prof': ('application/octet-stream', '.prof'),
+    'txt': ('text/plain; charset=utf-8', '.txt'),
+}
+
+
+class StackSampler:
+    """Sample the call stack of one thread at a fixed interval into collapsed stacks"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Brendan Gregg collapsed-stack format: 'frame;frame;frame count' per line"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class ProfilingMiddleware:
+    """Profile staff requests that ask for it, plus an optional random sample"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'NEPSE_PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'NEPSE_PROFILE_SAMPLE_RATE', 0.0)
+        self.interval = getattr(settings, 'NEPSE_PROFILE_SAMPLE_INTERVAL', 0.005)
+        self.directory = str(settings.NEPSE_PROFILE_DIR)
+        self.keep = getattr(settings, 'NEPSE_PROFILE_KEEP', 100)
+
+    def __call__(self, request):
+        mode = self._requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+
+        # File names are generated here: a client-chosen id could overwrite another profile
+        profile_id = uuid.uuid4().hex
+        start = time.perf_counter()
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+        else:
+            profiler = StackSampler(self.interval)
+            profiler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.stop()
+        duration = time.perf_counter() - start
+
+        try:
+            self._store(profile_id, request, mode, duration, profiler)
+            response['X-Profile-Id'] = profile_id
+        except OSError as e:
+            logger.error(f"Error storing profile {profile_id}: {str(e)}")
+        return response
+
+    def _requested_mode(self, request):
+        """'sample', 'cprofile' or None when the request should not be profiled"""
+        flag = request.GET.get('__profile')
+        if flag is not None:
+            if not getattr(getattr(request, 'user', None), 'is_staff', False):
+                return None
+            return 'cprofile' if flag == 'cprofile' else 'sample'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+    def _store(self, profile_id, request, mode, duration, profiler):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, profile_id)
+        files = []
+
+        if mode == 'cprofile':
+            profiler.dump_stats(base + '.prof')
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(60)
+            with open(base + '.txt', 'w') as f:
+                f.write(report.getvalue())
+            files = ['prof', 'txt']
+        else:
+            with open(base + '.folded', 'w') as f:
+                f.write(profiler.collapsed())
+            files = ['folded']
+
+        with open(base + '.json', 'w') as f:
+            json.dump({
+                'id': profile_id,
+                'request_id': request.headers.get('X-Request-ID', '')[:200],
+                'path': request.get_full_path(),
+                'method': request.method,
+                'mode': mode,
+                'duration_ms': round(duration * 1000, 2),
+                'files': files,
+                'created_at': timezone.now().isoformat(),
+            }, f)
+        self._prune()
+
+    def _prune(self):
+        """Keep only the newest NEPSE_PROFILE_KEEP profiles"""
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in entries[:-self.keep]:
+            profile_id = entry.name[:-len('.json')]
+            for suffix in ['.json'] + [suffix for _, suffix in PROFILE_FILES.values()]:
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + suffix))
+                except FileNotFoundError:
+                    pass
+
+
+@staff_member_required
+def profile_list_view(request):
+    """List stored profiles, newest first"""
+    directory = str(settings.NEPSE_PROFILE_DIR)
+    profiles = []
+    if os.path.isdir(directory):
+        for filename in os.listdir(directory):
+            if filename.endswith('.json'):
+                with open(os.path.join(directory, filename)) as f:
+                    profiles.append(json.load(f))
+    profiles.sort(key=lambda p: p['created_at'], reverse=True)
+    return JsonResponse({'profiles': profiles})
+
+
+@staff_member_required
+def profile_download_view(request, profile_id, kind):
+    """Serve one stored profile file: folded (collapsed stacks), prof or txt"""
+    if kind not in PROFILE_FILES or not profile_id.replace('-', '').isalnum():
+        raise Http404('Unknown profile')
+    content_type, suffix = PROFILE_FILES[kind]
+    path = os.path.join(str(settings.NEPSE_PROFILE_DIR), profile_id + suffix)
+    if not os.path.exists(path):
+        raise Http404('Unknown profile')
+    return FileResponse(open(path, 'rb'), content_type=content_type,
+                        as_attachment=kind == 'prof', filename=f"{profile_id}{suffix}")
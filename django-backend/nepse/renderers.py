@@ -0,0 +1,174 @@
+"""
+Fast JSON renderers for the NEPSE API
+"""
+import datetime
+import json
+import sys
+from array import array
+from decimal import Decimal
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # fall back to DRF's encoder when orjson is not installed
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+
+def _default(obj):
+    """Encode types orjson does not handle natively"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Promise):  # lazy translation strings in error details
+        return str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if hasattr(obj, 'tolist'):  # NumPy arrays and scalars
+        return obj.tolist()
+    if hasattr(obj, '__iter__'):  # sets, generators and querysets
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def to_columns(rows):
+    """Turn a list of dicts into a {'fields', 'columns', 'length'} columnar layout"""
+    if not rows:
+        return {'fields': [], 'columns': {}, 'length': 0}
+    fields = list(rows[0].keys())
+    return {
+        'fields': fields,
+        'columns': {field: [row.get(field) for row in rows] for field in fields},
+        'length': len(rows),
+    }
+
+
+class ORJSONRenderer(BaseRenderer):
+    """JSON renderer backed by orjson with native Decimal, date and datetime encoding"""
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None:
+            return JSONRenderer().render(data, accepted_media_type, renderer_context)
+
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if accepted_media_type and 'indent' in accepted_media_type:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=option)
+
+
+class ColumnarORJSONRenderer(ORJSONRenderer):
+    """
+    Compact columnar layout for list responses, selected with ?format=columns.
+    Lists of objects (plain or paginated under 'results') are sent as one array
+    per field instead of repeating every key in every row.
+    """
+    format = 'columns'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, list) and all(isinstance(row, dict) for row in data):
+            data = to_columns(data)
+        elif isinstance(data, dict) and isinstance(data.get('results'), list):
+            data = dict(data)
+            data['results'] = to_columns(data['results'])
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+def _packed(column):
+    """Little-endian bytes of a typed array column"""
+    if sys.byteorder != 'little':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _msgpack_default(obj):
+    """Encode types msgpack does not handle natively"""
+    if isinstance(obj, array):
+        return _packed(obj)
+    if isinstance(obj, (datetime.date, datetime.datetime)):
+        return obj.isoformat()
+    return _default(obj)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack renderer, selected with ?format=msgpack. Typed array columns
+    are sent as little-endian binary buffers that clients can view directly
+    as Int32Array/Float64Array instead of parsing numbers.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+
+ARROW_TYPES = {
+    'i': 'int32',
+    'l': 'int64',
+    'q': 'int64',
+    'd': 'float64',
+    'f': 'float32',
+}
+
+
+class ArrowIPCRenderer(BaseRenderer):
+    """
+    Arrow IPC stream renderer for columnar payloads, selected with ?format=arrow.
+    The 'columns' mapping becomes the record batch and the remaining keys are
+    stored as JSON in the schema metadata.
+    """
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        columns = data.get('columns', {}) if isinstance(data, dict) else {}
+        metadata = {k: v for k, v in data.items() if k != 'columns'} if isinstance(data, dict) else data
+        arrays = {}
+        for name, column in columns.items():
+            arrow_type = ARROW_TYPES.get(getattr(column, 'typecode', None))
+            arrays[name] = pyarrow.array(
+                column, type=pyarrow.type_for_alias(arrow_type) if arrow_type else None
+            )
+        schema_metadata = {'payload': json.dumps(metadata, default=_msgpack_default)}
+        table = pyarrow.table(arrays, metadata=schema_metadata) if arrays else pyarrow.table(
+            {}, schema=pyarrow.schema([], metadata=schema_metadata)
+        )
+
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+# Renderers offered by columnar series endpoints; binary formats are only
+# available when their optional dependency is installed
+SERIES_RENDERER_CLASSES = [ORJSONRenderer]
+if msgpack is not None:
+    SERIES_RENDERER_CLASSES.append(MessagePackRenderer)
+if pyarrow is not None:
+    SERIES_RENDERER_CLASSES.append(ArrowIPCRenderer)
@@ -0,0 +1,90 @@
+"""
+Normalized sector dimension.
+
+Sources report a stock's sector as free text, kept in NEPSEStock.sector.
+refresh_sectors() maps every name to a Sector row by its canonical slug
+('Hotels & Tourism' and 'Hotels And Tourism' are both hotels-and-tourism),
+points NEPSEStock.sector_ref at it and recomputes the per-sector aggregates,
+so sector pages read one row and by_sector filters on the indexed slug
+instead of scanning with icontains.
+
+It runs after every logged ingestion and bulk load; run it by hand with
+python manage.py refresh_sectors.
+"""
+import re
+from django.db import transaction
+from django.db.models import Avg, Count, FloatField, Q, Sum
+from django.utils import timezone
+from django.utils.text import slugify
+from .market_cap import sector_cap_aggregates
+from .models import NEPSEStock, Sector
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Sector aggregates that are 0 for a sector without stocks, and those that are NULL
+TOTAL_FIELDS = ['stock_count', 'advancers', 'decliners', 'total_volume', 'total_turnover', 'total_market_cap']
+AVERAGE_FIELDS = ['avg_change', 'cap_weighted_change']
+
+
+def sector_slug(name):
+    """Canonical slug of a sector name"""
+    return slugify(re.sub(r'\s*&\s*', ' and ', name or ''))
+
+
+def sync_sectors(sector_model, stock_model):
+    """
+    Create missing sectors, link every stock to its sector and store the
+    aggregates. Takes the models so migrations can pass their historical ones;
+    returns the number of sectors.
+    """
+    with transaction.atomic():
+        names = list(stock_model.objects.exclude(sector='').values_list('sector', flat=True).distinct())
+        sectors = {sector.slug: sector for sector in sector_model.objects.all()}
+        missing = {}
+        for name in names:
+            slug = sector_slug(name)
+            if slug and slug not in sectors:
+                missing.setdefault(slug, sector_model(name=' '.join(name.split()), slug=slug))
+        if missing:
+            sector_model.objects.bulk_create(missing.values())
+            sectors = {sector.slug: sector for sector in sector_model.objects.all()}
+
+        # One UPDATE per sector name, touching only the stocks that point elsewhere. update()
+        # skips auto_now: bump updated_at so incremental archive exports pick up the link
+        now = timezone.now()
+        for name in names:
+            sector = sectors.get(sector_slug(name))
+            stock_model.objects.filter(sector=name).exclude(sector_ref=sector).update(
+                sector_ref=sector, updated_at=now
+            )
+        stock_model.objects.filter(sector='', sector_ref__isnull=False).update(sector_ref=None, updated_at=now)
+
+        rows = stock_model.objects.filter(sector_ref__isnull=False).values('sector_ref').annotate(
+            advancers=Count('id', filter=Q(change_percent__gt=0)),
+            decliners=Count('id', filter=Q(change_percent__lt=0)),
+            total_volume=Sum('volume'),
+            total_turnover=Sum('turnover'),
+            avg_change=Avg('change_percent', output_field=FloatField()),
+            **sector_cap_aggregates()
+        )
+        aggregates = {row.pop('sector_ref'): row for row in rows}
+
+        for sector in sectors.values():
+            row = aggregates.get(sector.pk, {})
+            for field in TOTAL_FIELDS:
+                setattr(sector, field, row.get(field) or 0)
+            for field in AVERAGE_FIELDS:
+                setattr(sector, field, row.get(field))
+            sector.updated_at = now  # bulk_update() skips auto_now
+        sector_model.objects.bulk_update(sectors.values(), TOTAL_FIELDS + AVERAGE_FIELDS + ['updated_at'])
+    return len(sectors)
+
+
+def refresh_sectors():
+    """Post-update hook: sync the sector table with the stocks"""
+    try:
+        return sync_sectors(Sector, NEPSEStock)
+    except Exception as e:
+        logger.error(f"Error refreshing sectors: {str(e)}")
+        return None
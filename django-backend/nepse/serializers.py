@@ -1,20 +1,35 @@
 from rest_framework import serializers
-from .models import NEPSEIndex, NEPSEStock, NEPSEIndices, DataUpdateLog
+from .fields import PaisaField, PaisaSerializerField
+from .models import NEPSEIndex, NEPSEStock, NEPSEIndices, DataUpdateLog, Sector
 
 
-class NEPSEIndexSerializer(serializers.ModelSerializer):
+class PriceModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer presenting integer-paisa price columns as two-place decimals"""
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        PaisaField: PaisaSerializerField,
+    }
+
+
+class NEPSEIndexSerializer(PriceModelSerializer):
     class Meta:
         model = NEPSEIndex
         fields = '__all__'
 
 
-class NEPSEStockSerializer(serializers.ModelSerializer):
+class NEPSEStockSerializer(PriceModelSerializer):
     class Meta:
         model = NEPSEStock
         fields = '__all__'
 
 
-class NEPSEIndicesSerializer(serializers.ModelSerializer):
+class SectorSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Sector
+        fields = '__all__'
+
+
+class NEPSEIndicesSerializer(PriceModelSerializer):
     class Meta:
         model = NEPSEIndices
         fields = '__all__'
@@ -8,7 +8,14 @@ from datetime import datetime, timedelta
 from django.utils import timezone
 from django.conf import settings
 from django.core.cache import cache
-from .models import NEPSEIndex, NEPSEStock, NEPSEIndices, DataUpdateLog
+from django.db import transaction
+from .fields import avg_rupees
+from .ingestion import IngestionStats, batched
+from .models import NEPSEIndex, NEPSEStock, NEPSEIndices, StockPrice
+from .services_simple import invalidate_series_cache, series_signals_muted
+from .snapshots import publish_snapshots_after_update
+from .archive import export_archive_after_update
+from .trading_calendar import latest_session
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,8 +29,9 @@ class NEPSEDataService:
         self.kaggle_key = settings.KAGGLE_KEY
         self.cache_timeout = settings.NEPSE_DATA_CACHE_TIMEOUT
     
-    def fetch_kaggle_data(self):
+    def fetch_kaggle_data(self, stats=None):
         """Fetch data from Kaggle dataset"""
+        stats = stats or IngestionStats('kaggle_import')
         try:
             # Set up Kaggle credentials
             os.environ['KAGGLE_USERNAME'] = self.kaggle_username
@@ -34,34 +42,44 @@ class NEPSEDataService:
             api.authenticate()
             
             # Download the dataset
-            api.dataset_download_files(
-                'dimanjung/nepse-index-historical-data',
-                path='./data',
-                unzip=True
-            )
+            with stats.stage('fetch'):
+                api.dataset_download_files(
+                    'dimanjung/nepse-index-historical-data',
+                    path='./data',
+                    unzip=True
+                )
             
             return True
         except Exception as e:
             logger.error(f"Error fetching Kaggle data: {str(e)}")
             return False
     
-    def process_historical_data(self):
+    def process_historical_data(self, stats=None):
         """Process historical data from CSV files"""
+        stats = stats or IngestionStats('kaggle_import')
         try:
             data_dir = './data'
             csv_files = [f for f in os.listdir(data_dir) if f.endswith('.csv')]
             
             for csv_file in csv_files:
                 file_path = os.path.join(data_dir, csv_file)
-                df = pd.read_csv(file_path)
+                with stats.stage('parse'):
+                    df = pd.read_csv(file_path)
+                stats.bytes_processed += os.path.getsize(file_path)
+                stats.rows_read += len(df)
                 
-                # Process based on file name or content
-                if 'index' in csv_file.lower():
-                    self._process_index_data(df)
-                elif 'stock' in csv_file.lower():
-                    self._process_stock_data(df)
-                elif 'indices' in csv_file.lower():
-                    self._process_indices_data(df)
+                # Process based on file name or content; the caller invalidates the series once
+                with stats.stage('write'), series_signals_muted():
+                    if 'index' in csv_file.lower():
+                        self._process_index_data(df)
+                    elif 'stock' in csv_file.lower():
+                        self._process_stock_data(df)
+                    elif 'indices' in csv_file.lower():
+                        self._process_indices_data(df)
+                    else:
+                        stats.rows_skipped += len(df)
+                        continue
+                stats.rows_written += len(df)
             
             return True
         except Exception as e:
@@ -70,90 +88,103 @@ class NEPSEDataService:
     
     def _process_index_data(self, df):
         """Process NEPSE index data"""
-        for _, row in df.iterrows():
-            NEPSEIndex.objects.update_or_create(
-                date=pd.to_datetime(row['Date']).date(),
-                defaults={
-                    'open_price': float(row.get('Open', 0)),
-                    'high_price': float(row.get('High', 0)),
-                    'low_price': float(row.get('Low', 0)),
-                    'close_price': float(row.get('Close', 0)),
-                    'volume': int(row.get('Volume', 0)),
-                    'turnover': int(row.get('Turnover', 0)),
-                }
-            )
+        for batch in batched(df.iterrows()):
+            with transaction.atomic():
+                for _, row in batch:
+                    NEPSEIndex.objects.update_or_create(
+                        date=pd.to_datetime(row['Date']).date(),
+                        defaults={
+                            'open_price': float(row.get('Open', 0)),
+                            'high_price': float(row.get('High', 0)),
+                            'low_price': float(row.get('Low', 0)),
+                            'close_price': float(row.get('Close', 0)),
+                            'volume': int(row.get('Volume', 0)),
+                            'turnover': int(row.get('Turnover', 0)),
+                        }
+                    )
     
     def _process_stock_data(self, df):
-        """Process stock data"""
-        for _, row in df.iterrows():
-            NEPSEStock.objects.update_or_create(
-                symbol=row['Symbol'],
-                defaults={
-                    'company_name': row.get('Company Name', ''),
-                    'sector': row.get('Sector', ''),
-                    'current_price': float(row.get('Current Price', 0)),
-                    'change': float(row.get('Change', 0)),
-                    'change_percent': float(row.get('Change %', 0)),
-                    'volume': int(row.get('Volume', 0)),
-                    'turnover': int(row.get('Turnover', 0)),
-                    'high_52w': float(row.get('52W High', 0)),
-                    'low_52w': float(row.get('52W Low', 0)),
-                    'market_cap': str(row.get('Market Cap', '')),
-                    'pe_ratio': float(row.get('P/E Ratio', 0)) if pd.notna(row.get('P/E Ratio')) else None,
-                    'last_trade_time': timezone.now(),
-                }
-            )
+        """Process stock data, recording each close for the latest session"""
+        session = latest_session()
+        for batch in batched(df.iterrows()):
+            with transaction.atomic():
+                for _, row in batch:
+                    StockPrice.objects.update_or_create(
+                        symbol=row['Symbol'],
+                        date=session,
+                        defaults={
+                            'close': float(row.get('Current Price', 0)),
+                            'volume': int(row.get('Volume', 0)),
+                        }
+                    )
+                    NEPSEStock.objects.update_or_create(
+                        symbol=row['Symbol'],
+                        defaults={
+                            'company_name': row.get('Company Name', ''),
+                            'sector': row.get('Sector', ''),
+                            'current_price': float(row.get('Current Price', 0)),
+                            'change': float(row.get('Change', 0)),
+                            'change_percent': float(row.get('Change %', 0)),
+                            'volume': int(row.get('Volume', 0)),
+                            'turnover': int(row.get('Turnover', 0)),
+                            'high_52w': float(row.get('52W High', 0)),
+                            'low_52w': float(row.get('52W Low', 0)),
+                            'market_cap': str(row.get('Market Cap', '')),
+                            'pe_ratio': float(row.get('P/E Ratio', 0)) if pd.notna(row.get('P/E Ratio')) else None,
+                            'last_trade_time': timezone.now(),
+                        }
+                    )
     
     def _process_indices_data(self, df):
         """Process indices data"""
-        for _, row in df.iterrows():
-            NEPSEIndices.objects.update_or_create(
-                name=row['Name'],
-                date=pd.to_datetime(row['Date']).date(),
-                defaults={
-                    'symbol': row.get('Symbol', ''),
-                    'current': float(row.get('Current', 0)),
-                    'change': float(row.get('Change', 0)),
-                    'change_percent': float(row.get('Change %', 0)),
-                    'high_52w': float(row.get('52W High', 0)),
-                    'low_52w': float(row.get('52W Low', 0)),
-                }
-            )
+        for batch in batched(df.iterrows()):
+            with transaction.atomic():
+                for _, row in batch:
+                    NEPSEIndices.objects.update_or_create(
+                        name=row['Name'],
+                        date=pd.to_datetime(row['Date']).date(),
+                        defaults={
+                            'symbol': row.get('Symbol', ''),
+                            'current': float(row.get('Current', 0)),
+                            'change': float(row.get('Change', 0)),
+                            'change_percent': float(row.get('Change %', 0)),
+                            'high_52w': float(row.get('52W High', 0)),
+                            'low_52w': float(row.get('52W Low', 0)),
+                        }
+                    )
     
-    def fetch_live_data(self):
+    def fetch_live_data(self, stats=None):
         """Fetch live data from NEPSE API (if available)"""
         try:
             # This would be implemented based on actual NEPSE API
             # For now, we'll use sample data
-            return self._generate_sample_live_data()
+            return self._generate_sample_live_data(stats or IngestionStats('all'))
         except Exception as e:
             logger.error(f"Error fetching live data: {str(e)}")
             return False
     
-    def _generate_sample_live_data(self):
+    def _generate_sample_live_data(self, stats):
         """Generate sample live data for demonstration"""
         import random
         
-        # Generate sample index data
-        base_price = 2800 + random.uniform(-100, 100)
-        NEPSEIndex.objects.create(
-            date=timezone.now().date(),
-            open_price=base_price - random.uniform(10, 50),
-            high_price=base_price + random.uniform(10, 50),
-            low_price=base_price - random.uniform(20, 80),
-            close_price=base_price,
-            volume=random.randint(1000000, 2000000),
-            turnover=random.randint(3000000000, 5000000000),
-        )
-        
-        # Generate sample stock data
-        stocks = ['NICL', 'NABIL', 'SCB', 'NBL', 'ADBL']
-        for symbol in stocks:
-            base_price = random.uniform(200, 600)
-            change = random.uniform(-50, 50)
-            NEPSEStock.objects.update_or_create(
-                symbol=symbol,
-                defaults={
+        with stats.stage('fetch'):
+            # Generate sample index data
+            base_price = 2800 + random.uniform(-100, 100)
+            index_data = {
+                'open_price': base_price - random.uniform(10, 50),
+                'high_price': base_price + random.uniform(10, 50),
+                'low_price': base_price - random.uniform(20, 80),
+                'close_price': base_price,
+                'volume': random.randint(1000000, 2000000),
+                'turnover': random.randint(3000000000, 5000000000),
+            }
+            
+            # Generate sample stock data
+            stocks_data = {}
+            for symbol in ['NICL', 'NABIL', 'SCB', 'NBL', 'ADBL']:
+                base_price = random.uniform(200, 600)
+                change = random.uniform(-50, 50)
+                stocks_data[symbol] = {
                     'company_name': f"{symbol} Bank Limited",
                     'sector': 'Banking',
                     'current_price': base_price,
@@ -167,38 +198,45 @@ class NEPSEDataService:
                     'pe_ratio': random.uniform(10, 30),
                     'last_trade_time': timezone.now(),
                 }
-            )
+            stats.rows_read += 1 + len(stocks_data)
+        
+        with stats.stage('write'), series_signals_muted(), transaction.atomic():
+            session = latest_session()
+            NEPSEIndex.objects.update_or_create(date=session, defaults=index_data)
+            for symbol, defaults in stocks_data.items():
+                NEPSEStock.objects.update_or_create(symbol=symbol, defaults=defaults)
+                StockPrice.objects.update_or_create(
+                    symbol=symbol, date=session,
+                    defaults={'close': defaults['current_price'], 'volume': defaults['volume']}
+                )
+            stats.rows_written += 1 + len(stocks_data)
         
         return True
     
     def update_data(self, update_type='all'):
         """Update NEPSE data"""
-        start_time = timezone.now()
+        stats = IngestionStats(update_type)
         
         try:
             if update_type in ['index', 'all']:
-                self.fetch_live_data()
+                self.fetch_live_data(stats)
+            
+            # Link new stocks to their sectors before they are published and archived
+            stats.post_write()
+            with stats.stage('cache_warm'):
+                invalidate_series_cache()
+                publish_snapshots_after_update()
+            with stats.stage('backup'):
+                export_archive_after_update()
             
             # Log the update
-            DataUpdateLog.objects.create(
-                update_type=update_type,
-                status='success',
-                records_updated=1,
-                started_at=start_time,
-                completed_at=timezone.now(),
-            )
+            stats.log('success')
             
             return True
             
         except Exception as e:
             logger.error(f"Error updating data: {str(e)}")
-            DataUpdateLog.objects.create(
-                update_type=update_type,
-                status='failed',
-                error_message=str(e),
-                started_at=start_time,
-                completed_at=timezone.now(),
-            )
+            stats.log('failed', error_message=str(e))
             return False
 
 
@@ -271,7 +309,7 @@ class ChartDataService:
         from django.db.models import Avg
         
         sectors = NEPSEStock.objects.values('sector').annotate(
-            avg_price=Avg('current_price'),
+            avg_price=avg_rupees('current_price'),
             avg_change=Avg('change_percent')
         ).order_by('-avg_price')[:10]
         
@@ -3,16 +3,128 @@ Simplified Services for NEPSE data handling and processing (without pandas)
 """
 import os
 import requests
-from datetime import datetime, timedelta
+import threading
+from array import array
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 from django.utils import timezone
 from django.conf import settings
 from django.core.cache import cache
-from .models import NEPSEIndex, NEPSEStock, NEPSEIndices, DataUpdateLog
+from django.db import transaction
+from django.db.models import Avg, FloatField
+from django.db.models.signals import post_delete, post_save
+from django.db.models.functions import Cast
+from .fields import avg_rupees, rupees
+from .history import INDEX_SERIES, HistoryCache, refresh_history_cache
+from .ingestion import IngestionStats
+from .models import NEPSEIndex, NEPSEStock, NEPSEIndices, StockPrice
+from .metrics import record_cache
+from .trading_calendar import latest_session
 import logging
 import random
 
 logger = logging.getLogger(__name__)
 
+# Day 0 of the epoch-day date encoding used by columnar series
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Little-endian dtype of each columnar series column, for binary decoders
+SERIES_DTYPES = {
+    'date': 'int32',
+    'open': 'float64',
+    'high': 'float64',
+    'low': 'float64',
+    'close': 'float64',
+    'volume': 'int64',
+}
+
+# array typecode of each column, matching SERIES_DTYPES
+TYPECODES = {'date': 'i', 'open': 'd', 'high': 'd', 'low': 'd', 'close': 'd', 'volume': 'q'}
+
+SERIES_CACHE_VERSION_KEY = 'nepse:series:version'
+
+
+def series_cache_version():
+    """Current generation of cached chart series"""
+    return cache.get_or_set(SERIES_CACHE_VERSION_KEY, 1, None)
+
+
+def invalidate_series_cache():
+    """Drop every cached chart series after new index data is written"""
+    # Bring the memory-mapped history up to date first, so rebuilt series see the new rows
+    refresh_history_cache()
+    try:
+        cache.incr(SERIES_CACHE_VERSION_KEY)
+    except ValueError:
+        cache.set(SERIES_CACHE_VERSION_KEY, 1, None)
+
+
+_signals = threading.local()
+
+
+@contextmanager
+def series_signals_muted():
+    """Skip the per-row signal hook for bulk writers that call invalidate_series_cache() themselves"""
+    _signals.muted = getattr(_signals, 'muted', 0) + 1
+    try:
+        yield
+    finally:
+        _signals.muted -= 1
+
+
+def _index_history_changed(sender, using=None, **kwargs):
+    """Admin, shell and queryset edits of index rows: invalidate once their transaction commits"""
+    if getattr(_signals, 'muted', 0):
+        return
+    connection = transaction.get_connection(using)
+    if any(entry[1] is invalidate_series_cache for entry in connection.run_on_commit):
+        return  # already scheduled by an earlier row of this transaction
+    transaction.on_commit(invalidate_series_cache, using=using)
+
+
+def connect_signals():
+    for model in (NEPSEIndex, NEPSEIndices):
+        name = model.__name__.lower()
+        post_save.connect(_index_history_changed, sender=model, dispatch_uid=f'nepse.series.{name}.saved')
+        post_delete.connect(_index_history_changed, sender=model, dispatch_uid=f'nepse.series.{name}.deleted')
+
+
+# Chart.js dataset styles, shared by every chart response
+INDEX_STYLE = {
+    'label': 'NEPSE Index',
+    'borderColor': 'rgb(75, 192, 192)',
+    'backgroundColor': 'rgba(75, 192, 192, 0.2)',
+    'tension': 0.1,
+}
+VOLUME_STYLE = {
+    'label': 'Volume',
+    'borderColor': 'rgb(255, 99, 132)',
+    'backgroundColor': 'rgba(255, 99, 132, 0.2)',
+    'yAxisID': 'y1',
+}
+PRICE_STYLE = {
+    'label': 'Current Price',
+    'borderColor': 'rgb(54, 162, 235)',
+    'backgroundColor': 'rgba(54, 162, 235, 0.2)',
+}
+CHANGE_STYLE = {
+    'label': 'Change %',
+    'borderColor': 'rgb(255, 205, 86)',
+    'backgroundColor': 'rgba(255, 205, 86, 0.2)',
+    'yAxisID': 'y1',
+}
+SECTOR_PRICE_STYLE = {
+    'label': 'Average Price',
+    'borderColor': 'rgb(153, 102, 255)',
+    'backgroundColor': 'rgba(153, 102, 255, 0.2)',
+}
+SECTOR_CHANGE_STYLE = {
+    'label': 'Average Change %',
+    'borderColor': 'rgb(255, 159, 64)',
+    'backgroundColor': 'rgba(255, 159, 64, 0.2)',
+    'yAxisID': 'y1',
+}
+
 
 class NEPSEDataService:
     """Service for fetching and processing NEPSE data"""
@@ -56,7 +168,7 @@ class NEPSEDataService:
         """Generate sample index data"""
         base_price = 2800 + random.uniform(-100, 100)
         return {
-            'date': timezone.now().date(),
+            'date': latest_session(),
             'open': base_price - random.uniform(10, 30),
             'high': base_price + random.uniform(10, 30),
             'low': base_price - random.uniform(20, 40),
@@ -107,53 +219,58 @@ class NEPSEDataService:
                 'change_percent': (change / base_value) * 100,
                 'high_52w': base_value + random.uniform(200, 500),
                 'low_52w': base_value - random.uniform(200, 500),
-                'date': timezone.now().date()
+                'date': latest_session()
             })
         
         return indices
     
     def update_database(self, data_source='sample'):
         """Update database with fetched data"""
+        stats = IngestionStats('full_update')
         try:
-            if data_source == 'live':
-                data = self.fetch_live_data()
-            elif data_source == 'kaggle':
-                data = self.fetch_kaggle_data()
-            else:
-                data = self._generate_sample_data()
+            with stats.stage('fetch'):
+                if data_source == 'live':
+                    data = self.fetch_live_data()
+                elif data_source == 'kaggle':
+                    data = self.fetch_kaggle_data()
+                else:
+                    data = self._generate_sample_data()
             
             if not data:
+                stats.log('failed', error_message=f'No data from {data_source} source')
                 return False
             
-            # Update index data
-            if 'index_data' in data:
-                self._update_index_data(data['index_data'])
+            stats.rows_read = (1 if 'index_data' in data else 0) + len(data.get('stocks_data', [])) \
+                + len(data.get('indices_data', []))
             
-            # Update stocks data
-            if 'stocks_data' in data:
-                self._update_stocks_data(data['stocks_data'])
+            with stats.stage('write'), series_signals_muted(), transaction.atomic():
+                # Update index data
+                if 'index_data' in data:
+                    self._update_index_data(data['index_data'])
+                    stats.rows_written += 1
+                
+                # Update stocks data
+                if 'stocks_data' in data:
+                    self._update_stocks_data(data['stocks_data'])
+                    stats.rows_written += len(data['stocks_data'])
+                
+                # Update indices data
+                if 'indices_data' in data:
+                    self._update_indices_data(data['indices_data'])
+                    stats.rows_written += len(data['indices_data'])
             
-            # Update indices data
-            if 'indices_data' in data:
-                self._update_indices_data(data['indices_data'])
+            stats.post_write()
+            with stats.stage('cache_warm'):
+                invalidate_series_cache()
             
             # Log the update
-            DataUpdateLog.objects.create(
-                update_type='full_update',
-                status='success',
-                message=f'Updated data from {data_source} source',
-                records_updated=len(data.get('stocks_data', [])) + len(data.get('indices_data', []))
-            )
+            stats.log('success')
             
             return True
             
         except Exception as e:
             logger.error(f"Error updating database: {e}")
-            DataUpdateLog.objects.create(
-                update_type='full_update',
-                status='error',
-                message=f'Error updating database: {str(e)}'
-            )
+            stats.log('failed', error_message=f'Error updating database from {data_source} source: {str(e)}')
             return False
     
     def _update_index_data(self, index_data):
@@ -161,18 +278,24 @@ class NEPSEDataService:
         NEPSEIndex.objects.update_or_create(
             date=index_data['date'],
             defaults={
-                'open': index_data['open'],
-                'high': index_data['high'],
-                'low': index_data['low'],
-                'close': index_data['close'],
+                'open_price': index_data['open'],
+                'high_price': index_data['high'],
+                'low_price': index_data['low'],
+                'close_price': index_data['close'],
                 'volume': index_data['volume'],
                 'turnover': index_data['turnover']
             }
         )
     
     def _update_stocks_data(self, stocks_data):
-        """Update stocks data in database"""
+        """Update stocks data and the session's daily closes in database"""
+        session = latest_session()
         for stock_data in stocks_data:
+            StockPrice.objects.update_or_create(
+                symbol=stock_data['symbol'],
+                date=session,
+                defaults={'close': stock_data['current_price'], 'volume': stock_data['volume']}
+            )
             NEPSEStock.objects.update_or_create(
                 symbol=stock_data['symbol'],
                 defaults={
@@ -199,7 +322,7 @@ class NEPSEDataService:
                 date=index_data['date'],
                 defaults={
                     'symbol': index_data['symbol'],
-                    'current_value': index_data['current_value'],
+                    'current': index_data['current_value'],
                     'change': index_data['change'],
                     'change_percent': index_data['change_percent'],
                     'high_52w': index_data['high_52w'],
@@ -211,27 +334,126 @@ class NEPSEDataService:
 class ChartDataService:
     """Service for generating chart data"""
     
-    def get_index_chart_data(self, days=30):
+    def get_index_series(self, days=30, points=None, method='lttb'):
+        """
+        Get columnar NEPSE index series for the last `days` days.
+        
+        Dates are epoch-day integers and prices float64, each column held in a
+        typed array built in a single pass over values_list, so the payload
+        can be sent as JSON arrays or packed binary buffers. With `points`,
+        longer series are downsampled with LTTB on the close ('lttb') or merged
+        into OHLC buckets ('ohlc'); results are cached per (range, points, method).
+        """
+        end_date = timezone.now().date()
+        cache_key = (
+            f"nepse:series:NEPSE:{series_cache_version()}:"
+            f"{end_date}:{days}:{points}:{method}"
+        )
+        series = cache.get(cache_key)
+        record_cache('series', series is not None)
+        if series is not None:
+            return series
+        
+        series = self._load_index_series(end_date - timedelta(days=days), end_date)
+        if points and series['length'] > points:
+            series = self._downsample(series, points, method)
+        
+        cache.set(cache_key, series, getattr(settings, 'NEPSE_DATA_CACHE_TIMEOUT', 600))
+        return series
+    
+    def _load_index_series(self, start_date, end_date):
+        """Read the index OHLCV columns for a date range from the history cache, or in one values_list pass"""
+        window = HistoryCache().window(INDEX_SERIES, start_date, end_date)
+        if window is not None:
+            return self._series(start_date, end_date, {
+                name: array(TYPECODES[name], window[name].tobytes())
+                for name in SERIES_DTYPES
+            })
+        
+        rows = NEPSEIndex.objects.filter(
+            date__range=[start_date, end_date]
+        ).order_by('date').annotate(
+            open_f=rupees('open_price'),
+            high_f=rupees('high_price'),
+            low_f=rupees('low_price'),
+            close_f=rupees('close_price'),
+        ).values_list('date', 'open_f', 'high_f', 'low_f', 'close_f', 'volume').iterator(chunk_size=2000)
+        
+        dates, opens, highs, lows, closes, volumes = (
+            array('i'), array('d'), array('d'), array('d'), array('d'), array('q')
+        )
+        for trade_date, open_, high, low, close, volume in rows:
+            dates.append(trade_date.toordinal() - EPOCH_ORDINAL)
+            opens.append(open_)
+            highs.append(high)
+            lows.append(low)
+            closes.append(close)
+            volumes.append(volume)
+        
+        return self._series(start_date, end_date, {
+            'date': dates,
+            'open': opens,
+            'high': highs,
+            'low': lows,
+            'close': closes,
+            'volume': volumes,
+        })
+    
+    def _series(self, start_date, end_date, columns):
+        return {
+            'series': 'NEPSE',
+            'start_date': start_date,
+            'end_date': end_date,
+            'length': len(columns['date']),
+            'dtypes': SERIES_DTYPES,
+            'columns': columns,
+        }
+    
+    def _downsample(self, series, points, method):
+        """Reduce a columnar series to `points` rows, or keep it whole when numpy is missing"""
+        try:
+            import numpy as np
+            from .downsampling import lttb_indices, ohlc_envelope
+        except ImportError:
+            logger.warning("numpy is not installed: serving the series without downsampling")
+            return dict(series, downsampling=None, warning='numpy is not installed, series not downsampled')
+        
+        names = list(series['columns'])
+        columns = [np.frombuffer(series['columns'][name], dtype=SERIES_DTYPES[name]) for name in names]
+        
+        if method == 'ohlc':
+            reduced = ohlc_envelope(*columns, points)
+        else:
+            keep = lttb_indices(columns[0], columns[names.index('close')], points)
+            reduced = [column[keep] for column in columns]
+        
+        downsampled = dict(series)
+        downsampled['columns'] = {
+            name: array(series['columns'][name].typecode, column.tobytes())
+            for name, column in zip(names, reduced)
+        }
+        downsampled['length'] = len(reduced[0])
+        downsampled['source_length'] = series['length']
+        downsampled['downsampling'] = method
+        return downsampled
+    
+    def get_index_chart_data(self, days=30, points=None):
         """Get chart data for NEPSE index"""
         try:
-            end_date = timezone.now().date()
-            start_date = end_date - timedelta(days=days)
+            series = self.get_index_series(days, points=points)
             
-            index_data = NEPSEIndex.objects.filter(
-                date__range=[start_date, end_date]
-            ).order_by('date')
-            
-            if not index_data.exists():
+            if not series['length']:
                 return self._generate_sample_chart_data()
             
-            labels = [str(data.date) for data in index_data]
-            datasets = [{
-                'label': 'NEPSE Index',
-                'data': [float(data.close) for data in index_data],
-                'borderColor': 'rgb(75, 192, 192)',
-                'backgroundColor': 'rgba(75, 192, 192, 0.2)',
-                'tension': 0.1
-            }]
+            columns = series['columns']
+            labels = [
+                date.fromordinal(day + EPOCH_ORDINAL).isoformat()
+                for day in columns['date']
+            ]
+            datasets = [
+                dict(INDEX_STYLE, data=columns['close'].tolist()),
+                dict(VOLUME_STYLE, data=columns['volume'].tolist()),
+            ]
             
             return {
                 'labels': labels,
@@ -242,6 +464,48 @@ class ChartDataService:
             logger.error(f"Error getting chart data: {e}")
             return self._generate_sample_chart_data()
     
+    def get_stocks_chart_data(self, days=30):
+        """Get chart data for stocks"""
+        stocks = NEPSEStock.objects.annotate(
+            price_f=rupees('current_price'),
+            change_f=Cast('change_percent', FloatField()),
+        ).values_list('symbol', 'price_f', 'change_f')[:10]  # Top 10 stocks
+        
+        labels, prices, changes = [], [], []
+        for symbol, price, change in stocks:
+            labels.append(symbol)
+            prices.append(price)
+            changes.append(change)
+        
+        return {
+            'labels': labels,
+            'datasets': [
+                dict(PRICE_STYLE, data=prices),
+                dict(CHANGE_STYLE, data=changes),
+            ]
+        }
+    
+    def get_sectors_chart_data(self, days=30):
+        """Get chart data for sectors"""
+        sectors = NEPSEStock.objects.values('sector').annotate(
+            avg_price=avg_rupees('current_price'),
+            avg_change=Cast(Avg('change_percent'), FloatField())
+        ).order_by('-avg_price').values_list('sector', 'avg_price', 'avg_change')[:10]
+        
+        labels, prices, changes = [], [], []
+        for sector, price, change in sectors:
+            labels.append(sector)
+            prices.append(price)
+            changes.append(change)
+        
+        return {
+            'labels': labels,
+            'datasets': [
+                dict(SECTOR_PRICE_STYLE, data=prices),
+                dict(SECTOR_CHANGE_STYLE, data=changes),
+            ]
+        }
+    
     def _generate_sample_chart_data(self):
         """Generate sample chart data"""
         labels = []
@@ -256,11 +520,5 @@ class ChartDataService:
         
         return {
             'labels': labels,
-            'datasets': [{
-                'label': 'NEPSE Index',
-                'data': data,
-                'borderColor': 'rgb(75, 192, 192)',
-                'backgroundColor': 'rgba(75, 192, 192, 0.2)',
-                'tension': 0.1
-            }]
+            'datasets': [dict(INDEX_STYLE, data=data)]
         }
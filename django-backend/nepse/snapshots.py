@@ -0,0 +1,207 @@
+"""
+Pre-rendered static JSON snapshots of the public read endpoints.
+
+Versions are written while the web workers run, so they are served by
+snapshot_view(), which reads the files from disk on every request, rather than
+by whitenoise, which lists its files (and their sizes and ETags) once at
+startup. In front of a web server or CDN, map NEPSE_SNAPSHOT_URL to
+NEPSE_SNAPSHOT_ROOT there instead.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.test import RequestFactory
+from django.urls import resolve
+from django.utils import timezone
+from django.utils._os import safe_join
+import logging
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always produced
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = '/api/v1/'
+
+# Snapshot name -> API path (relative to API_PREFIX) for every public read endpoint
+SNAPSHOT_ENDPOINTS = {
+    'overview': 'overview/overview/',
+    'index-latest': 'index/latest/',
+    'indices-latest': 'indices/latest/',
+    'stocks-top-gainers': 'stocks/top_gainers/',
+    'stocks-top-losers': 'stocks/top_losers/',
+    'stocks-most-active': 'stocks/most_active/',
+    'market-summary': 'analytics/market_summary/',
+    'sector-stats': 'overview/chart_data/?type=sectors',
+    'stocks-chart': 'overview/chart_data/?type=stocks',
+}
+
+CHART_RANGES = [7, 30, 90, 180, 365]
+
+for _days in CHART_RANGES:
+    SNAPSHOT_ENDPOINTS[f'index-chart-{_days}d'] = f'index/chart_data/?days={_days}'
+
+# Content-Encoding -> suffix of the pre-compressed sibling, best first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+class SnapshotService:
+    """Render public API responses to versioned, pre-compressed JSON files"""
+
+    def __init__(self, output_dir=None, keep_versions=None):
+        self.output_dir = str(output_dir or settings.NEPSE_SNAPSHOT_ROOT)
+        self.keep_versions = keep_versions or settings.NEPSE_SNAPSHOT_KEEP_VERSIONS
+        self.base_url = settings.NEPSE_SNAPSHOT_URL
+        self.factory = RequestFactory()
+
+    def render_endpoint(self, path):
+        """Run an API view in-process and return the rendered JSON body"""
+        url = API_PREFIX + path
+        request = self.factory.get(url, HTTP_HOST='localhost')
+        match = resolve(url.split('?')[0])
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code != 200:
+            return None
+        return response.content
+
+    def publish(self):
+        """Render every snapshot endpoint into a new version and update the manifest"""
+        rendered = {}
+        for name, path in SNAPSHOT_ENDPOINTS.items():
+            try:
+                content = self.render_endpoint(path)
+            except Exception as e:
+                logger.error(f"Error rendering snapshot {name}: {str(e)}")
+                continue
+            if content is None:
+                logger.warning(f"Skipping snapshot {name}: endpoint returned no data")
+                continue
+            rendered[name] = content
+
+        digest = hashlib.sha256()
+        for name in sorted(rendered):
+            digest.update(name.encode())
+            digest.update(rendered[name])
+        version = f"{timezone.now().strftime('%Y%m%d%H%M%S')}-{digest.hexdigest()[:8]}"
+
+        version_dir = os.path.join(self.output_dir, version)
+        os.makedirs(version_dir, exist_ok=True)
+
+        files = {}
+        for name, content in rendered.items():
+            files[name] = self._write_files(version_dir, version, name, content)
+
+        manifest = {
+            'version': version,
+            'generated_at': timezone.now().isoformat(),
+            'base_url': f"{self.base_url}{version}/",
+            'files': files,
+        }
+        self._write_manifest(manifest)
+        self._prune_versions(version)
+
+        logger.info(f"Published {len(files)} snapshots as version {version}")
+        return manifest
+
+    def _write_files(self, version_dir, version, name, content):
+        """Write the raw, gzip and brotli variants of one snapshot"""
+        filename = f"{name}.json"
+        path = os.path.join(version_dir, filename)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+        encodings = {'identity': len(content)}
+
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        with open(path + '.gz', 'wb') as f:
+            f.write(compressed)
+        encodings['gzip'] = len(compressed)
+
+        if brotli is not None:
+            compressed = brotli.compress(content, quality=11)
+            with open(path + '.br', 'wb') as f:
+                f.write(compressed)
+            encodings['br'] = len(compressed)
+
+        return {
+            'url': f"{self.base_url}{version}/{filename}",
+            'endpoint': API_PREFIX + SNAPSHOT_ENDPOINTS[name],
+            'sha256': hashlib.sha256(content).hexdigest(),
+            'sizes': encodings,
+        }
+
+    def _write_manifest(self, manifest):
+        """Atomically replace manifest.json so readers never see a partial file"""
+        path = os.path.join(self.output_dir, 'manifest.json')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _prune_versions(self, current_version):
+        """Remove all but the newest keep_versions snapshot directories"""
+        versions = sorted(
+            entry for entry in os.listdir(self.output_dir)
+            if os.path.isdir(os.path.join(self.output_dir, entry))
+        )
+        stale = [v for v in versions[:-self.keep_versions] if v != current_version]
+        for version in stale:
+            shutil.rmtree(os.path.join(self.output_dir, version), ignore_errors=True)
+
+
+def publish_snapshots_after_update():
+    """Post-update hook: refresh the snapshots when enabled in settings"""
+    if not getattr(settings, 'NEPSE_SNAPSHOT_ON_UPDATE', False):
+        return None
+    try:
+        return SnapshotService().publish()
+    except Exception as e:
+        logger.error(f"Error publishing snapshots: {str(e)}")
+        return None
+
+
+def _snapshot_file(path, accept_encoding):
+    """(file path, Content-Encoding) of the best variant of a snapshot the client accepts"""
+    try:
+        full_path = safe_join(settings.NEPSE_SNAPSHOT_ROOT, path)
+    except Exception:
+        raise Http404('Snapshot not found')
+    for encoding, suffix in ENCODINGS:
+        if encoding in accept_encoding and os.path.isfile(full_path + suffix):
+            return full_path + suffix, encoding
+    if os.path.isfile(full_path):
+        return full_path, None
+    raise Http404('Snapshot not found')
+
+
+def snapshot_view(request, path):
+    """
+    Serve a snapshot file from NEPSE_SNAPSHOT_ROOT. Version directories never
+    change and are cached for a year; manifest.json is revalidated every time.
+    """
+    if not path.endswith('.json'):
+        raise Http404('Snapshot not found')
+    file_path, encoding = _snapshot_file(path, request.headers.get('Accept-Encoding', ''))
+    try:
+        stat = os.stat(file_path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(file_path, 'rb'), content_type='application/json')
+            if encoding:
+                response['Content-Encoding'] = encoding
+    except FileNotFoundError:  # pruned between the lookup and the open
+        raise Http404('Snapshot not found')
+    response['ETag'] = etag
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = 'no-cache' if path == 'manifest.json' else 'public, max-age=31536000, immutable'
+    return response
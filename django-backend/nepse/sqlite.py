@@ -0,0 +1,34 @@
+"""
+Opt-in SQLite tuning for local and PythonAnywhere deployments.
+
+With NEPSE_SQLITE_TUNING enabled, every new SQLite connection gets the PRAGMAs
+in NEPSE_SQLITE_PRAGMAS. Write-ahead logging lets API readers keep reading
+while update_nepse_data or an import is writing. synchronous=NORMAL skips
+the fsync on each commit; only a checkpoint syncs. The remaining PRAGMAs
+enlarge the page cache, memory-map the file, keep temporary tables in memory
+and make a locked writer wait instead of failing.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,  # bytes
+    'cache_size': -64 * 1024,  # negative: KiB, i.e. 64 MiB
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,  # milliseconds
+}
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Tune a newly opened SQLite connection"""
+    if connection.vendor != 'sqlite' or not getattr(settings, 'NEPSE_SQLITE_TUNING', False):
+        return
+    pragmas = getattr(settings, 'NEPSE_SQLITE_PRAGMAS', None) or DEFAULT_PRAGMAS
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def connect_signals():
+    connection_created.connect(apply_pragmas, dispatch_uid='nepse.sqlite.apply_pragmas')
@@ -0,0 +1,197 @@
+"""
+Bulk sync of the Django tables into the Supabase schema (SUPABASE_DATABASE_SCHEMA.sql).
+
+Each table is synced in one transaction on the target: rows changed since the
+table's watermark are streamed from the Django database with COPY FROM STDIN
+into a temporary staging table, then merged with a single
+INSERT ... ON CONFLICT DO UPDATE. The watermark, the newest updated_at that
+was synced, is kept in the nepse_sync_state table on the target along with
+the running total of rows synced.
+"""
+import csv
+import io
+import time
+from django.conf import settings
+from .models import NEPSEIndex, NEPSEStock, NEPSEIndices
+import logging
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+logger = logging.getLogger(__name__)
+
+# Written in place of None; the COPY below reads it back as NULL
+NULL = r'\N'
+
+# Target table -> (model, conflict key columns, [(Django field, target column), ...])
+SYNC_TABLES = {
+    'nepse_index': (NEPSEIndex, ['date'], [
+        ('date', 'date'), ('open_price', 'open_price'), ('high_price', 'high_price'),
+        ('low_price', 'low_price'), ('close_price', 'close_price'), ('volume', 'volume'),
+        ('turnover', 'turnover'), ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+    ]),
+    'nepse_stocks': (NEPSEStock, ['symbol'], [
+        ('symbol', 'symbol'), ('company_name', 'company_name'), ('sector', 'sector'),
+        ('current_price', 'current_price'), ('change', 'change_amount'), ('change_percent', 'change_percent'),
+        ('volume', 'volume'), ('turnover', 'turnover'), ('high_52w', 'high_52w'), ('low_52w', 'low_52w'),
+        ('market_cap', 'market_cap'), ('pe_ratio', 'pe_ratio'), ('last_trade_time', 'last_trade_time'),
+        ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+    ]),
+    'nepse_indices': (NEPSEIndices, ['name', 'date'], [
+        ('name', 'name'), ('symbol', 'symbol'), ('current', 'current_value'), ('change', 'change_amount'),
+        ('change_percent', 'change_percent'), ('high_52w', 'high_52w'), ('low_52w', 'low_52w'),
+        ('date', 'date'), ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+    ]),
+}
+
+STATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS nepse_sync_state (
+    table_name VARCHAR(63) PRIMARY KEY,
+    watermark TIMESTAMP WITH TIME ZONE,
+    rows_synced BIGINT NOT NULL DEFAULT 0,
+    synced_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+)
+"""
+
+
+class CSVStream:
+    """File-like object rendering rows as CSV on demand, so COPY never holds the whole table"""
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buffer = b''
+        self.text = io.StringIO()
+        self.writer = csv.writer(self.text, lineterminator='\n')
+        self.count = 0
+
+    def _render(self, limit):
+        for row in self.rows:
+            self.writer.writerow([NULL if value is None else value for value in row])
+            self.count += 1
+            if self.text.tell() >= limit:
+                break
+        chunk = self.text.getvalue().encode('utf-8')
+        self.text.seek(0)
+        self.text.truncate()
+        return chunk
+
+    def read(self, size=-1):
+        limit = size if size and size > 0 else 65536
+        if len(self.buffer) < limit:
+            self.buffer += self._render(limit)
+        chunk, self.buffer = self.buffer[:limit], self.buffer[limit:]
+        return chunk
+
+
+def connect(dsn):
+    """Connection to the target Postgres with psycopg 3 or psycopg2, whichever is installed"""
+    if psycopg is not None:
+        return psycopg.connect(dsn)
+    if psycopg2 is not None:
+        return psycopg2.connect(dsn)
+    raise RuntimeError('psycopg or psycopg2 is required to sync to Postgres')
+
+
+def copy_from_stream(cursor, sql, stream):
+    if hasattr(cursor, 'copy_expert'):  # psycopg2
+        cursor.copy_expert(sql, stream)
+        return
+    with cursor.copy(sql) as copy:
+        while chunk := stream.read(65536):
+            copy.write(chunk)
+
+
+class SupabaseSync:
+    """Sync the Django NEPSE tables into a Postgres database with the Supabase schema"""
+
+    def __init__(self, dsn=None, chunk_size=5000):
+        self.dsn = dsn or settings.SUPABASE_SYNC_URL
+        self.chunk_size = chunk_size
+
+    def sync(self, tables=None, full=False):
+        """Sync each table, returns {table: result dict}"""
+        if not self.dsn:
+            raise RuntimeError('No target database, set SUPABASE_SYNC_URL')
+        results = {}
+        conn = connect(self.dsn)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(STATE_TABLE_SQL)
+            conn.commit()
+            for table in tables or SYNC_TABLES:
+                try:
+                    results[table] = self.sync_table(conn, table, full)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"Error syncing {table}: {str(e)}")
+                    raise
+        finally:
+            conn.close()
+        return results
+
+    def sync_table(self, conn, table, full=False):
+        """Stage the rows changed since the watermark with COPY and merge them, in the caller's transaction"""
+        model, key, mapping = SYNC_TABLES[table]
+        fields = [field for field, _ in mapping]
+        columns = [column for _, column in mapping]
+        column_list = ', '.join(columns)
+        staging = f'{table}_staging'
+        start = time.perf_counter()
+
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT watermark FROM nepse_sync_state WHERE table_name = %s', [table])
+            row = cursor.fetchone()
+            watermark = None if full or row is None else row[0]
+
+            queryset = model.objects.order_by().values_list(*fields)
+            if watermark is not None:
+                # Inclusive: rows sharing the watermark timestamp are merged again, harmlessly
+                queryset = queryset.filter(updated_at__gte=watermark)
+
+            cursor.execute(
+                f'CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {column_list} FROM {table} WITH NO DATA'
+            )
+            stream = CSVStream(queryset.iterator(chunk_size=self.chunk_size))
+            copy_from_stream(
+                cursor,
+                f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '{NULL}')",
+                stream,
+            )
+            staged = time.perf_counter()
+
+            updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns
+                                if column not in key and column != 'created_at')
+            cursor.execute(
+                f'INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging} '
+                f'ON CONFLICT ({", ".join(key)}) DO UPDATE SET {updates}'
+            )
+            merged = cursor.rowcount
+
+            cursor.execute(f'SELECT max(updated_at) FROM {staging}')
+            new_watermark = cursor.fetchone()[0] or watermark
+            cursor.execute(
+                'INSERT INTO nepse_sync_state (table_name, watermark, rows_synced, synced_at) '
+                'VALUES (%s, %s, %s, NOW()) ON CONFLICT (table_name) DO UPDATE SET '
+                'watermark = EXCLUDED.watermark, '
+                'rows_synced = nepse_sync_state.rows_synced + EXCLUDED.rows_synced, synced_at = NOW()',
+                [table, new_watermark, stream.count]
+            )
+
+        elapsed = time.perf_counter() - start
+        return {
+            'since': watermark,
+            'watermark': new_watermark,
+            'rows': stream.count,
+            'merged': merged,
+            'copy_seconds': round(staged - start, 3),
+            'merge_seconds': round(elapsed - (staged - start), 3),
+            'rows_per_second': round(stream.count / elapsed, 1) if elapsed else 0.0,
+        }
@@ -0,0 +1,339 @@
+"""
+Vectorized synthetic NEPSE market generator for sample data and load testing.
+
+Daily log returns follow a one-factor-per-sector model: every stock loads on a
+market factor and on its sector's factor, plus idiosyncratic noise, so stocks in
+the same sector are correlated and prices follow a geometric Brownian motion.
+All paths are generated as NumPy matrices (sessions x symbols) on the NEPSE
+trading calendar (Sunday-Thursday, less market holidays); the NEPSE index and the sector indices are
+market-cap weighted averages of those paths. Stocks pay random bonus shares:
+the simulated paths are the adjusted prices, and the daily StockPrice closes
+are raw, dropping on every ex-date. Rows are bulk-inserted in chunks, and the
+full per-symbol daily panel can be written to CSV or Parquet fixtures.
+"""
+import csv
+import os
+from datetime import timedelta
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from .counters import refresh_counters
+from .market_cap import cap_bucket, parse_market_cap
+from .adjustments import recompute_all_factors
+from .models import CorporateAction, NEPSEIndex, NEPSEStock, NEPSEIndices, StockPrice
+from .sectors import refresh_sectors
+from .services_simple import invalidate_series_cache
+from .trading_calendar import SESSIONS_PER_YEAR, TRADING_WEEKMASK, get_calendar, nepal_today
+
+import logging
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+# Sector name -> sector index symbol
+SECTORS = {
+    'Commercial Banks': 'BANKING',
+    'Development Banks': 'DEVBANK',
+    'Finance': 'FINANCE',
+    'Microfinance': 'MICROFIN',
+    'Hydropower': 'HYDRO',
+    'Life Insurance': 'LIFEINS',
+    'Non Life Insurance': 'NONLIFEINS',
+    'Hotels And Tourism': 'HOTELS',
+    'Manufacturing And Processing': 'MANUFACTURE',
+    'Investment': 'INVESTMENT',
+    'Trading': 'TRADING',
+    'Others': 'OTHERS',
+}
+
+# Bonus issues a year per stock, and the bonus ratios drawn
+BONUS_RATE = 0.5
+BONUS_RATIOS = [0.05, 0.1, 0.15, 0.2, 0.25]
+
+
+def trading_days(start, end):
+    """NEPSE sessions from start to end inclusive as a datetime64[D] array, market holidays excluded"""
+    days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+    holidays = np.array(sorted(get_calendar().holidays), dtype='datetime64[D]')
+    return days[np.is_busday(days, weekmask=TRADING_WEEKMASK, holidays=holidays)]
+
+
+def rolling_extreme(values, window, func):
+    """Trailing-window max/min along axis 0, for 52-week highs and lows"""
+    padded = np.concatenate([np.repeat(values[:1], window - 1, axis=0), values])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window, axis=0)
+    return func(windows, axis=-1)
+
+
+class SyntheticMarket:
+    """Correlated daily OHLCV paths for `symbols` stocks over `years` years"""
+
+    def __init__(self, symbols=300, years=10, seed=42, end=None, days=None):
+        self.rng = np.random.default_rng(seed)
+        end = end or nepal_today()
+        start = end - timedelta(days=days if days else int(365.25 * years))
+        self.dates = trading_days(start, end)
+        self.sector_names = list(SECTORS)
+        self.symbols = np.array([f'SYM{i:04d}' for i in range(1, symbols + 1)])
+        self.sectors = self.rng.integers(0, len(self.sector_names), symbols)
+        self._simulate()
+        # Own generator, so the bonus issues do not shift the draws of the prices
+        self._simulate_bonuses(np.random.default_rng([seed, 1]))
+
+    def _simulate(self):
+        rng = self.rng
+        n_days, n_symbols = len(self.dates), len(self.symbols)
+        n_sectors = len(self.sector_names)
+        dt = 1 / SESSIONS_PER_YEAR
+
+        # Annualised parameters per stock and per sector
+        drift = rng.normal(0.08, 0.06, n_symbols)
+        beta = rng.uniform(0.6, 1.4, n_symbols)
+        market_vol = 0.15
+        sector_vol = rng.uniform(0.08, 0.20, n_sectors)[self.sectors]
+        idio_vol = rng.uniform(0.15, 0.35, n_symbols)
+        total_vol = np.sqrt((beta * market_vol) ** 2 + sector_vol ** 2 + idio_vol ** 2)
+
+        market = rng.standard_normal((n_days, 1))
+        sector = rng.standard_normal((n_days, n_sectors))[:, self.sectors]
+        idio = rng.standard_normal((n_days, n_symbols))
+        shocks = beta * market_vol * market + sector_vol * sector + idio_vol * idio
+        log_returns = (drift - 0.5 * total_vol ** 2) * dt + shocks * np.sqrt(dt)
+
+        initial = rng.lognormal(np.log(400), 0.8, n_symbols)
+        self.close = initial * np.exp(np.cumsum(log_returns, axis=0))
+        previous_close = np.vstack([initial, self.close[:-1]])
+        gap = rng.normal(0, 0.003, (n_days, n_symbols))
+        self.open = previous_close * np.exp(gap)
+        wick = np.abs(rng.normal(0, 0.01, (2, n_days, n_symbols)))
+        self.high = np.maximum(self.open, self.close) * (1 + wick[0])
+        self.low = np.minimum(self.open, self.close) * (1 - wick[1])
+
+        self.shares = rng.lognormal(np.log(2e7), 1.0, n_symbols).astype(np.int64)
+        liquidity = rng.lognormal(np.log(2e4), 1.2, n_symbols)
+        self.volume = (liquidity * rng.lognormal(0, 0.5, (n_days, n_symbols))).astype(np.int64)
+
+    def _simulate_bonuses(self, rng):
+        n_days, n_symbols = self.close.shape
+        # (session, symbol) of each ex-date, none on the first session
+        self.bonus = rng.random((n_days, n_symbols)) < BONUS_RATE / SESSIONS_PER_YEAR
+        self.bonus[0] = False
+        self.bonus_ratio = np.where(self.bonus, rng.choice(BONUS_RATIOS, (n_days, n_symbols)), 0.0)
+        # Raw price = adjusted price / product of the factors of the ex-dates after the session
+        factors = 1 / (1 + self.bonus_ratio)
+        later = np.cumprod(factors[::-1], axis=0)[::-1]
+        self.adjustment = np.vstack([later[1:], np.ones((1, n_symbols))])
+
+    def _cap_weighted(self, columns, base):
+        """Index level series of the given stock columns, starting at `base`"""
+        caps = self.shares[columns]
+        start_cap = (self.open[0, columns] * caps).sum()
+        return {
+            name: base * (prices[:, columns] @ caps) / start_cap
+            for name, prices in (('open', self.open), ('high', self.high),
+                                 ('low', self.low), ('close', self.close))
+        }
+
+    def index_rows(self, base=1000.0):
+        """NEPSEIndex rows, one per session"""
+        columns = np.arange(len(self.symbols))
+        level = {name: np.round(values, 2).tolist() for name, values in self._cap_weighted(columns, base).items()}
+        volume = self.volume.sum(axis=1)
+        turnover = (self.volume * self.close).sum(axis=1).astype(np.int64)
+        for i, day in enumerate(self.dates.tolist()):
+            yield NEPSEIndex(
+                date=day,
+                open_price=level['open'][i],
+                high_price=level['high'][i],
+                low_price=level['low'][i],
+                close_price=level['close'][i],
+                volume=int(volume[i]),
+                turnover=int(turnover[i]),
+            )
+
+    def indices_rows(self):
+        """NEPSEIndices rows for the NEPSE index and every sector index, one per session"""
+        groups = [('NEPSE Index', 'NEPSE', np.arange(len(self.symbols)), 1000.0)]
+        for i, name in enumerate(self.sector_names):
+            columns = np.flatnonzero(self.sectors == i)
+            if len(columns):
+                groups.append((f'{name} Index', SECTORS[name], columns, 500.0))
+
+        dates = self.dates.tolist()
+        for name, symbol, columns, base in groups:
+            close = self._cap_weighted(columns, base)['close']
+            previous = np.concatenate([[base], close[:-1]])
+            change = close - previous
+            change_percent = change / previous * 100
+            high_52w = rolling_extreme(close, SESSIONS_PER_YEAR, np.max)
+            low_52w = rolling_extreme(close, SESSIONS_PER_YEAR, np.min)
+            values = zip(*(np.round(v, 2).tolist() for v in (close, change, change_percent, high_52w, low_52w)))
+            for day, (current, chg, pct, high, low) in zip(dates, values):
+                yield NEPSEIndices(
+                    name=name, symbol=symbol, date=day, current=current, change=chg,
+                    change_percent=pct, high_52w=high, low_52w=low,
+                )
+
+    def stock_rows(self):
+        """NEPSEStock rows: the state of every stock as of the last session"""
+        window = min(SESSIONS_PER_YEAR, len(self.dates))
+        last, previous = self.close[-1], self.close[-2] if len(self.dates) > 1 else self.open[0]
+        change = last - previous
+        high_52w = self.high[-window:].max(axis=0)
+        low_52w = self.low[-window:].min(axis=0)
+        market_cap = last * self.shares
+        pe_ratio = self.rng.uniform(8, 45, len(self.symbols))
+        now = timezone.now()
+
+        columns = (last, change, change / previous * 100, high_52w, low_52w, pe_ratio)
+        values = zip(*(np.round(v, 2).tolist() for v in columns))
+        for i, (price, chg, pct, high, low, pe) in enumerate(values):
+            label = f'{market_cap[i] / 1e9:.1f}B'
+            # bulk_create skips NEPSEStock.save(), which derives these from the label
+            market_cap_value = parse_market_cap(label)
+            yield NEPSEStock(
+                symbol=str(self.symbols[i]),
+                company_name=f'Synthetic {self.sector_names[self.sectors[i]]} Company {i + 1} Limited',
+                sector=self.sector_names[self.sectors[i]],
+                current_price=price,
+                change=chg,
+                change_percent=pct,
+                volume=int(self.volume[-1, i]),
+                turnover=int(self.volume[-1, i] * last[i]),
+                high_52w=high,
+                low_52w=low,
+                market_cap=label,
+                market_cap_value=market_cap_value,
+                cap_bucket=cap_bucket(market_cap_value),
+                pe_ratio=pe,
+                last_trade_time=now,
+            )
+
+    def stock_price_rows(self):
+        """StockPrice rows: raw daily close and volume of every stock, before bonus adjustment"""
+        closes = np.round(self.close / self.adjustment, 2).T.tolist()
+        volumes = np.rint(self.volume * self.adjustment).astype(np.int64).T.tolist()
+        dates = self.dates.tolist()
+        for i, symbol in enumerate(self.symbols.tolist()):
+            for day, close, volume in zip(dates, closes[i], volumes[i]):
+                yield StockPrice(symbol=symbol, date=day, close=close, volume=volume)
+
+    def corporate_action_rows(self):
+        """CorporateAction rows: the simulated bonus issues"""
+        for day, i in zip(*np.nonzero(self.bonus)):
+            ratio = float(self.bonus_ratio[day, i])
+            yield CorporateAction(
+                symbol=str(self.symbols[i]),
+                action_type=CorporateAction.BONUS,
+                ex_date=self.dates[day].item(),
+                ratio=ratio,
+                description=f'{ratio * 100:g}% bonus shares',
+            )
+
+    def load(self, chunk_size=5000):
+        """
+        Bulk-insert index, indices, stock, price and corporate action rows in
+        chunks, link the sectors and store the adjustment factors, returns row counts
+        """
+        counts = {
+            'index': bulk_insert(NEPSEIndex, self.index_rows(), chunk_size),
+            'indices': bulk_insert(NEPSEIndices, self.indices_rows(), chunk_size),
+            'stocks': bulk_insert(NEPSEStock, self.stock_rows(), chunk_size),
+            'prices': bulk_insert(StockPrice, self.stock_price_rows(), chunk_size),
+            'corporate_actions': bulk_insert(CorporateAction, self.corporate_action_rows(), chunk_size),
+        }
+        refresh_counters()
+        refresh_sectors()
+        # bulk_create skips the signal that recomputes factors per saved action
+        recompute_all_factors()
+        invalidate_series_cache()
+        return counts
+
+    def price_columns(self):
+        """Long-format daily panel (one row per symbol and session) as column arrays"""
+        n_days, n_symbols = self.close.shape
+        return {
+            'date': np.repeat(self.dates, n_symbols),
+            'symbol': np.tile(self.symbols, n_days),
+            'sector': np.tile(np.array(self.sector_names)[self.sectors], n_days),
+            'open': np.round(self.open, 2).ravel(),
+            'high': np.round(self.high, 2).ravel(),
+            'low': np.round(self.low, 2).ravel(),
+            'close': np.round(self.close, 2).ravel(),
+            'volume': self.volume.ravel(),
+        }
+
+    def index_columns(self):
+        """NEPSE index OHLCV as column arrays"""
+        level = self._cap_weighted(np.arange(len(self.symbols)), 1000.0)
+        return {
+            'date': self.dates,
+            **{name: np.round(level[name], 2) for name in ('open', 'high', 'low', 'close')},
+            'volume': self.volume.sum(axis=1),
+            'turnover': (self.volume * self.close).sum(axis=1).astype(np.int64),
+        }
+
+    def write_csv(self, directory, chunk_size=100000):
+        """Write prices.csv and index.csv fixtures, returns the written paths"""
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for name, columns in (('prices', self.price_columns()), ('index', self.index_columns())):
+            path = os.path.join(directory, f'{name}.csv')
+            length = len(columns['date'])
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for start in range(0, length, chunk_size):
+                    chunk = [values[start:start + chunk_size].astype(str) for values in columns.values()]
+                    writer.writerows(zip(*chunk))
+            paths.append(path)
+        return paths
+
+    def write_parquet(self, directory):
+        """Write prices.parquet and index.parquet fixtures, returns the written paths"""
+        if pyarrow is None:
+            raise RuntimeError('pyarrow is required to write Parquet fixtures')
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for name, columns in (('prices', self.price_columns()), ('index', self.index_columns())):
+            path = os.path.join(directory, f'{name}.parquet')
+            table = pyarrow.table({key: pyarrow.array(values) for key, values in columns.items()})
+            pyarrow.parquet.write_table(table, path)
+            paths.append(path)
+        return paths
+
+
+def bulk_insert(model, rows, chunk_size=5000):
+    """
+    Insert model instances from an iterator in chunks of one transaction each,
+    returns the number of rows inserted. Rows that conflict with existing ones
+    (same date, symbol...) are skipped, keeping the stored values.
+    """
+    before = model.objects.count()
+    offered = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            offered += _insert_chunk(model, chunk)
+            chunk = []
+    if chunk:
+        offered += _insert_chunk(model, chunk)
+    # ignore_conflicts hides which rows were skipped: count the table instead
+    inserted = model.objects.count() - before
+    if inserted < offered:
+        logger.warning(
+            f"{model.__name__}: {offered - inserted} of {offered} rows already existed and were kept"
+        )
+    return inserted
+
+
+def _insert_chunk(model, chunk):
+    with transaction.atomic():
+        model.objects.bulk_create(chunk, batch_size=len(chunk), ignore_conflicts=True)
+    return len(chunk)
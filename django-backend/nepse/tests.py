@@ -0,0 +1,86 @@
+from datetime import date
+from decimal import Decimal
+from django.db.models import Max
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from .fields import PaisaSerializerField, avg_rupees, from_paisa, paisa, to_paisa
+from .models import NEPSEIndex, NEPSEStock
+from .serializers import NEPSEStockSerializer
+
+
+def make_stock(symbol, price):
+    return NEPSEStock.objects.create(
+        symbol=symbol, company_name=f'{symbol} Limited', sector='Banking',
+        current_price=price, change=0, change_percent=0, volume=1000, turnover=100000,
+        high_52w=price, low_52w=price, market_cap='10B', last_trade_time=timezone.now(),
+    )
+
+
+class PaisaConversionTests(SimpleTestCase):
+    def test_to_paisa_takes_floats_as_written(self):
+        self.assertEqual(to_paisa(2800.55), 280055)
+        self.assertEqual(to_paisa(0.29), 29)
+        self.assertEqual(to_paisa(1.005), 101)
+
+    def test_to_paisa_rounds_half_up(self):
+        self.assertEqual(to_paisa(Decimal('500.005')), 50001)
+        self.assertEqual(to_paisa('500.004'), 50000)
+        self.assertEqual(to_paisa(12), 1200)
+
+    def test_from_paisa_returns_two_place_rupees(self):
+        self.assertEqual(from_paisa(50001), Decimal('500.01'))
+        self.assertEqual(str(from_paisa(1200)), '12.00')
+
+
+class PaisaFieldTests(TestCase):
+    def setUp(self):
+        make_stock('LOW', Decimal('499.99'))
+        make_stock('MID', Decimal('500.00'))
+        make_stock('HIGH', Decimal('500.01'))
+
+    def test_values_load_as_rupees(self):
+        stock = NEPSEStock.objects.get(symbol='HIGH')
+        self.assertEqual(stock.current_price, Decimal('500.01'))
+        self.assertEqual(NEPSEStock.objects.filter(symbol='HIGH').values_list(paisa('current_price'), flat=True)[0],
+                         50001)
+
+    def test_lookups_compare_rupees(self):
+        def symbols(**lookup):
+            return sorted(NEPSEStock.objects.filter(**lookup).values_list('symbol', flat=True))
+
+        self.assertEqual(symbols(current_price__lt=500), ['LOW'])
+        self.assertEqual(symbols(current_price__lt=500.005), ['LOW', 'MID'])
+        self.assertEqual(symbols(current_price__gte=500.005), ['HIGH'])
+        self.assertEqual(symbols(current_price=500.01), ['HIGH'])
+        self.assertEqual(symbols(current_price__lte=Decimal('500.00')), ['LOW', 'MID'])
+
+    def test_aggregates_return_rupees(self):
+        result = NEPSEStock.objects.aggregate(high=Max('current_price'), average=avg_rupees('current_price'))
+        self.assertEqual(result['high'], Decimal('500.01'))
+        self.assertAlmostEqual(result['average'], 500.0)
+
+    def test_index_aggregate(self):
+        for day, close in ((date(2024, 1, 1), '2800.55'), (date(2024, 1, 2), '2810.10')):
+            NEPSEIndex.objects.create(
+                date=day, open_price=close, high_price=close, low_price=close, close_price=close,
+                volume=1, turnover=1,
+            )
+        self.assertEqual(NEPSEIndex.objects.aggregate(Max('close_price'))['close_price__max'], Decimal('2810.10'))
+
+
+class PaisaSerializerFieldTests(TestCase):
+    def test_field_outputs_rupees(self):
+        field = PaisaSerializerField()
+        self.assertEqual(field.to_representation(Decimal('500.01')), 500.01)
+        self.assertIsNone(field.to_representation(None))
+
+    def test_string_output_keeps_two_places(self):
+        field = PaisaSerializerField(coerce_to_string=True)
+        self.assertEqual(field.to_representation(Decimal('12.5')), '12.50')
+
+    def test_model_serializer_uses_rupees(self):
+        make_stock('NABIL', 1234.5)
+        data = NEPSEStockSerializer(NEPSEStock.objects.get(symbol='NABIL')).data
+        self.assertIsInstance(data['current_price'], float)
+        self.assertEqual(data['current_price'], 1234.5)
+        self.assertEqual(data['high_52w'], 1234.5)
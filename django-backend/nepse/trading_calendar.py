@@ -0,0 +1,165 @@
+"""
+NEPSE trading calendar.
+
+NEPSE trades Sunday to Thursday, 11:00 to 15:00 Nepal time, except on the
+holidays in the MarketHoliday table. TradingCalendar precomputes the session
+dates and, for every calendar day, the ordinal of the last session on or
+before it, so previous/next session, session offsets and "last N sessions"
+are list lookups; a range of sessions becomes one date__range query on the
+indexed date column.
+
+get_calendar() keeps one calendar per process, rebuilt when a holiday is
+saved or deleted in this process and at least every CALENDAR_TTL seconds,
+so other workers pick up holiday changes too.
+"""
+import time
+from datetime import date, datetime, time as clock, timedelta
+from zoneinfo import ZoneInfo
+from django.db import DatabaseError
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from .models import MarketHoliday
+import logging
+
+logger = logging.getLogger(__name__)
+
+NEPAL_TZ = ZoneInfo('Asia/Kathmandu')
+SESSION_OPEN = clock(11, 0)
+SESSION_CLOSE = clock(15, 0)
+
+# Python weekdays (Monday is 0) with a session: Sunday to Thursday
+TRADING_WEEKDAYS = frozenset({6, 0, 1, 2, 3})
+# The same as a numpy weekmask, Monday first
+TRADING_WEEKMASK = '1111001'
+SESSIONS_PER_YEAR = 246
+WEEK_SESSIONS = 5
+
+CALENDAR_START = date(1994, 1, 1)
+CALENDAR_DAYS_AHEAD = 730
+CALENDAR_TTL = 3600
+
+_calendar = [None, 0.0]  # [TradingCalendar, time.monotonic() when built]
+
+
+def nepal_now():
+    return timezone.now().astimezone(NEPAL_TZ)
+
+
+def nepal_today():
+    """Today's date in Nepal, whatever the server time zone"""
+    return nepal_now().date()
+
+
+def as_date(day):
+    """A date, or the Nepal date of a datetime"""
+    if isinstance(day, datetime):
+        return day.astimezone(NEPAL_TZ).date() if timezone.is_aware(day) else day.date()
+    return day
+
+
+class TradingCalendar:
+    """Session dates between `start` and `end` with O(1) lookups by calendar day"""
+
+    def __init__(self, holidays=(), start=CALENDAR_START, end=None):
+        self.start = start
+        self.end = end or nepal_today() + timedelta(days=CALENDAR_DAYS_AHEAD)
+        self.holidays = frozenset(holidays)
+        self.sessions = []
+        # Calendar day offset from `start` -> ordinal of the last session on or before it (-1 before the first)
+        self._last_ordinal = []
+        day = self.start
+        while day <= self.end:
+            if day.weekday() in TRADING_WEEKDAYS and day not in self.holidays:
+                self.sessions.append(day)
+            self._last_ordinal.append(len(self.sessions) - 1)
+            day += timedelta(days=1)
+
+    def _day_offset(self, day):
+        offset = (day - self.start).days
+        if not 0 <= offset < len(self._last_ordinal):
+            raise ValueError(f'{day} is outside the trading calendar ({self.start} to {self.end})')
+        return offset
+
+    def _session(self, ordinal):
+        if not 0 <= ordinal < len(self.sessions):
+            raise ValueError(f'Session {ordinal} is outside the trading calendar ({self.start} to {self.end})')
+        return self.sessions[ordinal]
+
+    def is_session(self, day):
+        day = as_date(day)
+        ordinal = self._last_ordinal[self._day_offset(day)]
+        return ordinal >= 0 and self.sessions[ordinal] == day
+
+    def session_ordinal(self, day):
+        """Ordinal of the session on or before `day`, counted from the first session of the calendar"""
+        ordinal = self._last_ordinal[self._day_offset(as_date(day))]
+        if ordinal < 0:
+            raise ValueError(f'No session on or before {day}')
+        return ordinal
+
+    def session_on_or_before(self, day):
+        return self.sessions[self.session_ordinal(day)]
+
+    def previous_session(self, day):
+        """Last session strictly before `day`"""
+        ordinal = self.session_ordinal(day)
+        return self._session(ordinal - 1 if self.sessions[ordinal] == as_date(day) else ordinal)
+
+    def next_session(self, day):
+        """First session strictly after `day`"""
+        return self._session(self._last_ordinal[self._day_offset(as_date(day))] + 1)
+
+    def session_offset(self, day, sessions):
+        """The session `sessions` sessions after (negative: before) the session on or before `day`"""
+        return self._session(self.session_ordinal(day) + sessions)
+
+    def sessions_between(self, start, end):
+        """Session dates from `start` to `end` inclusive"""
+        start, end = as_date(start), as_date(end)
+        first = self._last_ordinal[self._day_offset(start)]
+        if first < 0 or self.sessions[first] != start:
+            first += 1
+        return self.sessions[first:self._last_ordinal[self._day_offset(end)] + 1]
+
+    def last_sessions(self, count, end=None):
+        """(first, last) session dates of the `count` sessions up to `end` (default today), for date__range"""
+        last = self.session_ordinal(end or nepal_today())
+        return self.sessions[max(last - count + 1, 0)], self.sessions[last]
+
+
+def load_holidays():
+    """Holiday dates from the MarketHoliday table, none before it is migrated"""
+    try:
+        return list(MarketHoliday.objects.values_list('date', flat=True))
+    except DatabaseError as e:
+        logger.error(f"Error loading market holidays: {str(e)}")
+        return []
+
+
+def get_calendar():
+    """The process-wide trading calendar, rebuilt when stale"""
+    calendar, built = _calendar
+    if (calendar is None or time.monotonic() - built > CALENDAR_TTL
+            or nepal_today() + timedelta(days=CALENDAR_DAYS_AHEAD // 2) > calendar.end):
+        calendar = TradingCalendar(load_holidays())
+        _calendar[:] = [calendar, time.monotonic()]
+    return calendar
+
+
+def invalidate_calendar(**kwargs):
+    _calendar[0] = None
+
+
+def latest_session(at=None):
+    """The session on or before `at` (default now), by Nepal date"""
+    return get_calendar().session_on_or_before(at or nepal_now())
+
+
+def is_market_open(at=None):
+    at = (at or timezone.now()).astimezone(NEPAL_TZ)
+    return get_calendar().is_session(at.date()) and SESSION_OPEN <= at.time() < SESSION_CLOSE
+
+
+def connect_signals():
+    post_save.connect(invalidate_calendar, sender=MarketHoliday, dispatch_uid='nepse.trading_calendar.saved')
+    post_delete.connect(invalidate_calendar, sender=MarketHoliday, dispatch_uid='nepse.trading_calendar.deleted')
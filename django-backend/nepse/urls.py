@@ -6,6 +6,7 @@ from . import views_extended
 router = DefaultRouter()
 router.register(r'index', views.NEPSEIndexViewSet, basename='nepse-index')
 router.register(r'stocks', views.NEPSEStockViewSet, basename='nepse-stocks')
+router.register(r'sectors', views.SectorViewSet, basename='nepse-sectors')
 router.register(r'indices', views.NEPSEIndicesViewSet, basename='nepse-indices')
 router.register(r'logs', views.DataUpdateLogViewSet, basename='data-logs')
 router.register(r'overview', views.MarketOverviewViewSet, basename='market-overview')
@@ -3,14 +3,19 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from datetime import timedelta
 from django.utils import timezone
-from django.db.models import Q
-from .models import NEPSEIndex, NEPSEStock, NEPSEIndices, DataUpdateLog
+from django.db.models import F, Q
+from .models import NEPSEIndex, NEPSEStock, NEPSEIndices, DataUpdateLog, Sector
 from .serializers import (
-    NEPSEIndexSerializer, NEPSEStockSerializer, NEPSEIndicesSerializer,
+    NEPSEIndexSerializer, NEPSEStockSerializer, NEPSEIndicesSerializer, SectorSerializer,
     DataUpdateLogSerializer, ChartDataSerializer, MarketOverviewSerializer
 )
 from .services_simple import NEPSEDataService, ChartDataService
+from .adjustments import stock_series
+from .renderers import SERIES_RENDERER_CLASSES
+from .candles import CandleService
+from .sectors import sector_slug
 import logging
 
 logger = logging.getLogger(__name__)
@@ -39,20 +44,52 @@ class NEPSEIndexViewSet(viewsets.ReadOnlyModelViewSet):
     def chart_data(self, request):
         """Get chart data for NEPSE index"""
         days = int(request.query_params.get('days', 30))
+        points = request.query_params.get('points')
         chart_service = ChartDataService()
-        data = chart_service.get_index_chart_data(days)
+        data = chart_service.get_index_chart_data(days, points=int(points) if points else None)
         serializer = ChartDataSerializer(data)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], renderer_classes=SERIES_RENDERER_CLASSES)
+    def series(self, request):
+        """
+        Get columnar OHLCV series for NEPSE index.
+        Supports ?format=msgpack and ?format=arrow for compact binary payloads,
+        and ?points=N&method=lttb|ohlc to downsample long ranges.
+        """
+        days = int(request.query_params.get('days', 30))
+        points = request.query_params.get('points')
+        method = request.query_params.get('method', 'lttb')
+        chart_service = ChartDataService()
+        return Response(chart_service.get_index_series(
+            days, points=int(points) if points else None, method=method
+        ))
+
+    @action(detail=False, methods=['get'])
+    def candles(self, request):
+        """Get NEPSE index OHLCV candles resampled to weekly/monthly/quarterly/yearly bars"""
+        period = request.query_params.get('period', 'weekly')
+        limit = request.query_params.get('limit')
+        try:
+            bars = CandleService().get_index_candles(period, limit=int(limit) if limit else None)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(bars)
+
 
 class NEPSEStockViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for NEPSE Stock data"""
     queryset = NEPSEStock.objects.all()
     serializer_class = NEPSEStockSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['sector', 'symbol']
+    filterset_fields = {
+        'sector': ['exact'],
+        'symbol': ['exact'],
+        'cap_bucket': ['exact'],
+        'market_cap_value': ['gte', 'lte'],
+    }
     search_fields = ['symbol', 'company_name', 'sector']
-    ordering_fields = ['current_price', 'change_percent', 'volume', 'turnover']
+    ordering_fields = ['current_price', 'change_percent', 'volume', 'turnover', 'market_cap_value']
     ordering = ['-current_price']
 
     @action(detail=False, methods=['get'])
@@ -81,10 +118,10 @@ class NEPSEStockViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=['get'])
     def by_sector(self, request):
-        """Get stocks grouped by sector"""
+        """Get stocks of a sector by slug (a sector name maps to the same slug)"""
         sector = request.query_params.get('sector')
         if sector:
-            stocks = self.get_queryset().filter(sector__icontains=sector)
+            stocks = self.get_queryset().filter(sector_ref__slug=sector_slug(sector))
         else:
             stocks = self.get_queryset()
         serializer = self.get_serializer(stocks, many=True)
@@ -102,20 +139,62 @@ class NEPSEStockViewSet(viewsets.ReadOnlyModelViewSet):
             return Response({
                 'symbol': stock.symbol,
                 'company_name': stock.company_name,
-                'current_price': float(stock.current_price),
-                'change': float(stock.change),
-                'change_percent': float(stock.change_percent),
+                'current_price': stock.current_price,
+                'change': stock.change,
+                'change_percent': stock.change_percent,
                 'volume': stock.volume,
                 'last_trade_time': stock.last_trade_time,
                 'sector': stock.sector,
-                'high_52w': float(stock.high_52w),
-                'low_52w': float(stock.low_52w),
+                'high_52w': stock.high_52w,
+                'low_52w': stock.low_52w,
                 'market_cap': stock.market_cap,
-                'pe_ratio': float(stock.pe_ratio) if stock.pe_ratio else None
+                'market_cap_value': stock.market_cap_value,
+                'cap_bucket': stock.cap_bucket,
+                'pe_ratio': stock.pe_ratio
             })
         except NEPSEStock.DoesNotExist:
             return Response({'error': f'Stock with symbol {symbol} not found'}, status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=False, methods=['get'], renderer_classes=SERIES_RENDERER_CLASSES)
+    def history(self, request):
+        """
+        Get columnar daily close and volume for a stock symbol, adjusted for
+        bonus, rights and split issues unless ?adjusted=false.
+        Supports ?format=msgpack and ?format=arrow like the index series.
+        """
+        symbol = request.query_params.get('symbol', '').upper()
+        if not symbol:
+            return Response({'error': 'Symbol parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+        days = int(request.query_params.get('days', 365))
+        adjusted = request.query_params.get('adjusted', 'true').lower() not in ('false', '0', 'no')
+        end_date = timezone.now().date()
+        try:
+            series = stock_series(symbol, end_date - timedelta(days=days), end_date, adjusted=adjusted)
+        except RuntimeError as e:
+            return Response({'error': str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        return Response(series)
+
+
+class SectorViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet for sectors and their precomputed aggregates, looked up by slug"""
+    queryset = Sector.objects.all()
+    serializer_class = SectorSerializer
+    lookup_field = 'slug'
+    filter_backends = [OrderingFilter]
+    ordering_fields = ['name', 'stock_count', 'total_turnover', 'total_market_cap', 'avg_change',
+                       'cap_weighted_change']
+    ordering = ['name']
+
+    @action(detail=True, methods=['get'])
+    def stocks(self, request, slug=None):
+        """Get a sector with its stocks, largest market cap first"""
+        sector = self.get_object()
+        stocks = sector.stocks.order_by(F('market_cap_value').desc(nulls_last=True), 'symbol')
+        return Response({
+            'sector': self.get_serializer(sector).data,
+            'stocks': NEPSEStockSerializer(stocks, many=True).data,
+        })
+
 
 class NEPSEIndicesViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for NEPSE Indices data"""
@@ -130,7 +209,8 @@ class NEPSEIndicesViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def latest(self, request):
         """Get the latest indices data"""
-        latest_date = self.get_queryset().values_list('date', flat=True).first()
+        # Ordered by the date index only, so on a partitioned table just the newest partition is read
+        latest_date = self.get_queryset().order_by('-date').values_list('date', flat=True).first()
         if latest_date:
             latest_indices = self.get_queryset().filter(date=latest_date)
             serializer = self.get_serializer(latest_indices, many=True)
@@ -166,7 +246,7 @@ class MarketOverviewViewSet(viewsets.ViewSet):
             most_active = NEPSEStock.objects.order_by('-volume')[:5]
             
             # Get latest indices
-            latest_date = NEPSEIndices.objects.values_list('date', flat=True).first()
+            latest_date = NEPSEIndices.objects.order_by('-date').values_list('date', flat=True).first()
             indices = NEPSEIndices.objects.filter(date=latest_date) if latest_date else NEPSEIndices.objects.none()
             
             overview_data = {
@@ -193,17 +273,19 @@ class MarketOverviewViewSet(viewsets.ViewSet):
         """Get comprehensive chart data"""
         chart_type = request.query_params.get('type', 'index')
         days = int(request.query_params.get('days', 30))
+        points = request.query_params.get('points')
+        points = int(points) if points else None
         
         chart_service = ChartDataService()
         
         if chart_type == 'index':
-            data = chart_service.get_index_chart_data(days)
+            data = chart_service.get_index_chart_data(days, points=points)
         elif chart_type == 'stocks':
             data = chart_service.get_stocks_chart_data(days)
         elif chart_type == 'sectors':
             data = chart_service.get_sectors_chart_data(days)
         else:
-            data = chart_service.get_index_chart_data(days)
+            data = chart_service.get_index_chart_data(days, points=points)
         
         serializer = ChartDataSerializer(data)
         return Response(serializer.data)
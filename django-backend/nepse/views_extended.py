@@ -1,24 +1,40 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.permissions import IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from django.conf import settings
 from django.utils import timezone
-from django.db.models import Q, Avg, Max, Min, Sum
-from django.db.models.functions import TruncDay, TruncMonth
-from .models import NEPSEIndex, NEPSEStock, NEPSEIndices, DataUpdateLog
+from django.db.models import F, Q, Avg, Count, Max, Min, Sum
+from .models import NEPSEIndex, NEPSEStock, NEPSEIndices, DataUpdateLog, Sector
 from .serializers import (
     NEPSEIndexSerializer, NEPSEStockSerializer, NEPSEIndicesSerializer,
     DataUpdateLogSerializer, ChartDataSerializer, MarketOverviewSerializer
 )
 from .services_simple import NEPSEDataService, ChartDataService
+from .middleware import endpoint_stats
+from .counters import DATASETS, exact_stats, get_counters
+from .db_routers import ReplicaReadMixin
+from .fields import avg_rupees
+from .trading_calendar import SESSIONS_PER_YEAR, WEEK_SESSIONS, get_calendar, nepal_today
+from .market_cap import with_cap_shares
+from .history import (
+    EPOCH_ORDINAL, daily_returns, max_drawdown, moving_average, read_index_window, read_indices_windows,
+    returns_correlation
+)
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # index_statistics is unavailable
+    np = None
 
 logger = logging.getLogger(__name__)
 
 
-class SagarmathaAnalyticsViewSet(viewsets.ViewSet):
+class SagarmathaAnalyticsViewSet(ReplicaReadMixin, viewsets.ViewSet):
     """Advanced analytics endpoints for Sagarmatha Investments"""
     
     @action(detail=False, methods=['get'])
@@ -36,14 +52,14 @@ class SagarmathaAnalyticsViewSet(viewsets.ViewSet):
             # Get sector distribution
             sector_stats = NEPSEStock.objects.values('sector').annotate(
                 count=Sum('volume'),
-                avg_price=Avg('current_price')
+                avg_price=avg_rupees('current_price')
             ).order_by('-count')
             
             # Get price range statistics
             price_stats = NEPSEStock.objects.aggregate(
                 max_price=Max('current_price'),
                 min_price=Min('current_price'),
-                avg_price=Avg('current_price')
+                avg_price=avg_rupees('current_price')
             )
             
             # Get performance metrics
@@ -54,9 +70,9 @@ class SagarmathaAnalyticsViewSet(viewsets.ViewSet):
             summary = {
                 'market_overview': {
                     'nepse_index': {
-                        'current': float(latest_index.close_price) if latest_index else 0,
-                        'change': float(latest_index.close_price - latest_index.open_price) if latest_index else 0,
-                        'change_percent': float(((latest_index.close_price - latest_index.open_price) / latest_index.open_price) * 100) if latest_index else 0,
+                        'current': latest_index.close_price if latest_index else 0,
+                        'change': latest_index.close_price - latest_index.open_price if latest_index else 0,
+                        'change_percent': ((latest_index.close_price - latest_index.open_price) / latest_index.open_price) * 100 if latest_index else 0,
                         'volume': latest_index.volume if latest_index else 0,
                         'turnover': latest_index.turnover if latest_index else 0,
                         'date': latest_index.date if latest_index else None
@@ -70,9 +86,9 @@ class SagarmathaAnalyticsViewSet(viewsets.ViewSet):
                 },
                 'sector_distribution': list(sector_stats),
                 'price_statistics': {
-                    'highest_price': float(price_stats['max_price']) if price_stats['max_price'] else 0,
-                    'lowest_price': float(price_stats['min_price']) if price_stats['min_price'] else 0,
-                    'average_price': float(price_stats['avg_price']) if price_stats['avg_price'] else 0
+                    'highest_price': price_stats['max_price'] or 0,
+                    'lowest_price': price_stats['min_price'] or 0,
+                    'average_price': price_stats['avg_price'] or 0
                 },
                 'last_updated': timezone.now()
             }
@@ -90,17 +106,18 @@ class SagarmathaAnalyticsViewSet(viewsets.ViewSet):
     def portfolio_analysis(self, request):
         """Get portfolio analysis for Sagarmatha investments"""
         try:
-            # Get top performing sectors
-            sector_performance = NEPSEStock.objects.values('sector').annotate(
-                avg_change=Avg('change_percent'),
-                total_volume=Sum('volume'),
-                stock_count=Sum('volume')  # Using volume as proxy for count
+            # Get top performing sectors from the precomputed sector aggregates
+            sector_performance = Sector.objects.filter(stock_count__gt=0).values(
+                'slug', 'avg_change', 'total_volume', 'stock_count', 'total_market_cap', 'cap_weighted_change',
+                sector=F('name')
             ).order_by('-avg_change')
             
-            # Get market cap distribution
-            market_cap_distribution = NEPSEStock.objects.values('market_cap').annotate(
-                count=Sum('volume')  # Using volume as proxy
-            ).order_by('-count')
+            # Get market cap distribution by size bucket
+            market_cap_distribution = NEPSEStock.objects.values('cap_bucket').annotate(
+                count=Count('id'),
+                total_market_cap=Sum('market_cap_value'),
+                avg_change=Avg('change_percent')
+            ).order_by('-total_market_cap')
             
             # Get volatility analysis
             high_volatility_stocks = NEPSEStock.objects.filter(
@@ -112,8 +129,8 @@ class SagarmathaAnalyticsViewSet(viewsets.ViewSet):
             ).order_by('change_percent')[:10]
             
             analysis = {
-                'sector_performance': list(sector_performance),
-                'market_cap_distribution': list(market_cap_distribution),
+                'sector_performance': with_cap_shares(sector_performance),
+                'market_cap_distribution': with_cap_shares(market_cap_distribution),
                 'high_volatility': NEPSEStockSerializer(high_volatility_stocks, many=True).data,
                 'low_volatility': NEPSEStockSerializer(low_volatility_stocks, many=True).data,
                 'analysis_date': timezone.now()
@@ -174,24 +191,94 @@ class SagarmathaAnalyticsViewSet(viewsets.ViewSet):
             )
 
 
-class SagarmathaReportsViewSet(viewsets.ViewSet):
+    @action(detail=False, methods=['get'])
+    def index_statistics(self, request):
+        """Returns, volatility, moving averages and sector correlations over ?days= (or ?sessions=) of index history"""
+        if np is None:
+            return Response(
+                {'error': 'numpy is required to compute index statistics'},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        
+        try:
+            sessions = request.query_params.get('sessions')
+            if sessions:
+                start_date, end_date = get_calendar().last_sessions(int(sessions))
+            else:
+                end_date = nepal_today()
+                start_date = end_date - timedelta(days=int(request.query_params.get('days', 365)))
+            
+            # Arrays straight from the memory-mapped history cache (or one query each without it)
+            index, source = read_index_window(start_date, end_date)
+            sectors, _ = read_indices_windows(start_date, end_date)
+            
+            close = index['close']
+            if len(close) < 2:
+                return Response(
+                    {'error': 'Not enough index history for the requested period'}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            
+            returns = daily_returns(close)
+            names = [name for name, window in sectors.items() if len(window['date']) > 2]
+            correlation = returns_correlation([sectors[name] for name in names]) if len(names) > 1 else None
+            
+            statistics = {
+                'period': {
+                    'start': date.fromordinal(int(index['date'][0]) + EPOCH_ORDINAL),
+                    'end': date.fromordinal(int(index['date'][-1]) + EPOCH_ORDINAL),
+                    'sessions': len(close),
+                },
+                'nepse_index': {
+                    'close': float(close[-1]),
+                    'return_percent': float(close[-1] / close[0] - 1) * 100,
+                    'volatility_percent': float(np.std(returns, ddof=1) * np.sqrt(SESSIONS_PER_YEAR)) * 100
+                    if len(returns) > 1 else 0.0,
+                    'max_drawdown_percent': max_drawdown(close) * 100,
+                    'sma_20': float(moving_average(close, 20)[-1]) if len(close) >= 20 else None,
+                    'sma_50': float(moving_average(close, 50)[-1]) if len(close) >= 50 else None,
+                },
+                'sector_correlation': {
+                    'symbols': [name.split('/', 1)[1] for name in names],
+                    'matrix': np.round(correlation, 4).tolist() if correlation is not None else [],
+                },
+                'source': source,
+            }
+            
+            return Response(statistics)
+            
+        except Exception as e:
+            logger.error(f"Error in index statistics: {str(e)}")
+            return Response(
+                {'error': 'Failed to compute index statistics'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class SagarmathaReportsViewSet(ReplicaReadMixin, viewsets.ViewSet):
     """Reports and analytics for Sagarmatha Investments"""
     
     @action(detail=False, methods=['get'])
     def daily_report(self, request):
-        """Generate daily market report"""
+        """Generate daily market report for the latest session and the session before it"""
         try:
-            today = timezone.now().date()
-            yesterday = today - timedelta(days=1)
-            
-            # Get today's data
-            today_index = NEPSEIndex.objects.filter(date=today).first()
-            yesterday_index = NEPSEIndex.objects.filter(date=yesterday).first()
+            calendar = get_calendar()
+            latest = calendar.session_on_or_before(nepal_today())
+            
+            # The two newest stored sessions of the last trading week (today's may not be in yet),
+            # in one query pruned to their partition
+            rows = list(NEPSEIndex.objects.filter(
+                date__range=[calendar.session_offset(latest, 1 - WEEK_SESSIONS), latest]
+            ).order_by('-date')[:2])
+            today_index = rows[0] if rows else None
+            today = today_index.date if today_index else latest
+            yesterday = calendar.previous_session(today)
+            yesterday_index = rows[1] if len(rows) > 1 and rows[1].date == yesterday else None
             
             # Calculate daily changes
             if today_index and yesterday_index:
                 index_change = float(today_index.close_price - yesterday_index.close_price)
-                index_change_percent = float((index_change / yesterday_index.close_price) * 100)
+                index_change_percent = index_change / float(yesterday_index.close_price) * 100
             else:
                 index_change = 0
                 index_change_percent = 0
@@ -200,10 +287,9 @@ class SagarmathaReportsViewSet(viewsets.ViewSet):
             top_gainers = NEPSEStock.objects.filter(change_percent__gt=0).order_by('-change_percent')[:5]
             top_losers = NEPSEStock.objects.filter(change_percent__lt=0).order_by('change_percent')[:5]
             
-            # Get sector performance
-            sector_performance = NEPSEStock.objects.values('sector').annotate(
-                avg_change=Avg('change_percent'),
-                total_volume=Sum('volume')
+            # Get sector performance from the precomputed sector aggregates
+            sector_performance = Sector.objects.filter(stock_count__gt=0).values(
+                'slug', 'avg_change', 'total_volume', 'cap_weighted_change', sector=F('name')
             ).order_by('-avg_change')
             
             report = {
@@ -233,22 +319,22 @@ class SagarmathaReportsViewSet(viewsets.ViewSet):
     
     @action(detail=False, methods=['get'])
     def weekly_summary(self, request):
-        """Generate weekly market summary"""
+        """Generate market summary over the last ?sessions= sessions (default: one trading week)"""
         try:
-            end_date = timezone.now().date()
-            start_date = end_date - timedelta(days=7)
+            sessions = int(request.query_params.get('sessions', WEEK_SESSIONS))
+            start_date, end_date = get_calendar().last_sessions(sessions)
             
-            # Get weekly index data
-            weekly_data = NEPSEIndex.objects.filter(
+            # Get the sessions' index data; one bounded query so only their partition is scanned
+            weekly_data = list(NEPSEIndex.objects.filter(
                 date__range=[start_date, end_date]
-            ).order_by('date')
+            ).order_by('date'))
             
-            if weekly_data.exists():
-                week_start = weekly_data.first()
-                week_end = weekly_data.last()
+            if weekly_data:
+                week_start = weekly_data[0]
+                week_end = weekly_data[-1]
                 
                 weekly_change = float(week_end.close_price - week_start.open_price)
-                weekly_change_percent = float((weekly_change / week_start.open_price) * 100)
+                weekly_change_percent = weekly_change / float(week_start.open_price) * 100
                 
                 # Calculate weekly volume and turnover
                 total_volume = sum(data.volume for data in weekly_data)
@@ -298,46 +384,60 @@ class SagarmathaDataViewSet(viewsets.ViewSet):
     
     @action(detail=False, methods=['get'])
     def data_health(self, request):
-        """Check data health and freshness"""
+        """
+        Check data health and freshness.
+        Row counts and timestamps come from the maintained dataset counters, so
+        the check never scans a table; ?deep=1 recomputes them exactly.
+        """
         try:
-            # Check latest data timestamps
-            latest_index = NEPSEIndex.objects.first()
-            latest_stock = NEPSEStock.objects.first()
-            latest_indices = NEPSEIndices.objects.first()
+            deep = request.query_params.get('deep') in ('1', 'true')
+            now = timezone.now()
+            
+            if deep:
+                datasets = {name: exact_stats(name) for name in DATASETS}
+            else:
+                datasets = {
+                    name: {
+                        'row_count': counter.row_count,
+                        'latest_date': counter.latest_date,
+                        'last_updated_at': counter.last_updated_at,
+                        'refreshed_at': counter.refreshed_at,
+                    }
+                    for name, counter in get_counters().items()
+                }
             
             # Check data update logs
             recent_logs = DataUpdateLog.objects.order_by('-created_at')[:5]
             
             # Calculate data freshness
-            now = timezone.now()
             data_freshness = {}
-            
-            if latest_index:
-                hours_since_index = (now - latest_index.updated_at).total_seconds() / 3600
-                data_freshness['index'] = {
-                    'last_updated': latest_index.updated_at,
-                    'hours_ago': round(hours_since_index, 2),
-                    'status': 'Fresh' if hours_since_index < 24 else 'Stale'
-                }
-            
-            if latest_stock:
-                hours_since_stock = (now - latest_stock.updated_at).total_seconds() / 3600
-                data_freshness['stocks'] = {
-                    'last_updated': latest_stock.updated_at,
-                    'hours_ago': round(hours_since_stock, 2),
-                    'status': 'Fresh' if hours_since_stock < 24 else 'Stale'
+            for name, row in datasets.items():
+                if row['last_updated_at'] is None:
+                    continue
+                hours_since_update = (now - row['last_updated_at']).total_seconds() / 3600
+                data_freshness[name] = {
+                    'last_updated': row['last_updated_at'],
+                    'latest_date': row['latest_date'],
+                    'hours_ago': round(hours_since_update, 2),
+                    'status': 'Fresh' if hours_since_update < 24 else 'Stale'
                 }
             
             health_status = {
+                'mode': 'deep' if deep else 'counters',
                 'data_freshness': data_freshness,
                 'recent_updates': DataUpdateLogSerializer(recent_logs, many=True).data,
                 'total_records': {
-                    'index_records': NEPSEIndex.objects.count(),
-                    'stock_records': NEPSEStock.objects.count(),
-                    'indices_records': NEPSEIndices.objects.count()
+                    'index_records': datasets['index']['row_count'],
+                    'stock_records': datasets['stocks']['row_count'],
+                    'indices_records': datasets['indices']['row_count']
                 },
+                'ingestion': self._ingestion_performance(),
                 'checked_at': now
             }
+            if not deep:
+                health_status['counters_refreshed_at'] = min(
+                    (row['refreshed_at'] for row in datasets.values() if row['refreshed_at']), default=None
+                )
             
             return Response(health_status)
             
@@ -348,6 +448,44 @@ class SagarmathaDataViewSet(viewsets.ViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def _ingestion_performance(self, runs=20):
+        """Last run and recent averages of stage timings and throughput per update type"""
+        recent = DataUpdateLog.objects.filter(status='success').order_by('-created_at').values(
+            'update_type', 'completed_at', 'stats'
+        )[:runs]
+        performance = {}
+        for log in recent:
+            if not log['stats']:
+                continue
+            entry = performance.setdefault(log['update_type'], {
+                'last_run': {'completed_at': log['completed_at'], **log['stats']},
+                'runs': 0,
+                'avg_duration_seconds': 0.0,
+                'avg_rows_per_second': 0.0,
+                'avg_stages': {},
+            })
+            entry['runs'] += 1
+            entry['avg_duration_seconds'] += log['stats'].get('duration_seconds', 0)
+            entry['avg_rows_per_second'] += log['stats'].get('rows_per_second', 0)
+            for stage, seconds in log['stats'].get('stages', {}).items():
+                entry['avg_stages'][stage] = entry['avg_stages'].get(stage, 0) + seconds
+        for entry in performance.values():
+            entry['avg_duration_seconds'] = round(entry['avg_duration_seconds'] / entry['runs'], 4)
+            entry['avg_rows_per_second'] = round(entry['avg_rows_per_second'] / entry['runs'], 2)
+            entry['avg_stages'] = {
+                stage: round(seconds / entry['runs'], 4) for stage, seconds in entry['avg_stages'].items()
+            }
+        return performance
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def request_metrics(self, request):
+        """Per-endpoint query count, DB time, render time and size histograms (staff only)"""
+        return Response({
+            'sample_rate': settings.NEPSE_REQUEST_METRICS_SAMPLE_RATE,
+            'endpoints': endpoint_stats.snapshot(),
+            'collected_at': timezone.now()
+        })
+    
     @action(detail=False, methods=['post'])
     def trigger_update(self, request):
         """Trigger data update (admin only)"""
@@ -21,6 +21,10 @@ ALLOWED_HOSTS = [
 ]
 ALLOWED_HOSTS = [host for host in ALLOWED_HOSTS if host is not None]
 
+# Persistent connections to the database host (see settings.py)
+DATABASE_CONNECTION_MAX_AGE = config('DATABASE_CONNECTION_MAX_AGE', default=3600, cast=int)  # 1 hour
+DATABASE_CONNECTION_POOL_SIZE = config('DATABASE_CONNECTION_POOL_SIZE', default=10, cast=int)
+
 # Database configuration for production
 DATABASES = {
     'default': {
@@ -33,10 +37,21 @@ DATABASES = {
         'OPTIONS': {
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
             'charset': 'utf8mb4',
-        }
+        },
+        'CONN_MAX_AGE': DATABASE_CONNECTION_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Optional read replica for the analytics and report endpoints (see settings.py)
+if config('REPLICA_DB_HOST', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': config('REPLICA_DB_HOST'),
+        'PORT': config('REPLICA_DB_PORT', default=DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
 # Static files configuration for production
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -174,8 +189,11 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'nepse.renderers.ORJSONRenderer',
+        'nepse.renderers.ColumnarORJSONRenderer',
     ],
+    # Emit DecimalFields as JSON numbers instead of strings
+    'COERCE_DECIMAL_TO_STRING': False,
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
     'DEFAULT_FILTER_BACKENDS': [
@@ -198,15 +216,13 @@ NEPSE_DATA_UPDATE_INTERVAL = 300  # 5 minutes
 NEPSE_DATA_CACHE_TIMEOUT = 600  # 10 minutes
 NEPSE_DATA_BACKUP_ENABLED = True
 NEPSE_DATA_BACKUP_INTERVAL = 86400  # 24 hours
+NEPSE_SNAPSHOT_ON_UPDATE = config('NEPSE_SNAPSHOT_ON_UPDATE', default=True, cast=bool)
 
 # Monitoring and health checks
+NEPSE_REQUEST_METRICS_SAMPLE_RATE = config('NEPSE_REQUEST_METRICS_SAMPLE_RATE', default=0.1, cast=float)
 HEALTH_CHECK_ENABLED = True
 HEALTH_CHECK_INTERVAL = 60  # 1 minute
 
-# Performance optimizations
-DATABASE_CONNECTION_POOL_SIZE = 10
-DATABASE_CONNECTION_MAX_AGE = 3600  # 1 hour
-
 # API documentation
 API_DOCUMENTATION_ENABLED = True
 API_DOCUMENTATION_URL = '/api/docs/'
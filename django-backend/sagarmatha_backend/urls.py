@@ -2,16 +2,29 @@
 URL configuration for sagarmatha_backend project.
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from nepse.metrics import metrics_view
+from nepse.profiling import profile_download_view, profile_list_view
+from nepse.snapshots import snapshot_view
 
 urlpatterns = [
+    path('admin/profiles/', profile_list_view, name='profile-list'),
+    path('admin/profiles/<str:profile_id>.<str:kind>', profile_download_view, name='profile-download'),
     path('admin/', admin.site.urls),
     path('api/v1/', include('nepse.urls')),
     path('api/v1/auth/', include('rest_framework.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
+# Snapshots are rewritten while workers run: serve them from disk, unless
+# NEPSE_SNAPSHOT_URL points at a CDN or another host
+if settings.NEPSE_SNAPSHOT_URL.startswith('/'):
+    urlpatterns.append(re_path(
+        rf"^{settings.NEPSE_SNAPSHOT_URL.strip('/')}/(?P<path>.+)$", snapshot_view, name='snapshot'
+    ))
+
 # Serve static files in development
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)